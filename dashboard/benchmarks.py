@@ -0,0 +1,222 @@
+"""
+Benchmark harness for the site's views.
+
+Every URL in website.urls and dashboard.urls, plus a few heavier query
+string variants, is requested through the test client. Pages that redirect
+anonymous visitors to a login are retried as a staff user. Each URL gets a
+warm-up request, then a number of timed iterations, with the cache cleared
+before each one when running cold. Streaming responses are read to the end
+inside the timed block, since that is when their queries run. Finally one request runs under
+tracemalloc for peak memory. Results are plain JSON so runs from different
+commits can be compared.
+
+The chatbot is measured against the local EchoBackend rather than the
+external model, so its numbers cover retrieval, the response cache and the
+async view but not the model's own latency.
+"""
+import datetime
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from website import urls as website_urls
+
+from . import urls as dashboard_urls
+from .metrics import collect, percentile
+
+# Views that cannot be benchmarked in isolation: logging out ends the staff session
+SKIPPED_VIEWS = {'website:admin_logout'}
+
+# Query strings worth measuring on top of the bare URL
+VARIANTS = {
+    'website:blog': ['category=machine_learning', 'page=50', 'search=machine learning'],
+    'website:solutions': ['search=platform'],
+    'website:gallery': ['category=events'],
+    'website:chat': ['message=How can machine learning help my business'],
+}
+
+# Views whose bare URL is only an error response, measured through their variants alone
+VARIANTS_ONLY = {'website:chat'}
+
+# Settings each view is measured under
+VIEW_SETTINGS = {
+    'website:chat': {'CHAT_BACKEND': 'website.chat_backends.EchoBackend'},
+}
+
+BENCHMARK_USERNAME = 'benchmark-staff'
+
+
+def _first(model_label, field, **filters):
+    return apps.get_model(model_label).objects.filter(**filters).order_by('pk').values_list(field, flat=True).first()
+
+
+# Sample URL arguments for the views that take one
+URL_ARGUMENTS = {
+    'website:solution_detail': lambda: _first('website.SoftwareSolution', 'slug', slug__isnull=False),
+    'website:case_study_detail': lambda: _first('website.CaseStudy', 'pk'),
+    'website:blog_post_detail': lambda: _first('website.BlogPost', 'slug', is_published=True, slug__isnull=False),
+    'website:event_detail': lambda: _first('website.Event', 'pk'),
+    'website:inquiry_detail': lambda: _first('website.ContactInquiry', 'pk'),
+}
+
+
+def benchmark_urls():
+    """(view name, URL) of every routable GET endpoint, with sample arguments"""
+    seen = set()
+    for module in (website_urls, dashboard_urls):
+        for pattern in module.urlpatterns:
+            if not pattern.name:
+                continue
+            view_name = f'{module.app_name}:{pattern.name}'
+            if view_name in seen or view_name in SKIPPED_VIEWS:
+                continue
+            seen.add(view_name)
+
+            if pattern.pattern.converters:
+                argument = URL_ARGUMENTS.get(view_name, lambda: None)()
+                if argument is None:
+                    continue
+                url = reverse(view_name, args=[argument])
+            else:
+                url = reverse(view_name)
+            if view_name not in VARIANTS_ONLY:
+                yield view_name, url
+            for query in VARIANTS.get(view_name, []):
+                yield view_name, f'{url}?{query}'
+
+
+def _staff_client(host):
+    user, _ = get_user_model().objects.get_or_create(
+        username=BENCHMARK_USERNAME, defaults={'is_staff': True, 'is_active': True}
+    )
+    client = Client(raise_request_exception=False, HTTP_HOST=host)
+    client.force_login(user)
+    return client
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+        'mean': statistics.fmean(values),
+        'max': values[-1],
+    }
+
+
+def _fetch(client, url):
+    """GET a URL and read the whole body, returning the response and its size"""
+    response = client.get(url)
+    if response.streaming:
+        # Streaming views do their queries and rendering while being iterated
+        size = sum(len(chunk) for chunk in response.streaming_content)
+        response.close()
+    else:
+        size = len(response.content)
+    return response, size
+
+
+def benchmark_url(client, url, iterations, cold):
+    """Timings, query counts and peak memory of repeated GETs of one URL"""
+    _fetch(client, url)
+    latencies, queries, db_times, render_times = [], [], [], []
+    for _ in range(iterations):
+        if cold:
+            cache.clear()
+        with collect() as metrics:
+            start = time.perf_counter()
+            response, size = _fetch(client, url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(metrics.queries)
+        db_times.append(metrics.db_time * 1000)
+        render_times.append(metrics.render_time * 1000)
+
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        _fetch(client, url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'size': size,
+        'latency_ms': _summary(latencies),
+        'queries': _summary(queries),
+        'db_ms': _summary(db_times),
+        'render_ms': _summary(render_times),
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(iterations=20, cold=False, host='localhost', log=print):
+    """Benchmark every URL and return the results as a JSON-serialisable dict"""
+    # Broken views are reported with their 500 status rather than stopping the run
+    anonymous = Client(raise_request_exception=False, HTTP_HOST=host)
+    staff = None
+    results = {}
+    for view_name, url in benchmark_urls():
+        with override_settings(**VIEW_SETTINGS.get(view_name, {})):
+            client = anonymous
+            response = anonymous.get(url)
+            if response.status_code in (301, 302) and 'login' in response.get('Location', ''):
+                staff = staff or _staff_client(host)
+                client = staff
+            result = {'view': view_name, **benchmark_url(client, url, iterations, cold)}
+        results[url] = result
+        log(
+            f"{url:<60} {result['status']}  p50 {result['latency_ms']['p50']:8.1f} ms  "
+            f"p95 {result['latency_ms']['p95']:8.1f} ms  {result['queries']['max']:3d} queries  "
+            f"{result['peak_memory_kb']:8.0f} KB"
+        )
+
+    return {
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'commit': _commit(),
+            'database': connection.vendor,
+            'iterations': iterations,
+            'cold': cold,
+            'rows': {
+                model._meta.label: model.objects.count()
+                for model in apps.get_app_config('website').get_models()
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """Per-URL change in p50 latency and maximum query count between two runs"""
+    rows = []
+    for url, result in current['results'].items():
+        before = baseline['results'].get(url)
+        if before is None:
+            continue
+        old_p50, new_p50 = before['latency_ms']['p50'], result['latency_ms']['p50']
+        rows.append({
+            'url': url,
+            'latency_p50_ms': (old_p50, new_p50),
+            'latency_change': (new_p50 - old_p50) / old_p50 if old_p50 else None,
+            'queries': (before['queries']['max'], result['queries']['max']),
+        })
+    return rows
@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from dashboard.benchmarks import compare, run
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every website and dashboard URL and write latency, query and memory results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per URL (default: 20)')
+        parser.add_argument('--cold', action='store_true', help='Clear the cache before every request')
+        parser.add_argument('--host', default='localhost', help='Host name to request; must be in ALLOWED_HOSTS')
+        parser.add_argument('--output', help='Write the results to this JSON file')
+        parser.add_argument('--compare', metavar='BASELINE', help='Compare against the results in an earlier JSON file')
+
+    def handle(self, *args, **options):
+        results = run(iterations=options['iterations'], cold=options['cold'], host=options['host'], log=self.stdout.write)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
+
+        if options['compare']:
+            with open(options['compare']) as source:
+                baseline = json.load(source)
+            self.stdout.write(f"\nCompared with {baseline['meta'].get('commit') or options['compare']}:")
+            for row in compare(baseline, results):
+                before, after = row['latency_p50_ms']
+                change = f"{row['latency_change']:+.0%}" if row['latency_change'] is not None else 'n/a'
+                line = f"{row['url']:<60} p50 {before:8.1f} -> {after:8.1f} ms ({change})  queries {row['queries'][0]} -> {row['queries'][1]}"
+                slower = row['latency_change'] is not None and row['latency_change'] > 0.2
+                self.stdout.write(self.style.WARNING(line) if slower or row['queries'][1] > row['queries'][0] else line)
@@ -0,0 +1,225 @@
+"""
+Per-view request metrics.
+
+dashboard.middleware.request_metrics_middleware records the SQL query count
+and time, template render time, total time and response size of every
+request under the URL name of its view. The last REQUEST_METRICS_BUFFER_SIZE
+records are kept in an in-process ring buffer and summarised as percentiles
+for the dashboard panel.
+
+Views also have query budgets (QUERY_BUDGETS, keyed by URL name). A request
+over its budget is logged, or raises QueryBudgetExceeded when
+QUERY_BUDGET_ACTION is 'raise' so that a test suite run with that setting
+fails on query regressions.
+
+The middleware is not enabled by default. Add it at the top of MIDDLEWARE so
+that it measures everything below it:
+
+    MIDDLEWARE = [
+        'dashboard.middleware.request_metrics_middleware',
+        'django.middleware.security.SecurityMiddleware',
+        ...
+    ]
+
+Queries are counted by an execute wrapper that stays on every connection
+and reports to the metrics of the current request, found through a context
+variable. Under ASGI a sync view runs in a worker thread with connections of
+its own, so the middleware also installs the wrapper in that thread, and a
+connection_created receiver covers connections opened later.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+logger = logging.getLogger(__name__)
+
+RING_BUFFER_SIZE = getattr(settings, 'REQUEST_METRICS_BUFFER_SIZE', 5000)
+
+# Queries each view is expected to need at most, with a cold cache
+DEFAULT_QUERY_BUDGETS = {
+    'website:home': 6,
+    'website:solutions': 6,
+    'website:solution_detail': 4,
+    'website:case_studies': 6,
+    'website:case_study_detail': 4,
+    'website:testimonials': 4,
+    'website:blog': 10,
+    'website:blog_post_detail': 8,
+    'website:gallery': 6,
+    'website:gallery_feed': 4,
+    'website:events': 4,
+    'website:event_detail': 4,
+    'website:contact': 4,
+    'website:admin_dashboard': 8,
+    'website:inquiry_detail': 4,
+}
+
+PERCENTILES = (50, 95, 99)
+MEASURES = ('queries', 'db_ms', 'render_ms', 'total_ms', 'size')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    """Measurements accumulated while a single request is handled"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.started = time.perf_counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed as a database execute wrapper for the request
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+_buffer = deque(maxlen=RING_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapped(self, *args, **kwargs):
+        metrics = _current.get()
+        if metrics is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            metrics.render_time += time.perf_counter() - start
+    wrapped._request_metrics = True
+    return wrapped
+
+
+def install_render_timer():
+    """
+    Time template rendering for request metrics. Called when the middleware
+    is loaded, so processes without it keep the unpatched Template.render.
+    """
+    # The backend Template wraps each top-level render (render(), render_to_string)
+    # but not the includes and blocks inside it, so time is never counted twice
+    if not getattr(Template.render, '_request_metrics', False):
+        Template.render = _timed_render(Template.render)
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def _add_query_recorder(connection, **kwargs):
+    # Inserted first: connection.execute_wrapper() pops the last wrapper on exit
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+def install_query_recorder():
+    """
+    Count queries for request metrics on the connections of the calling
+    thread, and on every connection opened from now on in any thread.
+    """
+    connection_created.connect(_add_query_recorder, dispatch_uid='dashboard.metrics.query_recorder')
+    for connection in connections.all(initialized_only=True):
+        _add_query_recorder(connection)
+
+
+@contextmanager
+def collect():
+    """Measure the queries and template rendering of the enclosed block"""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        install_query_recorder()
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def finish_request(request, response, metrics):
+    """Record a finished request and enforce its query budget"""
+    match = request.resolver_match
+    view_name = match.view_name if match else None
+    if view_name is None:
+        return
+
+    record = {
+        'view': view_name,
+        'status': response.status_code,
+        'queries': metrics.queries,
+        'db_ms': metrics.db_time * 1000,
+        'render_ms': metrics.render_time * 1000,
+        'total_ms': (time.perf_counter() - metrics.started) * 1000,
+        'size': 0 if response.streaming else len(response.content),
+        'time': time.time(),
+    }
+    with _buffer_lock:
+        _buffer.append(record)
+
+    budget = get_query_budgets().get(view_name)
+    if budget is not None and metrics.queries > budget:
+        message = f"{view_name} ran {metrics.queries} queries, over its budget of {budget} ({request.path})"
+        if getattr(settings, 'QUERY_BUDGET_ACTION', 'log') == 'raise':
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def get_query_budgets():
+    return {**DEFAULT_QUERY_BUDGETS, **getattr(settings, 'QUERY_BUDGETS', {})}
+
+
+def recent_requests():
+    with _buffer_lock:
+        return list(_buffer)
+
+
+def clear():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(records=None):
+    """Per-view request counts and percentiles of every measure, busiest view first"""
+    by_view = defaultdict(list)
+    for record in recent_requests() if records is None else records:
+        by_view[record['view']].append(record)
+
+    budgets = get_query_budgets()
+    summary = []
+    for view_name, view_records in by_view.items():
+        row = {'view': view_name, 'count': len(view_records), 'budget': budgets.get(view_name)}
+        for measure in MEASURES:
+            values = sorted(record[measure] for record in view_records)
+            row[measure] = {f'p{percent}': percentile(values, percent) for percent in PERCENTILES}
+        row['over_budget'] = row['budget'] is not None and row['queries']['p99'] > row['budget']
+        summary.append(row)
+    summary.sort(key=lambda row: -row['count'])
+    return summary
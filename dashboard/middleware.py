@@ -0,0 +1,26 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.decorators import sync_and_async_middleware
+
+from . import metrics
+
+
+@sync_and_async_middleware
+def request_metrics_middleware(get_response):
+    """Record query count, DB and template time and size of every response"""
+    metrics.install_render_timer()
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with metrics.collect() as request_metrics:
+                # Sync views and the async ORM run in the request's
+                # thread-sensitive worker, whose connections are not this thread's
+                await sync_to_async(metrics.install_query_recorder)()
+                response = await get_response(request)
+            metrics.finish_request(request, response, request_metrics)
+            return response
+    else:
+        def middleware(request):
+            with metrics.collect() as request_metrics:
+                response = get_response(request)
+            metrics.finish_request(request, response, request_metrics)
+            return response
+    return middleware
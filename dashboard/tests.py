@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.backends.django import Template
+from django.test import Client, TestCase, modify_settings, override_settings
+
+from website.models import ContactInquiry
+
+from . import benchmarks, metrics
+from .middleware import request_metrics_middleware
+
+
+class RequestMetricsTests(TestCase):
+    def test_render_timer_is_installed_by_the_middleware(self):
+        render = getattr(Template.render, '__wrapped__', Template.render)
+        with mock.patch.object(Template, 'render', render):
+            self.assertFalse(getattr(Template.render, '_request_metrics', False))
+            request_metrics_middleware(lambda request: HttpResponse())
+            self.assertTrue(Template.render._request_metrics)
+
+    @modify_settings(MIDDLEWARE={'prepend': 'dashboard.middleware.request_metrics_middleware'})
+    def test_requests_are_recorded_under_their_view(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        metrics.clear()
+        self.client.get('/solutions/')
+        [record] = metrics.recent_requests()
+        self.assertEqual(record['view'], 'website:solutions')
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['render_ms'], 0)
+
+    @modify_settings(MIDDLEWARE={'prepend': 'dashboard.middleware.request_metrics_middleware'})
+    def test_sync_views_under_asgi_record_their_queries(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        metrics.clear()
+        self.client.get('/solutions/')
+        cache.clear()
+        response = async_to_sync(self.async_client.get)('/solutions/')
+        self.assertEqual(response.status_code, 200)
+        wsgi, asgi = metrics.recent_requests()
+        self.assertEqual(asgi['view'], 'website:solutions')
+        self.assertGreater(asgi['queries'], 0)
+        self.assertEqual(asgi['queries'], wsgi['queries'])
+
+
+@modify_settings(MIDDLEWARE={'prepend': 'dashboard.middleware.request_metrics_middleware'})
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        # A cached page would answer without running any queries
+        cache.clear()
+        self.addCleanup(cache.clear)
+        metrics.clear()
+
+    @override_settings(QUERY_BUDGET_ACTION='raise', QUERY_BUDGETS={'website:solutions': 0})
+    def test_over_budget_request_raises_in_raise_mode(self):
+        with self.assertRaisesMessage(metrics.QueryBudgetExceeded, 'over its budget of 0'):
+            self.client.get('/solutions/')
+
+    @override_settings(QUERY_BUDGET_ACTION='raise')
+    def test_request_within_its_budget_passes_in_raise_mode(self):
+        self.assertEqual(self.client.get('/solutions/').status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'website:solutions': 0})
+    def test_over_budget_request_is_only_logged_by_default(self):
+        with self.assertLogs('dashboard.metrics', 'WARNING') as logs:
+            response = self.client.get('/solutions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('website:solutions ran', logs.output[0])
+        [record] = metrics.recent_requests()
+        self.assertEqual(record['view'], 'website:solutions')
+
+
+class BenchmarkTests(TestCase):
+    def test_streaming_exports_are_read_inside_the_timed_block(self):
+        for number in range(3):
+            ContactInquiry.objects.create(
+                name=f'Visitor {number}', email=f'v{number}@example.com', phone='0191',
+                company_name='Co', country='Japan', job_title='-', job_details='-',
+            )
+        client = benchmarks._staff_client('localhost')
+        result = benchmarks.benchmark_url(client, '/admin-dashboard/export/inquiries/', iterations=2, cold=False)
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['size'], 0)
+        self.assertGreater(result['queries']['p50'], 0)
+
+    def test_chat_is_measured_with_a_message_against_the_echo_backend(self):
+        urls = [url for view_name, url in benchmarks.benchmark_urls() if view_name == 'website:chat']
+        self.assertEqual(len(urls), 1)
+        self.assertIn('?message=', urls[0])
+        with override_settings(**benchmarks.VIEW_SETTINGS['website:chat']):
+            client = Client()
+            result = benchmarks.benchmark_url(client, urls[0], iterations=1, cold=True)
+        self.assertEqual(result['status'], 200)
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import CustomAdminLoginView
+from .views import CustomAdminLoginView, request_metrics
 app_name = 'dashboard'
 
 urlpatterns = [
     path('login/', CustomAdminLoginView.as_view(), name='login'),
+    path('metrics/', request_metrics, name='request_metrics'),
 ]
\ No newline at end of file
@@ -4,6 +4,13 @@ from django.shortcuts import render
 from django.contrib.admin.forms import AdminAuthenticationForm
 from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from website.chat_cache import get_response_cache
+
+from . import metrics
+
 
 class CustomAdminLoginView(LoginView):
     template_name = 'dashboard/login.html'
@@ -15,3 +22,22 @@ class CustomAdminLoginView(LoginView):
         if next_url:
             return next_url
         return reverse_lazy('admin:index')
+
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view query, timing and size percentiles from the metrics ring buffer"""
+    summary = metrics.summarize()
+    chat_cache = get_response_cache().stats()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'views': summary,
+            'requests': len(metrics.recent_requests()),
+            'chat_cache': chat_cache,
+        })
+    return render(request, 'dashboard/metrics.html', {
+        'summary': summary,
+        'chat_cache': chat_cache,
+        'buffer_size': metrics.RING_BUFFER_SIZE,
+        'title': 'Request metrics',
+    })
@@ -1,17 +1,31 @@
 from django.contrib import admin
+from django.contrib.admin.utils import model_ngettext
+
+from . import bulk, exports
 from .models import (
     SoftwareSolution, 
     CaseStudy, 
     Testimonial, 
     BlogPost, 
+    Tag,
     GalleryImage, 
     Event, 
     ContactInquiry,
-    EventRegistration
+    EventRegistration,
+    NotificationJob
 )
 
 # Register your models here.
 
+def bulk_action(name, description):
+    """Admin action running a website.bulk action as one UPDATE over the selection"""
+    @admin.action(description=description)
+    def action(modeladmin, request, queryset):
+        count = bulk.apply(name, queryset)
+        modeladmin.message_user(request, f"{count} {model_ngettext(queryset, count)} updated.")
+    action.__name__ = name
+    return action
+
 @admin.register(SoftwareSolution)
 class SoftwareSolutionAdmin(admin.ModelAdmin):
     list_display = ('title', 'created_at', 'updated_at')
@@ -53,6 +67,10 @@ class TestimonialAdmin(admin.ModelAdmin):
     search_fields = ('customer_name', 'company', 'testimonial')
     list_filter = ('rating', 'date', 'is_approved')
     list_editable = ('rating', 'is_approved')
+    actions = [
+        bulk_action('approve', 'Approve selected testimonials'),
+        bulk_action('unapprove', 'Withdraw approval of selected testimonials'),
+    ]
     fieldsets = (
         (None, {
             'fields': ('customer_name', 'company', 'position', 'image')
@@ -68,6 +86,10 @@ class BlogPostAdmin(admin.ModelAdmin):
     search_fields = ('title', 'content', 'author')
     list_filter = ('is_published', 'created_at')
     list_editable = ('is_published',)
+    actions = [
+        bulk_action('publish', 'Publish selected posts'),
+        bulk_action('unpublish', 'Unpublish selected posts'),
+    ]
     readonly_fields = ('created_at', 'updated_at', 'slug')  # Added slug to readonly_fields
     fieldsets = (
         (None, {
@@ -85,6 +107,12 @@ class BlogPostAdmin(admin.ModelAdmin):
         }),
     )
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug')
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+
 @admin.register(GalleryImage)
 class GalleryImageAdmin(admin.ModelAdmin):
     list_display = ('title', 'category', 'event_name', 'date')
@@ -104,21 +132,25 @@ class GalleryImageAdmin(admin.ModelAdmin):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'location', 'is_featured', 'is_upcoming')
+    list_display = ('title', 'date', 'location', 'is_featured', 'is_upcoming', 'capacity', 'seats_taken')
     list_filter = ('is_featured', 'is_upcoming')
     search_fields = ('title', 'description', 'location')
     date_hierarchy = 'date'
     list_editable = ('is_featured',)
-    readonly_fields = ('is_upcoming',)
+    actions = [
+        bulk_action('feature', 'Feature selected events'),
+        bulk_action('unfeature', 'Stop featuring selected events'),
+    ]
+    readonly_fields = ('is_upcoming', 'seats_taken')
     fieldsets = (
         (None, {
             'fields': ('title', 'description', 'image')
         }),
         ('Event Details', {
-            'fields': ('date', 'location', 'registration_link', 'is_featured')
+            'fields': ('date', 'location', 'registration_link', 'is_featured', 'capacity')
         }),
         ('Status', {
-            'fields': ('is_upcoming',),
+            'fields': ('is_upcoming', 'seats_taken'),
             'classes': ('collapse',)
         }),
     )
@@ -143,6 +175,16 @@ class ContactInquiryAdmin(admin.ModelAdmin):
         }),
     )
 
+    actions = [
+        bulk_action('mark_read', 'Mark selected inquiries as read'),
+        bulk_action('mark_unread', 'Mark selected inquiries as unread'),
+        'export_csv',
+    ]
+
+    @admin.action(description='Export selected inquiries as CSV')
+    def export_csv(self, request, queryset):
+        return exports.csv_response(queryset.order_by('-created_at', '-id'), exports.INQUIRY_COLUMNS, 'inquiries')
+
     def has_add_permission(self, request):
         # Prevent adding contact inquiries directly from admin
         # They should only be created through the contact form
@@ -156,3 +198,20 @@ class EventRegistrationAdmin(admin.ModelAdmin):
     search_fields = ('full_name', 'email', 'phone', 'company')
     date_hierarchy = 'registered_at'
     readonly_fields = ('registered_at',)
+    actions = ['export_csv']
+
+    @admin.action(description='Export selected registrations as CSV')
+    def export_csv(self, request, queryset):
+        return exports.csv_response(queryset.order_by('-registered_at', '-id'), exports.REGISTRATION_COLUMNS, 'registrations')
+
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'status', 'attempts', 'run_after', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('kind', 'subject', 'body', 'recipients', 'attempts', 'last_error', 'created_at', 'sent_at')
+
+    def has_add_permission(self, request):
+        # Jobs are queued by the site, not written by hand
+        return False
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class WebsiteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website'
+
+    def ready(self):
+        # Register signal handlers that keep derived data in sync
+        from . import signals  # noqa: F401
+        # Register the chat backend system check
+        from . import chat_backends  # noqa: F401
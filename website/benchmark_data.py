@@ -0,0 +1,249 @@
+"""
+Synthetic data for benchmarking.
+
+Rows are bulk-inserted in batches with a seeded random generator, so two
+runs with the same volumes and seed produce the same database. Signals do
+not fire for bulk inserts, so the tag relation is filled in directly and the
+derived data (excerpts and rendered content, search, related posts, inquiry
+statistics, chatbot retrieval, media reference counts, event seats, blog
+sidebar) is rebuilt once at the end. All gallery images and featured images share one small
+generated JPEG, which content-addressed storage keeps as a single blob.
+
+Posts and inquiries get creation times spread over the past years, so
+orderings and keyset pages on created_at do not all tie.
+
+Solutions and posts get slugs derived from the seed. A run replaces the
+solutions and posts an earlier run with the same seed created, rather than
+adding copies under suffixed slugs; the other tables get a further set of
+rows.
+"""
+import datetime
+import random
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+from PIL import Image
+
+from . import blobs, content, registrations, related, retrieval, search, stats
+from .caching import bump_model_version
+from .models import (
+    BlogPost, CaseStudy, ContactInquiry, Event, EventRegistration, GalleryImage, RelatedPost, SoftwareSolution, Tag,
+    Testimonial,
+)
+from .sidebar import invalidate_blog_sidebar
+from .storage import media_storage
+
+DEFAULT_VOLUMES = {
+    'solutions': 50,
+    'case_studies': 200,
+    'testimonials': 500,
+    'tags': 200,
+    'posts': 10_000,
+    'gallery': 50_000,
+    'events': 500,
+    'inquiries': 100_000,
+    'registrations': 1_000_000,
+}
+
+BATCH_SIZE = 2000
+
+WORDS = (
+    'ai automation analytics assistant business chatbot cloud computer customer data deep detection '
+    'engine forecasting insight intelligence language learning machine model monitoring network '
+    'platform prediction process recognition robotics scale security speech strategy support system '
+    'transformation vision workflow'
+).split()
+COUNTRIES = ('United Kingdom', 'United States', 'Germany', 'India', 'Nigeria', 'Japan', 'Brazil', 'Canada')
+LOCATIONS = ('Sunderland', 'London', 'Manchester', 'Newcastle', 'Online')
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def _paragraphs(rng, count, words=60):
+    return '\n\n'.join(_sentence(rng, words) for _ in range(count))
+
+
+def _placeholder_image():
+    image = Image.new('RGB', (1280, 720), (38, 84, 124))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=80)
+    return media_storage.save('benchmark/placeholder.jpg', ContentFile(buffer.getvalue()))
+
+
+def _bulk_create(model, rows, total, log):
+    """Insert rows from an iterator in batches"""
+    created = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    log(f"  {model.__name__}: {created}/{total}")
+
+
+def _delete_by_slug_prefix(model, prefix):
+    # A plain DELETE: queryset.delete() would run the per-row signals, which
+    # rewrite the chatbot index and recompute related posts once per row
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field('slug').column)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} LIKE %s', [f'{prefix}%'])
+        return cursor.rowcount
+
+
+def delete_seeded(seed, log=print):
+    """
+    Remove the solutions and posts an earlier run with the same seed created.
+    Like the inserts, the deletes send no signals, so rebuild_derived has to
+    run afterwards, as generate does.
+    """
+    posts = BlogPost.objects.filter(slug__startswith=f'benchmark-post-{seed}-')
+    RelatedPost.objects.filter(Q(post__in=posts) | Q(related__in=posts)).delete()
+    BlogPost.tag_set.through.objects.filter(blogpost__in=posts).delete()
+    for model, prefix in ((SoftwareSolution, f'benchmark-solution-{seed}-'), (BlogPost, f'benchmark-post-{seed}-')):
+        removed = _delete_by_slug_prefix(model, prefix)
+        if removed:
+            log(f"  Removed {removed} {model._meta.verbose_name_plural} from an earlier run")
+
+
+def _spread_created_at(model, first_id, now, rng, days):
+    """Give rows inserted after `first_id` creation times spread over the past `days`, oldest row first"""
+    # auto_now_add overwrites created_at on insert, so it is set afterwards
+    ids = list(model.objects.filter(id__gt=first_id).order_by('id').values_list('id', flat=True))
+    offsets = sorted((rng.uniform(0, days * 86400) for _ in ids), reverse=True)
+    model.objects.bulk_update(
+        [model(id=pk, created_at=now - datetime.timedelta(seconds=offset)) for pk, offset in zip(ids, offsets)],
+        ['created_at'], batch_size=BATCH_SIZE,
+    )
+
+
+def generate(volumes=None, seed=0, log=print):
+    """Bulk-insert synthetic content in the given volumes and rebuild derived data"""
+    volumes = {**DEFAULT_VOLUMES, **(volumes or {})}
+    delete_seeded(seed, log)
+    rng = random.Random(seed)
+    now = timezone.now()
+    image = _placeholder_image()
+    categories = [key for key, _ in BlogPost.CATEGORY_CHOICES]
+    gallery_categories = [key for key, _ in GalleryImage.CATEGORY_CHOICES]
+
+    _bulk_create(SoftwareSolution, (
+        SoftwareSolution(
+            title=f'Solution {i}', slug=f'benchmark-solution-{seed}-{i}', description=_paragraphs(rng, 2),
+            features=', '.join(rng.sample(WORDS, 5)), image=image,
+        )
+        for i in range(volumes['solutions'])
+    ), volumes['solutions'], log)
+
+    _bulk_create(CaseStudy, (
+        CaseStudy(
+            title=f'Case study {i}', client_name=f'Client {i}', industry=rng.choice(WORDS).capitalize(),
+            challenge=_paragraphs(rng, 1), solution=_paragraphs(rng, 2), results=_paragraphs(rng, 1), image=image,
+        )
+        for i in range(volumes['case_studies'])
+    ), volumes['case_studies'], log)
+
+    _bulk_create(Testimonial, (
+        Testimonial(
+            customer_name=f'Customer {i}', company=f'Company {i}', position='Director',
+            testimonial=_sentence(rng, 30), rating=rng.randint(3, 5),
+            date=(now - datetime.timedelta(days=rng.randint(0, 1000))).date(), is_approved=rng.random() < 0.8,
+        )
+        for i in range(volumes['testimonials'])
+    ), volumes['testimonials'], log)
+
+    tag_names = list(dict.fromkeys(f'{rng.choice(WORDS)} {rng.choice(WORDS)}' for _ in range(volumes['tags'] * 2)))
+    tag_names = tag_names[:volumes['tags']]
+    existing = set(Tag.objects.values_list('slug', flat=True))
+    Tag.objects.bulk_create([
+        Tag(name=name, slug=slugify(name)) for name in tag_names if slugify(name) not in existing
+    ])
+    tag_ids = dict(Tag.objects.filter(slug__in=[slugify(name) for name in tag_names]).values_list('slug', 'id'))
+
+    first_post = BlogPost.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    post_tags = [rng.sample(tag_names, min(rng.randint(1, 4), len(tag_names))) for _ in range(volumes['posts'])]
+    _bulk_create(BlogPost, (
+        BlogPost(
+            title=_sentence(rng, 6)[:-1], slug=f'benchmark-post-{seed}-{i}', content=_paragraphs(rng, 8),
+            featured_image=image if rng.random() < 0.7 else None, author=f'Author {rng.randint(1, 20)}',
+            category=rng.choice(categories), tags=', '.join(post_tags[i]), is_published=rng.random() < 0.95,
+        )
+        for i in range(volumes['posts'])
+    ), volumes['posts'], log)
+    _spread_created_at(BlogPost, first_post, now, rng, days=1000)
+    post_ids = list(BlogPost.objects.filter(id__gt=first_post).order_by('id').values_list('id', flat=True))
+    Through = BlogPost.tag_set.through
+    _bulk_create(Through, (
+        Through(blogpost_id=post_id, tag_id=tag_ids[slugify(name)])
+        for post_id, names in zip(post_ids, post_tags)
+        for name in names
+    ), sum(len(names) for names in post_tags), log)
+
+    _bulk_create(GalleryImage, (
+        GalleryImage(
+            title=f'Photo {i}', description=_sentence(rng, 12), image=image,
+            category=rng.choice(gallery_categories), event_name=f'Event {rng.randint(1, 100)}',
+            date=(now - datetime.timedelta(days=rng.randint(0, 2000))).date(),
+        )
+        for i in range(volumes['gallery'])
+    ), volumes['gallery'], log)
+
+    first_event = Event.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    dates = [now + datetime.timedelta(days=rng.randint(-700, 300), hours=rng.randint(8, 18)) for _ in range(volumes['events'])]
+    _bulk_create(Event, (
+        Event(
+            title=f'Event {i}', description=_paragraphs(rng, 2), date=date, location=rng.choice(LOCATIONS),
+            image=image, is_featured=rng.random() < 0.1, is_upcoming=date > now,
+        )
+        for i, date in enumerate(dates)
+    ), volumes['events'], log)
+    event_ids = list(Event.objects.filter(id__gt=first_event).values_list('id', flat=True))
+
+    first_inquiry = ContactInquiry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    _bulk_create(ContactInquiry, (
+        ContactInquiry(
+            name=f'Visitor {i}', email=f'visitor{i}@example.com', phone='01910000000',
+            company_name=f'Company {rng.randint(1, 5000)}', country=rng.choice(COUNTRIES),
+            job_title='Manager', job_details=_sentence(rng, 40), is_read=rng.random() < 0.6,
+        )
+        for i in range(volumes['inquiries'])
+    ), volumes['inquiries'], log)
+    _spread_created_at(ContactInquiry, first_inquiry, now, rng, days=365)
+
+    if event_ids:
+        _bulk_create(EventRegistration, (
+            EventRegistration(
+                event_id=rng.choice(event_ids), full_name=f'Attendee {i}', email=f'attendee{i}@example.com',
+                phone='01910000000', company=f'Company {rng.randint(1, 5000)}', job_title='Engineer',
+            )
+            for i in range(volumes['registrations'])
+        ), volumes['registrations'], log)
+
+    rebuild_derived(log)
+
+
+def rebuild_derived(log=print):
+    """Recompute everything the signals would have maintained for bulk-inserted rows"""
+    for model in (BlogPost, CaseStudy, SoftwareSolution):
+        log(f"  Content fields: {content.fill_derived(model, model.derived_fields())} {model._meta.verbose_name_plural}")
+    for model in search.SEARCH_FIELDS:
+        log(f"  Search index: {search.rebuild_index(model)} {model._meta.verbose_name_plural}")
+    log(f"  Related posts: {related.rebuild_related_posts()} posts")
+    log(f"  Inquiry statistics: {len(stats.reconcile_inquiry_stats())} counters")
+    log(f"  Retrieval index: {retrieval.rebuild_index()} passages")
+    log(f"  Media references: {len(blobs.recount_references())} blobs")
+    log(f"  Event seats: {registrations.recount_seats()} events")
+    invalidate_blog_sidebar()
+    for model in (SoftwareSolution, CaseStudy, Testimonial, Tag, BlogPost, GalleryImage, Event):
+        bump_model_version(model)
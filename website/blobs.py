@@ -0,0 +1,117 @@
+"""
+Reference counting for content-addressed media blobs.
+
+Each blob written by ContentAddressedStorage has a MediaBlob row counting
+the model rows whose image fields point at it. The count follows image
+field changes and deletions through signals, and a blob's file and its
+responsive renditions are removed once nothing references it any more. A
+row with no references is an upload's claim on the blob (see storage) that
+has not been counted yet, or that a failed upload left behind for
+recount_references to settle.
+"""
+import logging
+
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import F
+
+from .images import delete_derivatives
+from .models import MediaBlob
+from .storage import digest_from_name, media_storage
+
+logger = logging.getLogger(__name__)
+
+
+def image_fields(model):
+    """Names of the ImageFields declared on a model"""
+    return [field.name for field in model._meta.fields if isinstance(field, models.ImageField)]
+
+
+def image_models():
+    """Every installed model with at least one ImageField"""
+    return [model for model in apps.get_models() if image_fields(model)]
+
+
+def add_reference(name):
+    """Count one more row pointing at a blob"""
+    if not digest_from_name(name):
+        return
+    updated = MediaBlob.objects.filter(name=name).update(references=F('references') + 1)
+    if not updated:
+        size = media_storage.size(name) if media_storage.exists(name) else 0
+        blob, created = MediaBlob.objects.get_or_create(name=name, defaults={'size': size, 'references': 1})
+        if not created:
+            MediaBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+
+
+def release_reference(name):
+    """Count one row fewer pointing at a blob, deleting the blob when unused"""
+    if not digest_from_name(name):
+        return
+    with transaction.atomic():
+        MediaBlob.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+        unused = MediaBlob.objects.filter(name=name, references=0).delete()[0]
+    if unused:
+        transaction.on_commit(lambda: delete_if_unused(name))
+
+
+def delete_if_unused(name):
+    """Delete a blob's file and renditions unless an upload has claimed or referenced it again"""
+    with transaction.atomic():
+        # The release removed the row, so one that exists now was claimed by
+        # an upload of the same bytes. Creating it otherwise gives the lock
+        # an upload's claim waits on until the file is gone.
+        blob, created = MediaBlob.objects.select_for_update().get_or_create(name=name)
+        if not created:
+            return False
+        media_storage.delete(name)
+        delete_derivatives(digest_from_name(name))
+        blob.delete()
+    return True
+
+
+def snapshot_files(instance):
+    """Stored file names of an instance's image fields, before it is saved"""
+    fields = image_fields(type(instance))
+    if instance.pk is None or not fields:
+        return {}
+    return type(instance).objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+
+def instance_saved(instance, previous):
+    """Move references from the previous to the current image files"""
+    for field in image_fields(type(instance)):
+        old = previous.get(field) or ''
+        new = getattr(instance, field).name or ''
+        if old != new:
+            if new:
+                add_reference(new)
+            if old:
+                release_reference(old)
+
+
+def instance_deleted(instance):
+    """Release the image files of a deleted instance"""
+    for field in image_fields(type(instance)):
+        name = getattr(instance, field).name
+        if name:
+            release_reference(name)
+
+
+def recount_references():
+    """Recompute every blob's reference count from the model rows"""
+    counts = {}
+    for model in image_models():
+        for field in image_fields(model):
+            for name in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True):
+                if digest_from_name(name):
+                    counts[name] = counts.get(name, 0) + 1
+
+    with transaction.atomic():
+        MediaBlob.objects.exclude(name__in=counts).update(references=0)
+        for name, references in counts.items():
+            updated = MediaBlob.objects.filter(name=name).update(references=references)
+            if not updated:
+                size = media_storage.size(name) if media_storage.exists(name) else 0
+                MediaBlob.objects.create(name=name, size=size, references=references)
+    return counts
@@ -0,0 +1,67 @@
+"""
+Set-based bulk flag changes.
+
+Each action sets one boolean field on every selected row with a single
+UPDATE, skipping rows that already have the value. UPDATEs send no model
+signals, so the work the signals would have done row by row (inquiry
+statistics, page cache versions, the blog sidebar, related posts, the chatbot
+index) runs here once per batch. The admin actions and the JSON bulk
+endpoint both go through apply().
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, related, retrieval, sidebar, stats
+from .models import BlogPost, ContactInquiry, Event, Testimonial
+
+# Most ids the JSON endpoint accepts in one request
+MAX_BULK_IDS = 1000
+
+ACTIONS = {
+    'mark_read': (ContactInquiry, 'is_read', True),
+    'mark_unread': (ContactInquiry, 'is_read', False),
+    'approve': (Testimonial, 'is_approved', True),
+    'unapprove': (Testimonial, 'is_approved', False),
+    'publish': (BlogPost, 'is_published', True),
+    'unpublish': (BlogPost, 'is_published', False),
+    'feature': (Event, 'is_featured', True),
+    'unfeature': (Event, 'is_featured', False),
+}
+
+
+def _after_update(model, value, count, post_ids):
+    if model is ContactInquiry:
+        stats.apply_read_change(count if value else 0, 0 if value else count)
+        return
+    if model is BlogPost:
+        related.posts_changed(post_ids)
+        transaction.on_commit(sidebar.invalidate_blog_sidebar)
+        # Published posts join the chatbot index and unpublished ones leave it
+        transaction.on_commit(lambda: retrieval.refresh_sources(BlogPost, post_ids))
+    # Bumped after the commit, like the signal handlers do
+    transaction.on_commit(lambda: caching.bump_model_version(model))
+
+
+def apply(action, queryset=None, ids=None):
+    """
+    Run a bulk action on a queryset of its model (or on the rows with the
+    given ids) and return the number of rows it changed.
+    """
+    model, field, value = ACTIONS[action]
+    if queryset is None:
+        queryset = model.objects.filter(pk__in=ids)
+    changed = queryset.exclude(**{field: value})
+    values = {field: value}
+    if any(f.name == 'updated_at' for f in model._meta.get_fields()):
+        # Conditional GET validators come from updated_at
+        values['updated_at'] = timezone.now()
+
+    with transaction.atomic():
+        # Related posts are recomputed per post, so their ids are needed
+        post_ids = list(changed.values_list('pk', flat=True)) if model is BlogPost else None
+        if post_ids is not None:
+            changed = model.objects.filter(pk__in=post_ids)
+        count = changed.update(**values)
+        if count:
+            _after_update(model, value, count, post_ids)
+    return count
@@ -0,0 +1,121 @@
+"""
+Versioned page and fragment caching for the public site.
+
+Every model the public pages are built from has a version number in the
+cache, bumped by signals whenever a row is saved or deleted. Cache keys for
+whole responses and template fragments include the versions of the models
+they were rendered from, so an edit makes the old entries unreachable at once
+and nothing needs a TTL. Page keys are also salted with the deploy fingerprint
+used for ETags, so markup cached before a template change is not served
+after it, and a view whose content also changes with time names a `vary_on`
+callable whose result joins the key.
+
+Versions are bumped once the change commits, so for a moment after a commit
+the cache can still hold the old page while the ETag of conditional_page
+already describes the new rows. Code that records ETags alongside the body,
+like prerender_site, renders inside page_cache_bypassed().
+"""
+import contextvars
+import hashlib
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+from .conditional import deploy_salt
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', None)
+
+_bypassed = contextvars.ContextVar('website_page_cache_bypassed', default=False)
+
+
+def _version_key(model):
+    return f'website:model_version:{model._meta.label_lower}'
+
+
+def _resolve(model):
+    return apps.get_model(model) if isinstance(model, str) else model
+
+
+def model_versions(*models):
+    """Current version of each model, as a string usable in a cache key"""
+    models = [_resolve(model) for model in models]
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Start from the clock rather than 1 so a version lost from the
+            # cache never comes back as a number that was already used
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return '-'.join(str(versions[key]) for key in keys)
+
+
+def bump_model_version(model):
+    """Invalidate every cached page and fragment rendered from a model"""
+    key = _version_key(_resolve(model))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _page_key(request, models, vary_on=None):
+    parts = [deploy_salt(), request.build_absolute_uri()]
+    if vary_on is not None:
+        parts.append(str(vary_on(request)))
+    digest = hashlib.md5('\n'.join(parts).encode()).hexdigest()
+    return f'website:page:{digest}:{model_versions(*models)}'
+
+
+@contextmanager
+def page_cache_bypassed():
+    """Render pages from the database inside the block, without reading or storing cached copies"""
+    token = _bypassed.set(True)
+    try:
+        yield
+    finally:
+        _bypassed.reset(token)
+
+
+def _cacheable_request(request):
+    return (
+        not _bypassed.get()
+        and request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def cache_public_page(*models, vary_on=None):
+    """
+    Serve anonymous GET requests for a view from the cache until one of
+    `models` changes, or until `vary_on(request)` returns something else.
+    Responses that set cookies or embed a CSRF token are never stored.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if not _cacheable_request(request):
+                return view(request, *args, **kwargs)
+
+            key = _page_key(request, models, vary_on)
+            response = cache.get(key)
+            if response is not None:
+                return response
+
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            ):
+                cache.set(key, response, PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,210 @@
+"""
+Pluggable model providers for the site chatbot.
+
+A backend is a class with an async `stream(message)` generator that yields
+the reply piece by piece. The backend in use is named by the CHAT_BACKEND
+setting, so tests and local development can swap in EchoBackend instead of
+calling a real model. The default, GeminiBackend, streams from the Gemini
+REST API over a pooled async HTTP client, so concurrent chats share
+connections and are not capped by a thread pool. A system check reports a
+backend that cannot be imported as an error, and what a backend is missing
+(GeminiBackend's API key, say) as a warning, so management commands still
+run on installs without a key; the chat endpoint then answers with an error
+message until one is set.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+from .chat_cache import content_version, get_response_cache
+from .retrieval import build_prompt, retrieve
+
+DEFAULT_CHAT_BACKEND = 'website.chat_backends.GeminiBackend'
+
+GEMINI_STREAM_URL = 'https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent'
+
+# One pooled HTTP client per event loop, reused across chat requests
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Shared connection-pooling HTTP client for the running event loop"""
+    try:
+        import httpx
+    except ImportError as e:
+        raise ImproperlyConfigured('The Gemini chat backend requires the httpx package') from e
+
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(getattr(settings, 'CHAT_TIMEOUT', 30), connect=5),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        )
+        _clients[loop] = client
+    return client
+
+
+class ChatBackend:
+    """Base class for chat model providers"""
+
+    @classmethod
+    def check(cls):
+        """System check messages for anything the backend needs but is missing"""
+        return []
+
+    async def stream(self, message):
+        """Yield the reply to `message` in pieces"""
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def reply(self, message):
+        """The complete reply to `message`"""
+        return ''.join([chunk async for chunk in self.stream(message)])
+
+
+def _gemini_api_key():
+    return getattr(settings, 'GEMINI_API_KEY', None) or os.environ.get('GEMINI_API_KEY')
+
+
+class GeminiBackend(ChatBackend):
+    """Streams replies from the Gemini REST API over Server-Sent Events"""
+
+    def __init__(self):
+        self.api_key = _gemini_api_key()
+        self.model = getattr(settings, 'GEMINI_MODEL', 'gemini-1.5-flash')
+        if not self.api_key:
+            raise ImproperlyConfigured('Set GEMINI_API_KEY to use the Gemini chat backend')
+
+    @classmethod
+    def check(cls):
+        warnings = []
+        if not _gemini_api_key():
+            warnings.append(checks.Warning(
+                'GeminiBackend needs GEMINI_API_KEY; chat requests fail until it is set.',
+                hint='Set GEMINI_API_KEY, or point CHAT_BACKEND at another backend.',
+                id='website.W002',
+            ))
+        if importlib.util.find_spec('httpx') is None:
+            warnings.append(checks.Warning(
+                'GeminiBackend needs the httpx package; chat requests fail until it is installed.',
+                id='website.W003',
+            ))
+        return warnings
+
+    async def stream(self, message):
+        client = get_http_client()
+        payload = {'contents': [{'role': 'user', 'parts': [{'text': message}]}]}
+        async with client.stream(
+            'POST',
+            GEMINI_STREAM_URL.format(model=self.model),
+            params={'alt': 'sse', 'key': self.api_key},
+            json=payload,
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = json.loads(line[len('data:'):])
+                for candidate in data.get('candidates', []):
+                    for part in candidate.get('content', {}).get('parts', []):
+                        if part.get('text'):
+                            yield part['text']
+
+
+class EchoBackend(ChatBackend):
+    """Local fake provider that streams the message back word by word"""
+
+    delay = 0
+
+    async def stream(self, message):
+        for word in f'You said: {message}'.split(' '):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield word + ' '
+
+
+class GroundedChatBackend(ChatBackend):
+    """Prefixes each message with the most relevant passages of site content"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    async def stream(self, message):
+        passages = await sync_to_async(retrieve, thread_sensitive=False)(message)
+        async for chunk in self.backend.stream(build_prompt(message, passages)):
+            yield chunk
+
+
+class CachedChatBackend(ChatBackend):
+    """Answers repeated and near-duplicate questions from the response cache"""
+
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+
+    async def stream(self, message):
+        # Replies cached before the site content changed may be out of date
+        self.cache.track(await sync_to_async(content_version, thread_sensitive=False)())
+        reply = self.cache.get(message)
+        if reply is not None:
+            yield reply
+            return
+
+        chunks = []
+        async for chunk in self.backend.stream(message):
+            chunks.append(chunk)
+            yield chunk
+        # Only complete replies are cached; a timed out or disconnected
+        # stream never gets here
+        if chunks:
+            self.cache.set(message, ''.join(chunks))
+
+
+def get_chat_backend():
+    """Instantiate the backend named by the CHAT_BACKEND setting"""
+    backend = import_string(getattr(settings, 'CHAT_BACKEND', DEFAULT_CHAT_BACKEND))()
+    if getattr(settings, 'CHAT_RETRIEVAL_ENABLED', True):
+        backend = GroundedChatBackend(backend)
+    if getattr(settings, 'CHAT_CACHE_ENABLED', True):
+        backend = CachedChatBackend(backend, get_response_cache())
+    return backend
+
+
+@checks.register()
+def check_chat_backend(app_configs, **kwargs):
+    """Report a CHAT_BACKEND that cannot be loaded or is missing what it needs"""
+    path = getattr(settings, 'CHAT_BACKEND', DEFAULT_CHAT_BACKEND)
+    try:
+        backend_class = import_string(path)
+    except ImportError as e:
+        return [checks.Error(f'CHAT_BACKEND {path!r} cannot be imported: {e}', id='website.E001')]
+    return backend_class.check()
+
+
+async def stream_with_timeout(chunks, timeout):
+    """Re-yield `chunks`, giving up once `timeout` seconds have passed overall"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield chunk
+    finally:
+        # Closing the backend generator releases its upstream connection,
+        # including when the client disconnects and the response is cancelled
+        await chunks.aclose()
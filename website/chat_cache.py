@@ -0,0 +1,203 @@
+"""
+Response cache for the chatbot.
+
+Questions are normalized (case, punctuation, whitespace) and looked up
+exactly first. Failing that, a near-duplicate is found through an inverted
+index of character trigrams. It is accepted only when it asks about the same
+key terms (the words left after dropping stop words and plural endings) and
+its trigram Jaccard similarity reaches CHAT_CACHE_SIMILARITY, so rewordings
+match but "price of X" never gets the answer cached for "price of Y".
+
+Replies are grounded in the site content, so the cache is emptied when the
+page cache version of a model the chatbot indexes moves, that is once a save
+or delete of a solution, case study, event or blog post commits. Otherwise
+entries expire after CHAT_CACHE_TTL seconds, and the least recently used
+ones are evicted to stay within CHAT_CACHE_MAX_ENTRIES and
+CHAT_CACHE_MAX_BYTES. Hit rates are shown on the dashboard metrics page.
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+
+from .caching import model_versions
+from .search import STOP_WORDS
+
+NGRAM_SIZE = 3
+
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def content_version():
+    """Versions of the models chatbot replies are grounded in, as one string"""
+    from .retrieval import RETRIEVAL_FIELDS
+
+    return model_versions(*RETRIEVAL_FIELDS)
+
+
+def normalize(question):
+    """Canonical form of a question used as its exact cache key"""
+    return _SPACE_RE.sub(' ', _NON_WORD_RE.sub(' ', question.lower())).strip()
+
+
+def key_terms(text):
+    """Words of a normalized question that decide what it asks about"""
+    return frozenset(
+        word[:-1] if len(word) > 3 and word.endswith('s') else word
+        for word in text.split()
+        if len(word) > 1 and word not in STOP_WORDS
+    )
+
+
+def ngrams(text):
+    """Character trigrams of a normalized question"""
+    padded = f' {text} '
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class CacheEntry:
+    __slots__ = ('reply', 'grams', 'terms', 'expires', 'size')
+
+    def __init__(self, reply, grams, terms, expires, size):
+        self.reply = reply
+        self.grams = grams
+        self.terms = terms
+        self.expires = expires
+        self.size = size
+
+
+class ResponseCache:
+    """In-process LRU cache of chatbot replies with near-duplicate matching"""
+
+    def __init__(self, ttl=3600, max_entries=1000, max_bytes=2 * 1024 * 1024, similarity=0.8):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.similarity = similarity
+        self._entries = OrderedDict()
+        self._index = defaultdict(set)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self.counters = Counter()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for gram in entry.grams:
+            keys = self._index[gram]
+            keys.discard(key)
+            if not keys:
+                del self._index[gram]
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= now:
+            self._remove(key)
+            self.counters['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _similar(self, key, grams, terms, now):
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._index.get(gram, ()))
+        for candidate, overlap in shared.most_common():
+            entry = self._entries[candidate]
+            score = overlap / (len(grams) + len(entry.grams) - overlap)
+            if score < self.similarity:
+                # Similarity never exceeds overlap / len(grams), and candidates
+                # come in decreasing overlap, so no later one can match either
+                if overlap < self.similarity * len(grams):
+                    break
+                continue
+            if entry.terms == terms and self._live(candidate, now) is not None:
+                return entry
+        return None
+
+    def get(self, question):
+        """Cached reply for the question or a near-duplicate of it, or None"""
+        key = normalize(question)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(key, now)
+            if entry is not None:
+                self.counters['hits'] += 1
+                return entry.reply
+            if self.similarity < 1:
+                entry = self._similar(key, ngrams(key), key_terms(key), now)
+                if entry is not None:
+                    self.counters['similar_hits'] += 1
+                    return entry.reply
+            self.counters['misses'] += 1
+            return None
+
+    def set(self, question, reply):
+        """Store the reply to a question, evicting least recently used entries"""
+        key = normalize(question)
+        size = len(key.encode()) + len(reply.encode())
+        if not key or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            grams = ngrams(key)
+            self._entries[key] = CacheEntry(reply, grams, key_terms(key), time.monotonic() + self.ttl, size)
+            self._bytes += size
+            for gram in grams:
+                self._index[gram].add(key)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._entries.clear()
+        self._index.clear()
+        self._bytes = 0
+
+    def track(self, version):
+        """Drop every entry when `version` differs from the one seen last"""
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+
+    def stats(self):
+        """Hit/miss counters plus current size"""
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['similar_hits'] + self.counters['misses']
+            return {
+                **{name: self.counters[name] for name in ('hits', 'similar_hits', 'misses', 'evictions', 'expired')},
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hit_rate': (lookups - self.counters['misses']) / lookups if lookups else 0.0,
+            }
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    """The process-wide response cache, configured from settings"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            ttl=getattr(settings, 'CHAT_CACHE_TTL', 3600),
+            max_entries=getattr(settings, 'CHAT_CACHE_MAX_ENTRIES', 1000),
+            max_bytes=getattr(settings, 'CHAT_CACHE_MAX_BYTES', 2 * 1024 * 1024),
+            similarity=getattr(settings, 'CHAT_CACHE_SIMILARITY', 0.8),
+        )
+    return _response_cache
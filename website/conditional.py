@@ -0,0 +1,120 @@
+"""
+Conditional GET for the public pages.
+
+Each page names the querysets it is built from. The latest `updated_at` and
+the row count of every one of them are fetched together in a single UNION
+ALL of aggregates, and become the page's Last-Modified and ETag. A request
+whose validators still match gets a 304 without the view running at all.
+
+The ETag is salted with DEPLOY_VERSION (by default a fingerprint of the
+templates and the website code), so a deploy that changes the markup does
+not leave browsers on the old page. Requests from signed-in users, whose
+pages depend on who they are, are never answered with a 304.
+
+Pages that embed a CSRF token must not use conditional_page: the 304 is
+decided before the view runs, so nothing the page renders can opt out of
+it, and a 304 would keep the token of an earlier session in the browser. As
+a safeguard a full response that used a token is sent without validators,
+so browsers hold no ETag to revalidate such a page with.
+"""
+import hashlib
+import os
+from functools import lru_cache, wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Value
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+TIMESTAMP_FIELD = 'updated_at'
+
+FINGERPRINT_EXTENSIONS = ('.html', '.txt', '.py')
+
+
+@lru_cache(maxsize=None)
+def deploy_salt():
+    """DEPLOY_VERSION, or a digest of the template and website code files"""
+    version = getattr(settings, 'DEPLOY_VERSION', None)
+    if version is not None:
+        return str(version)
+    roots = [str(directory) for engine in settings.TEMPLATES for directory in engine.get('DIRS', [])]
+    roots.append(apps.get_app_config('website').path)
+    digest = hashlib.md5()
+    for root in roots:
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.endswith(FINGERPRINT_EXTENSIONS):
+                    path = os.path.join(directory, name)
+                    digest.update(os.path.relpath(path, root).encode())
+                    with open(path, 'rb') as source:
+                        digest.update(source.read())
+    return digest.hexdigest()
+
+
+def _aggregate(queryset, position):
+    # Grouping on a constant turns the aggregate into a values queryset
+    # that can take part in a UNION; the constant also tags each row
+    return (
+        queryset.order_by()
+        .annotate(_position=Value(position))
+        .values('_position')
+        .annotate(latest=Max(TIMESTAMP_FIELD), count=Count('pk'))
+        .values_list('_position', 'latest', 'count')
+    )
+
+
+def content_state(querysets):
+    """(Last-Modified datetime or None, quoted ETag) of a set of querysets"""
+    combined = _aggregate(querysets[0], 0)
+    if len(querysets) > 1:
+        combined = combined.union(
+            *[_aggregate(queryset, position) for position, queryset in enumerate(querysets[1:], 1)],
+            all=True,
+        )
+    rows = sorted(combined)
+    timestamps = [latest for _, latest, _ in rows if latest is not None]
+    signature = ';'.join([deploy_salt()] + [f'{latest.isoformat() if latest else ""}:{count}' for _, latest, count in rows])
+    return max(timestamps, default=None), quote_etag(hashlib.md5(signature.encode()).hexdigest())
+
+
+def conditional_page(*querysets):
+    """
+    Answer GET requests for a view with 304 Not Modified while `querysets`
+    are unchanged. Callables in `querysets` are called with the request, for
+    querysets that depend on it or on the current time. Not for pages that
+    render a CSRF token: the 304 is sent before the view runs.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            # Pending flash messages and signed-in users make the page differ
+            # from the one the validators describe
+            if (
+                request.method not in ('GET', 'HEAD')
+                or len(get_messages(request))
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+
+            last_modified, etag = content_state([
+                queryset(request) if callable(queryset) else queryset for queryset in querysets
+            ])
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                # A rendered CSRF token belongs to this session only; with no
+                # validators the browser never asks for a 304 of this page
+                if response.status_code != 200 or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                    return response
+            response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            # Let browsers keep the page but check back with the validators
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,76 @@
+"""
+Stored summaries and renderings of long text fields.
+
+List pages show a title and a short snippet, so BlogPost, CaseStudy and
+SoftwareSolution keep an `excerpt` of their main text, refreshed on save.
+Their list querysets (Model.objects.for_list()) defer the long text columns
+and read the excerpt instead, so a listing no longer transfers whole
+articles it only shows the first few words of.
+
+The other values templates used to work out from the text on every render
+are stored the same way: the escaped HTML of a post body, its word count and
+reading time, and the comma-separated tags and features as JSON lists. The
+functions here compute them, and the rebuild_content_fields command
+recomputes them for every row after the rules change.
+"""
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+
+# Enough for the longest snippet a template shows (truncatewords:30)
+EXCERPT_WORDS = 30
+
+WORDS_PER_MINUTE = 250
+
+BATCH_SIZE = 500
+
+
+def make_excerpt(text):
+    """Plain-text opening words of a text"""
+    return Truncator(strip_tags(text or '')).words(EXCERPT_WORDS)
+
+
+def render_html(text):
+    """Escaped text with its line breaks as paragraphs, as the linebreaks filter renders it"""
+    return linebreaks(text or '', autoescape=True)
+
+
+def split_list(text):
+    """Non-empty items of a comma-separated string"""
+    return [item.strip() for item in (text or '').split(',') if item.strip()]
+
+
+def count_words(text):
+    """Number of words, as the wordcount filter counts them"""
+    return len((text or '').split())
+
+
+def reading_time(text):
+    """Whole minutes it takes to read a text, at least one"""
+    return max((count_words(text) + WORDS_PER_MINUTE // 2) // WORDS_PER_MINUTE, 1)
+
+
+def fill_derived(model, fields):
+    """
+    Recompute stored fields of every row of a model, returning the number of
+    rows. `fields` maps each stored field to its (source field, function).
+    """
+    sources = {source for source, _ in fields.values()}
+    batch = []
+    count = 0
+    for instance in model.objects.only('pk', *sources).iterator(chunk_size=BATCH_SIZE):
+        for field, (source, compute) in fields.items():
+            setattr(instance, field, compute(getattr(instance, source)))
+        batch.append(instance)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, list(fields))
+            count += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, list(fields))
+        count += len(batch)
+    return count
+
+
+def fill_excerpts(model, source_field):
+    """Recompute the excerpt of every row of a model, returning the number of rows"""
+    return fill_derived(model, {'excerpt': (source_field, make_excerpt)})
@@ -1,5 +1,5 @@
 from django import forms
-from .models import ContactInquiry, Testimonial
+from .models import ContactInquiry, EventRegistration, Testimonial
 
 class ContactForm(forms.ModelForm):
     """Form for contact inquiries"""
@@ -38,6 +38,16 @@ class TestimonialForm(forms.ModelForm):
             'image': 'Your Photo (Optional)',
         }
 
+class EventRegistrationForm(forms.ModelForm):
+    """Form for event registrations, from the events pages or an import"""
+    class Meta:
+        model = EventRegistration
+        fields = ['full_name', 'email', 'phone', 'company', 'job_title']
+
+    def clean_email(self):
+        # One registration per address and event, however it is capitalised
+        return self.cleaned_data['email'].strip().lower()
+
 class LoginForm(forms.Form):
     """Form for admin login"""
     username = forms.CharField(
@@ -0,0 +1,80 @@
+"""
+Gallery listing helpers.
+
+The gallery is paged newest first with keyset cursors on (date, id), so every
+page, and every request of the infinite-scroll feed, is one indexed range scan
+of a fixed number of rows. The filter dropdowns (event names, years, months)
+would otherwise need three scans of the whole table on each request; they are
+computed once and cached under the GalleryImage version, so any upload or
+edit makes the cached lists unreachable and the next request rebuilds them.
+"""
+import calendar
+
+from django.core.cache import cache
+
+from .caching import model_versions
+from .models import GalleryImage
+
+GALLERY_IMAGES_PER_PAGE = 24
+GALLERY_PAGE_FIELDS = ('date', 'id')
+
+
+def _build_filter_options():
+    events = (
+        GalleryImage.objects.exclude(event_name=None).exclude(event_name='')
+        .order_by('event_name').values_list('event_name', flat=True).distinct()
+    )
+    years = GalleryImage.objects.dates('date', 'year', order='DESC')
+    month_numbers = {value.month for value in GalleryImage.objects.dates('date', 'month')}
+    return {
+        'events': list(events),
+        'years': [str(value.year) for value in years],
+        'months': [(f'{month:02d}', calendar.month_name[month]) for month in sorted(month_numbers)],
+    }
+
+
+def get_filter_options():
+    """Event names, years and (number, name) months that have gallery images"""
+    key = f'website:gallery_filters:{model_versions(GalleryImage)}'
+    options = cache.get(key)
+    if options is None:
+        options = _build_filter_options()
+        cache.set(key, options, None)
+    return options
+
+
+def _integer(value, low, high):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if low <= number <= high else None
+
+
+def filter_images(params):
+    """
+    Gallery images matching the category, event, year and month in a
+    request's query parameters, and the filters that were applied.
+    """
+    category = params.get('category')
+    event = params.get('event')
+    year = _integer(params.get('year'), 1, 9999)
+    month = _integer(params.get('month'), 1, 12)
+
+    images = GalleryImage.objects.all()
+    if category and category != 'all':
+        images = images.filter(category=category)
+    if event:
+        images = images.filter(event_name__icontains=event)
+    if year:
+        images = images.filter(date__year=year)
+    if month:
+        images = images.filter(date__month=month)
+
+    selected = {
+        'selected_category': category,
+        'selected_event': event,
+        'selected_year': str(year) if year else None,
+        'selected_month': f'{month:02d}' if month else None,
+    }
+    return images, selected
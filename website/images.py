@@ -0,0 +1,206 @@
+"""
+Responsive image derivatives.
+
+Uploaded images are resized into WebP and JPEG renditions at a fixed set of
+widths. Renditions are stored under MEDIA_ROOT/derivatives and named after
+the SHA-256 of the source file, so identical uploads share them and their
+URLs never change. The widths generated for each hash are written to a small
+JSON manifest beside the renditions, and kept in the cache as well so
+templates can build a srcset without touching the disk. After a cache flush
+the first render of an image reads its manifest back from storage; a
+missing manifest is remembered for MISSING_MANIFEST_TIMEOUT seconds, so pages
+showing an image without renditions do not open storage on every render.
+
+Renditions are generated once an instance's save commits, for the image
+fields whose file changed (and by the generate_image_derivatives command),
+never while a page renders: a template whose image has no manifest falls
+back to the original file.
+"""
+import hashlib
+import json
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models
+from PIL import Image, ImageOps
+
+from .storage import digest_from_name
+
+logger = logging.getLogger(__name__)
+
+RESPONSIVE_IMAGE_WIDTHS = getattr(settings, 'RESPONSIVE_IMAGE_WIDTHS', (160, 320, 640, 1280))
+DERIVATIVES_DIR = 'derivatives'
+
+# How long a missing manifest is remembered; generating renditions replaces
+# the entry at once, this only bounds how stale other processes' caches get
+MISSING_MANIFEST_TIMEOUT = 300
+
+# Pillow format name and save options for each rendition type
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _hash_key(name):
+    return f'website:image_hash:{name}'
+
+
+def _manifest_key(digest):
+    return f'website:image_derivatives:{digest}'
+
+
+def content_hash(field):
+    """SHA-256 of an image field's file, memoized in the cache by file name"""
+    # Content-addressed blobs carry their hash in the name
+    digest = digest_from_name(field.name) or cache.get(_hash_key(field.name))
+    if digest is None:
+        sha = hashlib.sha256()
+        with field.storage.open(field.name, 'rb') as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        cache.set(_hash_key(field.name), digest, None)
+    return digest
+
+
+def derivative_name(digest, width, extension):
+    return f'{DERIVATIVES_DIR}/{digest[:2]}/{digest}-{width}.{extension}'
+
+
+def manifest_name(digest):
+    return f'{DERIVATIVES_DIR}/{digest[:2]}/{digest}.json'
+
+
+def _read_manifest(digest):
+    try:
+        with default_storage.open(manifest_name(digest), 'rb') as source:
+            widths = json.load(source)['widths']
+    except (OSError, ValueError, KeyError):
+        # Cached as an empty list, which reads as "no renditions"
+        cache.set(_manifest_key(digest), [], MISSING_MANIFEST_TIMEOUT)
+        return None
+    cache.set(_manifest_key(digest), widths, None)
+    return widths
+
+
+def _render(image, width, extension):
+    rendition = image.copy()
+    rendition.thumbnail((width, width * 10), Image.LANCZOS)
+    pil_format, options = FORMATS[extension]
+    if pil_format == 'JPEG' and rendition.mode != 'RGB':
+        # JPEG has no alpha channel, so flatten onto white
+        background = Image.new('RGB', rendition.size, (255, 255, 255))
+        rendition = rendition.convert('RGBA')
+        background.paste(rendition, mask=rendition.split()[-1])
+        rendition = background
+    buffer = BytesIO()
+    rendition.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def ensure_derivatives(field):
+    """
+    Generate any missing renditions of an image field and return the widths
+    available for it, or None if the source cannot be read as an image.
+    """
+    if not field:
+        return None
+    try:
+        digest = content_hash(field)
+        widths = cache.get(_manifest_key(digest)) or _read_manifest(digest)
+        if widths is not None:
+            return digest, widths
+
+        with field.storage.open(field.name, 'rb') as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            image.load()
+        widths = sorted({min(width, image.width) for width in RESPONSIVE_IMAGE_WIDTHS})
+        for width in widths:
+            for extension in FORMATS:
+                name = derivative_name(digest, width, extension)
+                if not default_storage.exists(name):
+                    default_storage.save(name, ContentFile(_render(image, width, extension)))
+        # Written last, so a manifest on disk means every rendition exists
+        if not default_storage.exists(manifest_name(digest)):
+            default_storage.save(manifest_name(digest), ContentFile(json.dumps({'widths': widths}).encode()))
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning(f"Could not generate derivatives for {field.name}: {e}")
+        return None
+
+    cache.set(_manifest_key(digest), widths, None)
+    return digest, widths
+
+
+def delete_derivatives(digest):
+    """Remove every rendition and the manifest of the source with the given hash"""
+    directory = f'{DERIVATIVES_DIR}/{digest[:2]}'
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        files = []
+    for filename in files:
+        if filename.startswith(f'{digest}-') or filename == f'{digest}.json':
+            default_storage.delete(f'{directory}/{filename}')
+    cache.delete(_manifest_key(digest))
+
+
+def generated_derivatives(field):
+    """
+    The hash and widths of an image field's renditions if they have already
+    been generated, from the cache or the stored manifest, or None. Nothing
+    is hashed or resized here.
+    """
+    if not field:
+        return None
+    digest = digest_from_name(field.name) or cache.get(_hash_key(field.name))
+    if digest is None:
+        return None
+    widths = cache.get(_manifest_key(digest))
+    if widths is None:
+        widths = _read_manifest(digest)
+    if not widths:
+        return None
+    return digest, widths
+
+
+def srcset(field, extension='webp'):
+    """Return a srcset attribute value for an image field, or '' if unavailable"""
+    derivatives = generated_derivatives(field)
+    if derivatives is None:
+        return ''
+    digest, widths = derivatives
+    return ', '.join(
+        f'{default_storage.url(derivative_name(digest, width, extension))} {width}w'
+        for width in widths
+    )
+
+
+def derivative_url(field, width, extension='jpg'):
+    """URL of the smallest rendition at least `width` wide, falling back to the original"""
+    derivatives = generated_derivatives(field)
+    if derivatives is None:
+        return field.url if field else ''
+    digest, widths = derivatives
+    chosen = next((available for available in widths if available >= width), widths[-1])
+    return default_storage.url(derivative_name(digest, chosen, extension))
+
+
+def generate_for_instance(instance, previous=None):
+    """
+    Generate renditions for the image fields of a model instance, leaving out
+    those whose file name is the same as in `previous` (the stored names
+    before the save, as from blobs.snapshot_files).
+    """
+    previous = previous or {}
+    for field in instance._meta.fields:
+        if isinstance(field, models.ImageField):
+            file = getattr(instance, field.name)
+            if file and file.name != previous.get(field.name):
+                # The name may now point at different bytes, so hash it again
+                cache.delete(_hash_key(file.name))
+                ensure_derivatives(file)
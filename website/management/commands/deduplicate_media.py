@@ -0,0 +1,77 @@
+import hashlib
+import os
+
+from django.core.management.base import BaseCommand
+
+from website.blobs import image_fields, image_models, recount_references
+from website.images import DERIVATIVES_DIR
+from website.storage import BLOB_DIR, TEMP_DIR, digest_from_name, media_storage
+
+
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class Command(BaseCommand):
+    help = 'Move uploaded media into content-addressed blobs and remove duplicate copies'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without touching files or rows')
+        parser.add_argument('--prune', action='store_true', help='Also delete unreferenced files that duplicate a stored blob')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        migrated = set()
+        moved = 0
+
+        # Point every row at the blob holding its file's bytes
+        for model in image_models():
+            for field in image_fields(model):
+                rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                for pk, name in rows.values_list('pk', field).iterator():
+                    if digest_from_name(name):
+                        continue
+                    if not media_storage.exists(name):
+                        self.stderr.write(f"Missing file for {model.__name__} #{pk}: {name}")
+                        continue
+                    if not dry_run:
+                        with media_storage.open(name, 'rb') as content:
+                            blob = media_storage.save(name, content)
+                        model.objects.filter(pk=pk).update(**{field: blob})
+                    migrated.add(name)
+                    moved += 1
+
+        if dry_run:
+            self.stdout.write(f"Would move {moved} references from {len(migrated)} files into blobs")
+        else:
+            counts = recount_references()
+            self.stdout.write(f"Moved {moved} references into blobs; {len(counts)} blobs are in use")
+
+        # Remove the original files now that nothing points at them, plus
+        # (with --prune) any other unreferenced copy of a stored blob
+        blob_digests = set()
+        blob_root = media_storage.path(BLOB_DIR)
+        for _, _, files in os.walk(blob_root):
+            blob_digests.update(digest_from_name(f'{BLOB_DIR}/{name[:2]}/{name}') for name in files)
+
+        skipped = {BLOB_DIR, DERIVATIVES_DIR, TEMP_DIR}
+        removed = freed = 0
+        for root, dirs, files in os.walk(media_storage.location):
+            if root == media_storage.location:
+                dirs[:] = [directory for directory in dirs if directory not in skipped]
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(path, media_storage.location).replace(os.sep, '/')
+                if name not in migrated and not (options['prune'] and _file_hash(path) in blob_digests):
+                    continue
+                freed += os.path.getsize(path)
+                removed += 1
+                if not dry_run:
+                    media_storage.delete(name)
+
+        verb = 'Would remove' if dry_run else 'Removed'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} duplicate files ({freed / 1024 / 1024:.1f} MB)."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from website.images import generate_for_instance
+from website.models import BlogPost, CaseStudy, Event, GalleryImage, SoftwareSolution, Testimonial
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive image renditions for every uploaded image'
+
+    def handle(self, *args, **options):
+        for model in (GalleryImage, BlogPost, Testimonial, CaseStudy, Event, SoftwareSolution):
+            count = 0
+            for instance in model.objects.iterator(chunk_size=500):
+                generate_for_instance(instance)
+                count += 1
+            self.stdout.write(f"Processed {count} {model._meta.verbose_name_plural}")
+        self.stdout.write(self.style.SUCCESS('Image derivatives generated.'))
@@ -0,0 +1,41 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from website.models import Event
+from website.registrations import IMPORT_BATCH_SIZE, import_registrations
+
+# Errors listed in full before the rest are only counted
+SHOWN_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = 'Register attendees for an event from a CSV file with full_name, email, phone, company and job_title columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+        parser.add_argument('csv_file', help="Path of the CSV file, or '-' for standard input")
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help=f'Rows per INSERT (default: {IMPORT_BATCH_SIZE})')
+
+    def handle(self, *args, **options):
+        event = Event.objects.filter(pk=options['event_id']).first()
+        if event is None:
+            raise CommandError(f"Event {options['event_id']} does not exist.")
+
+        if options['csv_file'] == '-':
+            counts, errors = import_registrations(event, csv.DictReader(sys.stdin), options['batch_size'])
+        else:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as source:
+                counts, errors = import_registrations(event, csv.DictReader(source), options['batch_size'])
+
+        for position, fields in list(errors.items())[:SHOWN_ERRORS]:
+            details = '; '.join(f"{field}: {' '.join(messages)}" for field, messages in fields.items())
+            self.stderr.write(f"Row {position}: {details}")
+        if len(errors) > SHOWN_ERRORS:
+            self.stderr.write(f"... and {len(errors) - SHOWN_ERRORS} more invalid rows")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Registered {counts['created']} attendees for {event.title}: {counts['duplicate']} duplicates, "
+            f"{counts['full']} over capacity, {counts['invalid']} invalid."
+        ))
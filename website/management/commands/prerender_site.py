@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from website.prerender import default_output_dir, render_site
+
+
+class Command(BaseCommand):
+    help = 'Render the read-only public pages into a static tree for nginx, re-rendering only changed pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Directory to write the pages to (default: PRERENDER_ROOT)')
+        parser.add_argument('--host', default='localhost', help='Host name the pages are requested with; must be in ALLOWED_HOSTS')
+        parser.add_argument('--full', action='store_true', help='Render every page even if it has not changed')
+
+    def handle(self, *args, **options):
+        output = options['output'] or default_output_dir()
+        counts = render_site(output, host=options['host'], full=options['full'])
+        self.stdout.write(
+            f"{counts['unchanged']} pages unchanged, {counts['skipped']} left dynamic, "
+            f"{counts['removed']} removed"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rendered {counts['rendered']} pages into {output}."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from website.notifications import BATCH_SIZE, process_due_jobs, purge_sent
+
+
+class Command(BaseCommand):
+    help = 'Send queued notification emails, polling for new ones unless --once is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no notifications are due (for cron)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Emails per batch (default: {BATCH_SIZE})')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to wait when the queue is empty (default: 5)')
+        parser.add_argument('--purge-days', type=int, default=30, help='Delete sent notifications older than this (default: 30)')
+
+    def handle(self, *args, **options):
+        purged = purge_sent(options['purge_days'])
+        if purged:
+            self.stdout.write(f"Purged {purged} sent notifications.")
+
+        while True:
+            counts = process_due_jobs(options['batch_size'])
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Sent {counts['sent']}, retrying {counts['retried']}, failed {counts['failed']}."
+                )
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from website.caching import bump_model_version
+from website.content import fill_derived
+from website.models import BlogPost, CaseStudy, SoftwareSolution
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored excerpts, rendered HTML, tag and feature lists and reading times of all content'
+
+    def handle(self, *args, **options):
+        for model in (BlogPost, CaseStudy, SoftwareSolution):
+            count = fill_derived(model, model.derived_fields())
+            # bulk_update sends no signals, so invalidate cached pages here
+            bump_model_version(model)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} {model._meta.verbose_name_plural}."))
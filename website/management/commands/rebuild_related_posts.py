@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from website.related import rebuild_related_posts
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed related posts of every blog post'
+
+    def handle(self, *args, **options):
+        count = rebuild_related_posts()
+        self.stdout.write(self.style.SUCCESS(f'Recomputed related posts for {count} blog posts.'))
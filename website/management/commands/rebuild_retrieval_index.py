@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from website.retrieval import index_path, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Re-embed site content into the chatbot retrieval index'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} passages into {index_path()}."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from website.search import SEARCH_FIELDS, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for blog posts, case studies and solutions'
+
+    def handle(self, *args, **options):
+        for model in SEARCH_FIELDS:
+            count = rebuild_index(model)
+            self.stdout.write(f"Indexed {count} {model._meta.verbose_name_plural}")
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from website.stats import reconcile_inquiry_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized inquiry statistics from the inquiry table (run periodically, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        counts = reconcile_inquiry_stats()
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {len(counts)} inquiry statistics counters.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from website.caching import bump_model_version
+from website.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Flip the stored is_upcoming flag of events whose date has passed (run from cron)'
+
+    def handle(self, *args, **options):
+        count = Event.objects.refresh_upcoming()
+        if count:
+            # A bulk UPDATE sends no signals, so invalidate cached pages here
+            bump_model_version(Event)
+        self.stdout.write(self.style.SUCCESS(f"Updated the status of {count} events."))
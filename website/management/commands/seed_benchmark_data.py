@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from website.benchmark_data import DEFAULT_VOLUMES, generate
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic content for benchmarking (use a dedicated database)'
+
+    def add_arguments(self, parser):
+        for name, volume in DEFAULT_VOLUMES.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=volume, help=f'Rows to create (default: {volume})')
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every volume, e.g. 0.01 for a quick run')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed produces the same data')
+
+    def handle(self, *args, **options):
+        volumes = {name: max(int(options[name] * options['scale']), 1) for name in DEFAULT_VOLUMES}
+        generate(volumes, seed=options['seed'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS('Benchmark data generated.'))
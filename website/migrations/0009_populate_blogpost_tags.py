@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def populate_tags(apps, schema_editor):
+    """Split the comma-separated tags of existing posts into Tag rows"""
+    BlogPost = apps.get_model('website', 'BlogPost')
+    Tag = apps.get_model('website', 'Tag')
+    for post in BlogPost.objects.exclude(tags=''):
+        tags = []
+        for name in post.tags.split(','):
+            name = name.strip()
+            slug = slugify(name)
+            if slug:
+                tag, _ = Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+                tags.append(tag)
+        post.tag_set.set(tags)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0008_tag_blogpost_tag_set'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:28
+
+import website.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0011_relatedpost'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, storage=website.storage.content_addressed_storage, upload_to='blog/'),
+        ),
+        migrations.AlterField(
+            model_name='casestudy',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=website.storage.content_addressed_storage, upload_to='case_studies/'),
+        ),
+        migrations.AlterField(
+            model_name='event',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=website.storage.content_addressed_storage, upload_to='events/'),
+        ),
+        migrations.AlterField(
+            model_name='galleryimage',
+            name='image',
+            field=models.ImageField(storage=website.storage.content_addressed_storage, upload_to='gallery/'),
+        ),
+        migrations.AlterField(
+            model_name='softwaresolution',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=website.storage.content_addressed_storage, upload_to='solutions/'),
+        ),
+        migrations.AlterField(
+            model_name='testimonial',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=website.storage.content_addressed_storage, upload_to='testimonials/'),
+        ),
+    ]
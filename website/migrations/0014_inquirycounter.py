@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:30
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def populate_inquiry_counters(apps, schema_editor):
+    """Count the inquiries already stored, as reconcile_inquiry_stats does"""
+    ContactInquiry = apps.get_model('website', 'ContactInquiry')
+    InquiryCounter = apps.get_model('website', 'InquiryCounter')
+    inquiries = ContactInquiry.objects.all()
+    counts = {
+        ('total', ''): inquiries.count(),
+        ('unread', ''): inquiries.filter(is_read=False).count(),
+    }
+    for row in inquiries.values('country').annotate(count=Count('id')):
+        counts[('country', row['country'])] = row['count']
+    for row in inquiries.annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')):
+        counts[('day', row['day'].isoformat())] = row['count']
+    InquiryCounter.objects.bulk_create([
+        InquiryCounter(dimension=dimension, value=value, count=count)
+        for (dimension, value), count in counts.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0013_contactinquiry_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InquiryCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(blank=True, max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='unique_inquiry_counter')],
+            },
+        ),
+        migrations.RunPython(populate_inquiry_counters, migrations.RunPython.noop),
+    ]
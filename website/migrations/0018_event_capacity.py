@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:47
+
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Lower
+
+
+def deduplicate_registrations(apps, schema_editor):
+    """Keep the first registration of each email per event and count the seats they take"""
+    Event = apps.get_model('website', 'Event')
+    EventRegistration = apps.get_model('website', 'EventRegistration')
+    EventRegistration.objects.update(email=Lower('email'))
+    duplicates = (
+        EventRegistration.objects.values('event', 'email')
+        .annotate(first=Min('id'), count=Count('id'))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        EventRegistration.objects.filter(event=row['event'], email=row['email']).exclude(id=row['first']).delete()
+
+    seats = (
+        EventRegistration.objects.filter(event=OuterRef('pk'))
+        .order_by().values('event').annotate(count=Count('id')).values('count')
+    )
+    Event.objects.update(seats_taken=Coalesce(Subquery(seats), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0017_event_status_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Leave blank for unlimited seats', null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='seats_taken',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(deduplicate_registrations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='eventregistration',
+            constraint=models.UniqueConstraint(fields=('event', 'email'), name='unique_event_registration'),
+        ),
+    ]
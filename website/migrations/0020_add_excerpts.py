@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:53
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+# A copy of website.content as it was when this migration was written, so
+# later changes to the live rules do not change what the migration does
+EXCERPT_WORDS = 30
+BATCH_SIZE = 500
+
+
+def fill_excerpts(model, source_field):
+    batch = []
+    for instance in model.objects.only('pk', source_field).iterator(chunk_size=BATCH_SIZE):
+        instance.excerpt = Truncator(strip_tags(getattr(instance, source_field) or '')).words(EXCERPT_WORDS)
+        batch.append(instance)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, ['excerpt'])
+
+
+def populate_excerpts(apps, schema_editor):
+    """Store the excerpt of every existing post, case study and solution"""
+    fill_excerpts(apps.get_model('website', 'BlogPost'), 'content')
+    fill_excerpts(apps.get_model('website', 'CaseStudy'), 'challenge')
+    fill_excerpts(apps.get_model('website', 'SoftwareSolution'), 'description')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0019_notificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='casestudy',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='softwaresolution',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(populate_excerpts, migrations.RunPython.noop),
+    ]
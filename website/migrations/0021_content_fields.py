@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:55
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+# A copy of website.content as it was when this migration was written, so
+# later changes to the live rules do not change what the migration does
+WORDS_PER_MINUTE = 250
+BATCH_SIZE = 500
+
+
+def render_html(text):
+    return linebreaks(text or '', autoescape=True)
+
+
+def split_list(text):
+    return [item.strip() for item in (text or '').split(',') if item.strip()]
+
+
+def count_words(text):
+    return len((text or '').split())
+
+
+def reading_time(text):
+    return max((count_words(text) + WORDS_PER_MINUTE // 2) // WORDS_PER_MINUTE, 1)
+
+
+def fill_derived(model, fields):
+    """Recompute stored fields of every row; `fields` maps each to its (source field, function)"""
+    sources = {source for source, _ in fields.values()}
+    batch = []
+    for instance in model.objects.only('pk', *sources).iterator(chunk_size=BATCH_SIZE):
+        for field, (source, compute) in fields.items():
+            setattr(instance, field, compute(getattr(instance, source)))
+        batch.append(instance)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, list(fields))
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, list(fields))
+
+
+def populate_content_fields(apps, schema_editor):
+    """Render the stored fields of every existing post and solution"""
+    fill_derived(apps.get_model('website', 'BlogPost'), {
+        'content_html': ('content', render_html),
+        'word_count': ('content', count_words),
+        'reading_time': ('content', reading_time),
+        'tag_list': ('tags', split_list),
+    })
+    fill_derived(apps.get_model('website', 'SoftwareSolution'), {'feature_list': ('features', split_list)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0020_add_excerpts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='tag_list',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='softwaresolution',
+            name='feature_list',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.RunPython(populate_content_fields, migrations.RunPython.noop),
+    ]
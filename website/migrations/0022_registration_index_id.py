@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0021_content_fields'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='eventregistration',
+            name='registration_event_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['event', '-registered_at', '-id'], name='registration_event_date_idx'),
+        ),
+    ]
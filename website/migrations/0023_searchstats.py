@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:02
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_search_stats(apps, schema_editor):
+    """Total up the documents already in the search index"""
+    SearchDocument = apps.get_model('website', 'SearchDocument')
+    SearchStats = apps.get_model('website', 'SearchStats')
+    totals = SearchDocument.objects.values('model_name').annotate(count=Count('id'), total_length=Sum('length'))
+    SearchStats.objects.bulk_create([
+        SearchStats(model_name=row['model_name'], count=row['count'], total_length=row['total_length'] or 0)
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website', '0022_registration_index_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=50, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('total_length', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_search_stats, migrations.RunPython.noop),
+    ]
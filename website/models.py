@@ -1,17 +1,67 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, Q
 from django.utils import timezone
+from django.utils.text import slugify
 from django.core.validators import MinValueValidator, MaxValueValidator
 from autoslug import AutoSlugField
 
+from .content import count_words, make_excerpt, reading_time, render_html, split_list
+from .storage import content_addressed_storage
+
 # Create your models here.
 
-class SoftwareSolution(models.Model):
+class ListQuerySet(models.QuerySet):
+    """QuerySet with a lean variant for list pages"""
+
+    def for_list(self):
+        """Leave out the long text columns that list pages show only the excerpt of"""
+        return self.defer(*self.model.LIST_DEFERRED_FIELDS)
+
+class ExcerptModel(models.Model):
+    """Abstract base for content with a stored excerpt and other values derived from its text"""
+    EXCERPT_SOURCE = None
+    # Further stored fields refreshed on save, as {field: (source field, function)}
+    DERIVED_FIELDS = {}
+    LIST_DEFERRED_FIELDS = ()
+
+    excerpt = models.TextField(blank=True, editable=False)
+
+    objects = ListQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def derived_fields(cls):
+        return {'excerpt': (cls.EXCERPT_SOURCE, make_excerpt), **cls.DERIVED_FIELDS}
+
+    def save(self, *args, **kwargs):
+        # A row loaded without a source field keeps the values derived from it
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        refreshed = set()
+        for field, (source, compute) in self.derived_fields().items():
+            if source in deferred:
+                continue
+            setattr(self, field, compute(getattr(self, source)))
+            if update_fields is not None and source in update_fields:
+                refreshed.add(field)
+        if refreshed:
+            kwargs['update_fields'] = {*update_fields, *refreshed}
+        super().save(*args, **kwargs)
+
+class SoftwareSolution(ExcerptModel):
     """Model for software solutions offered by AI-Solution"""
+    EXCERPT_SOURCE = 'description'
+    DERIVED_FIELDS = {'feature_list': ('features', split_list)}
+    LIST_DEFERRED_FIELDS = ('description', 'features')
+
     title = models.CharField(max_length=200)
     slug = AutoSlugField(populate_from='title', unique=True, always_update=False, max_length=200, null=True, blank=True)
     description = models.TextField()
-    image = models.ImageField(upload_to='solutions/', blank=True, null=True)
+    image = models.ImageField(upload_to='solutions/', blank=True, null=True, storage=content_addressed_storage)
     features = models.TextField()
+    feature_list = models.JSONField(default=list, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -20,16 +70,20 @@ class SoftwareSolution(models.Model):
     
   
 
-class CaseStudy(models.Model):
+class CaseStudy(ExcerptModel):
     """Model for past solutions/case studies"""
+    EXCERPT_SOURCE = 'challenge'
+    LIST_DEFERRED_FIELDS = ('challenge', 'solution', 'results')
+
     title = models.CharField(max_length=200)
     client_name = models.CharField(max_length=200)
     industry = models.CharField(max_length=100)
     challenge = models.TextField()
     solution = models.TextField()
     results = models.TextField()
-    image = models.ImageField(upload_to='case_studies/', blank=True, null=True)
+    image = models.ImageField(upload_to='case_studies/', blank=True, null=True, storage=content_addressed_storage)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.title} - {self.client_name}"
@@ -44,15 +98,42 @@ class Testimonial(models.Model):
     position = models.CharField(max_length=100)
     testimonial = models.TextField()
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
-    image = models.ImageField(upload_to='testimonials/', blank=True, null=True)
+    image = models.ImageField(upload_to='testimonials/', blank=True, null=True, storage=content_addressed_storage)
     date = models.DateField(default=timezone.now)
     is_approved = models.BooleanField(default=False, help_text="Testimonial needs admin approval before being displayed")
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.customer_name} - {self.company}"
 
-class BlogPost(models.Model):
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date'], condition=Q(is_approved=True), name='testimonial_approved_date_idx'),
+        ]
+
+class Tag(models.Model):
+    """Model for normalized blog post tags"""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['name']
+
+class BlogPost(ExcerptModel):
     """Model for blog posts/articles"""
+    EXCERPT_SOURCE = 'content'
+    DERIVED_FIELDS = {
+        'content_html': ('content', render_html),
+        'word_count': ('content', count_words),
+        'reading_time': ('content', reading_time),
+        'tag_list': ('tags', split_list),
+    }
+    LIST_DEFERRED_FIELDS = ('content', 'content_html')
+
     CATEGORY_CHOICES = [
         ('ai_technology', 'AI Technology'),
         ('machine_learning', 'Machine Learning'),
@@ -66,10 +147,15 @@ class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     slug = AutoSlugField(populate_from='title', unique=True, max_length=200, null=True, blank=True)
     content = models.TextField()
-    featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    content_html = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False, help_text="Minutes")
+    featured_image = models.ImageField(upload_to='blog/', blank=True, null=True, storage=content_addressed_storage)
     author = models.CharField(max_length=100)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='ai_technology')
     tags = models.CharField(max_length=200, blank=True, help_text="Comma-separated tags")
+    tag_list = models.JSONField(default=list, blank=True, editable=False)
+    tag_set = models.ManyToManyField(Tag, related_name='posts', blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
@@ -79,9 +165,38 @@ class BlogPost(models.Model):
         
     def get_tags_list(self):
         """Return tags as a list"""
-        if self.tags:
-            return [tag.strip() for tag in self.tags.split(',')]
-        return []
+        return split_list(self.tags)
+
+    def sync_tags(self):
+        """Mirror the comma-separated tags string into the Tag relation"""
+        tags = []
+        for name in self.get_tags_list():
+            slug = slugify(name)
+            if slug:
+                tag, _ = Tag.objects.get_or_create(slug=slug, defaults={'name': name})
+                tags.append(tag)
+        self.tag_set.set(tags)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], condition=Q(is_published=True), name='blogpost_published_idx'),
+            models.Index(fields=['category', '-created_at'], condition=Q(is_published=True), name='blogpost_category_idx'),
+        ]
+
+class RelatedPost(models.Model):
+    """Model for the precomputed related-post neighbours of a blog post"""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_links')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    def __str__(self):
+        return f"{self.post} -> {self.related} ({self.score:.2f})"
+
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'related'], name='unique_related_post'),
+        ]
 
 class GalleryImage(models.Model):
     """Model for photo gallery images"""
@@ -96,24 +211,62 @@ class GalleryImage(models.Model):
     
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
-    image = models.ImageField(upload_to='gallery/')
+    image = models.ImageField(upload_to='gallery/', storage=content_addressed_storage)
     category = models.CharField(max_length=50, choices=CATEGORY_CHOICES, default='events')
     event_name = models.CharField(max_length=200, blank=True, null=True)
     date = models.DateField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return self.title
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='gallery_date_id_idx'),
+            models.Index(fields=['category', '-date', '-id'], name='gallery_category_date_idx'),
+        ]
+
+class EventQuerySet(models.QuerySet):
+    """Upcoming and past are decided by the event date at query time"""
+
+    def upcoming(self, now=None):
+        return self.filter(date__gt=now or timezone.now())
+
+    def past(self, now=None):
+        return self.filter(date__lte=now or timezone.now())
+
+    def with_status(self, now=None):
+        """Annotate `upcoming`, which unlike the stored flag is never stale"""
+        return self.annotate(
+            upcoming=ExpressionWrapper(Q(date__gt=now or timezone.now()), output_field=models.BooleanField())
+        )
+
+    def refresh_upcoming(self, now=None):
+        """Bring every stale is_upcoming flag in line with the date in one UPDATE"""
+        now = now or timezone.now()
+        stale = self.filter(
+            Q(is_upcoming=True, date__lte=now) | Q(is_upcoming=False, date__gt=now)
+        )
+        return stale.update(
+            is_upcoming=ExpressionWrapper(Q(date__gt=now), output_field=models.BooleanField()),
+            updated_at=now,
+        )
+
 class Event(models.Model):
     """Model for upcoming events"""
     title = models.CharField(max_length=200)
     description = models.TextField()
     date = models.DateTimeField()
     location = models.CharField(max_length=200)
-    image = models.ImageField(upload_to='events/', blank=True, null=True)
+    image = models.ImageField(upload_to='events/', blank=True, null=True, storage=content_addressed_storage)
     registration_link = models.URLField(blank=True, null=True)
     is_featured = models.BooleanField(default=False)
     is_upcoming = models.BooleanField(default=True)
+    capacity = models.PositiveIntegerField(blank=True, null=True, help_text="Leave blank for unlimited seats")
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
     
     def __str__(self):
         return self.title
@@ -123,6 +276,15 @@ class Event(models.Model):
         self.is_upcoming = self.date > timezone.now()
         super().save(*args, **kwargs)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='event_date_idx'),
+            models.Index(fields=['date'], condition=Q(is_featured=True), name='event_featured_date_idx'),
+            models.Index(fields=['location', 'date'], name='event_location_date_idx'),
+            # Finds the events refresh_upcoming still has to flip
+            models.Index(fields=['date'], condition=Q(is_upcoming=True), name='event_upcoming_date_idx'),
+        ]
+
 class ContactInquiry(models.Model):
     """Model for contact form submissions"""
     name = models.CharField(max_length=100)
@@ -140,6 +302,10 @@ class ContactInquiry(models.Model):
     
     class Meta:
         verbose_name_plural = "Contact Inquiries"
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='inquiry_created_id_idx'),
+            models.Index(fields=['-created_at'], condition=Q(is_read=False), name='inquiry_unread_created_idx'),
+        ]
     
 class EventRegistration(models.Model):
     """Model for event registrations"""
@@ -153,3 +319,114 @@ class EventRegistration(models.Model):
     
     def __str__(self):
         return f"{self.full_name} - {self.event.title}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'email'], name='unique_event_registration'),
+        ]
+        indexes = [
+            models.Index(fields=['event', '-registered_at', '-id'], name='registration_event_date_idx'),
+        ]
+
+class SearchDocument(models.Model):
+    """Model for a document in the full-text search index"""
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    length = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model_name} #{self.object_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'object_id'], name='unique_search_document'),
+        ]
+
+class SearchPosting(models.Model):
+    """Model for a term occurrence in the full-text search index"""
+    model_name = models.CharField(max_length=50)
+    object_id = models.PositiveBigIntegerField()
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.term} ({self.model_name} #{self.object_id})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_name', 'object_id', 'term'], name='unique_search_posting'),
+        ]
+        indexes = [
+            models.Index(fields=['model_name', 'term'], name='search_posting_term_idx'),
+        ]
+
+class SearchStats(models.Model):
+    """Model for the document count and total length of one model's search index"""
+    model_name = models.CharField(max_length=50, unique=True)
+    count = models.IntegerField(default=0)
+    total_length = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.model_name}: {self.count} documents"
+
+class MediaBlob(models.Model):
+    """Model for a content-addressed media file and the rows referencing it"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.references} references)"
+
+class InquiryCounter(models.Model):
+    """Model for materialized contact inquiry statistics"""
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=100, blank=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.dimension}:{self.value} = {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='unique_inquiry_counter'),
+        ]
+
+class NotificationJob(models.Model):
+    """Model for an outgoing email waiting in the notification queue"""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    KIND_CHOICES = [
+        ('event_confirmation', 'Event confirmation'),
+        ('inquiry_alert', 'New inquiry alert'),
+        ('testimonial_alert', 'Testimonial moderation alert'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    claimed_by = models.UUIDField(blank=True, null=True, editable=False)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {', '.join(self.recipients)} ({self.status})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], condition=Q(status='pending'), name='notification_due_idx'),
+            models.Index(fields=['claimed_by'], name='notification_claim_idx'),
+        ]
@@ -0,0 +1,150 @@
+"""
+Email notification queue.
+
+Views never talk to the mail server. They add a NotificationJob row in the
+same transaction as the change it reports, and the process_notifications
+worker sends due jobs in batches over a single mail connection. A worker
+claims a batch by stamping it with a token and moving run_after past a lease,
+so several workers can run side by side, and the jobs of a worker that dies
+are picked up again once the lease runs out. A failed send is retried with
+exponential backoff until NOTIFICATION_MAX_ATTEMPTS, then marked failed.
+"""
+import datetime
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import NotificationJob
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = getattr(settings, 'NOTIFICATION_MAX_ATTEMPTS', 5)
+# Seconds before the first retry, doubled for every further attempt
+RETRY_DELAY = getattr(settings, 'NOTIFICATION_RETRY_DELAY', 60)
+MAX_RETRY_DELAY = 6 * 60 * 60
+# Seconds a claimed batch is reserved for its worker
+LEASE = getattr(settings, 'NOTIFICATION_LEASE', 300)
+
+
+def staff_recipients():
+    """Addresses of the people alerted about new inquiries and testimonials"""
+    recipients = getattr(settings, 'NOTIFICATION_RECIPIENTS', None)
+    if recipients is None:
+        recipients = [email for _, email in getattr(settings, 'ADMINS', [])]
+    return list(recipients)
+
+
+def enqueue(kind, subject, template, context, recipients):
+    """Queue an email rendered from a text template; nothing is queued without recipients"""
+    if not recipients:
+        return None
+    context = {'site_url': getattr(settings, 'SITE_URL', ''), **context}
+    return NotificationJob.objects.create(
+        kind=kind, subject=subject, body=render_to_string(template, context), recipients=list(recipients),
+    )
+
+
+def event_confirmation(registration):
+    event = registration.event
+    return enqueue(
+        'event_confirmation', f"Your registration for {event.title}",
+        'website/emails/event_confirmation.txt', {'registration': registration, 'event': event},
+        [registration.email],
+    )
+
+
+def inquiry_alert(inquiry):
+    return enqueue(
+        'inquiry_alert', f"New inquiry from {inquiry.name} ({inquiry.company_name})",
+        'website/emails/inquiry_alert.txt',
+        {'inquiry': inquiry, 'dashboard_url': reverse('website:admin_dashboard')},
+        staff_recipients(),
+    )
+
+
+def testimonial_alert(testimonial):
+    return enqueue(
+        'testimonial_alert', f"Testimonial from {testimonial.customer_name} awaiting approval",
+        'website/emails/testimonial_alert.txt',
+        {'testimonial': testimonial, 'admin_url': reverse('admin:website_testimonial_change', args=[testimonial.pk])},
+        staff_recipients(),
+    )
+
+
+def retry_delay(attempts):
+    return datetime.timedelta(seconds=min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY))
+
+
+def claim_due_jobs(batch_size=BATCH_SIZE, now=None):
+    """Reserve up to `batch_size` due jobs for this worker and return them"""
+    now = now or timezone.now()
+    token = uuid.uuid4()
+    due = list(
+        NotificationJob.objects.filter(status=NotificationJob.PENDING, run_after__lte=now)
+        .order_by('run_after').values_list('pk', flat=True)[:batch_size]
+    )
+    if not due:
+        return []
+    # Rows another worker claimed in the meantime no longer match run_after__lte
+    NotificationJob.objects.filter(
+        pk__in=due, status=NotificationJob.PENDING, run_after__lte=now
+    ).update(claimed_by=token, run_after=now + datetime.timedelta(seconds=LEASE))
+    return list(NotificationJob.objects.filter(claimed_by=token))
+
+
+def process_due_jobs(batch_size=BATCH_SIZE, now=None):
+    """Send one batch of due notifications; returns counts of sent, retried and failed jobs"""
+    now = now or timezone.now()
+    counts = {'sent': 0, 'retried': 0, 'failed': 0}
+    jobs = claim_due_jobs(batch_size, now)
+    if not jobs:
+        return counts
+
+    mail = get_connection()
+    connection_error = None
+    try:
+        mail.open()
+    except Exception as error:
+        connection_error = error
+
+    for job in jobs:
+        job.attempts += 1
+        job.claimed_by = None
+        try:
+            if connection_error is not None:
+                raise connection_error
+            EmailMessage(job.subject, job.body, None, job.recipients, connection=mail).send()
+        except Exception as error:
+            job.last_error = f'{type(error).__name__}: {error}'
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status = NotificationJob.FAILED
+                counts['failed'] += 1
+                logger.error("Giving up on notification %s after %s attempts: %s", job.pk, job.attempts, job.last_error)
+            else:
+                job.run_after = now + retry_delay(job.attempts)
+                counts['retried'] += 1
+        else:
+            job.status = NotificationJob.SENT
+            job.sent_at = timezone.now()
+            job.last_error = ''
+            counts['sent'] += 1
+
+    if connection_error is None:
+        mail.close()
+    NotificationJob.objects.bulk_update(
+        jobs, ['status', 'attempts', 'run_after', 'claimed_by', 'last_error', 'sent_at']
+    )
+    return counts
+
+
+def purge_sent(days):
+    """Delete jobs sent more than `days` days ago"""
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    deleted, _ = NotificationJob.objects.filter(status=NotificationJob.SENT, sent_at__lt=cutoff).delete()
+    return deleted
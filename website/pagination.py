@@ -0,0 +1,107 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the sort key of their first or last row instead of an
+offset, so each page is one indexed range scan of `per_page + 1` rows however
+deep into the list it is. Querysets are paged newest first on a tuple of
+fields that must end in a unique one (usually the primary key).
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of a keyset-paginated queryset"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(instance, fields):
+    """Opaque URL-safe cursor for the sort key of a row"""
+    values = [_json_value(getattr(instance, field)) for field in fields]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(model, fields, cursor):
+    """Sort key encoded in a cursor, or None if the cursor is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(fields):
+            return None
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+    except (binascii.Error, ValueError, TypeError, ValidationError):
+        return None
+
+
+def _beyond(fields, values, lookup):
+    """Rows strictly past the given key in (field1, field2, ...) order"""
+    condition = Q()
+    for position, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        for previous, value in zip(fields[:position], values[:position]):
+            step &= Q(**{previous: value})
+        condition |= step
+    return condition
+
+
+def keyset_paginate(queryset, fields, after=None, before=None, per_page=25):
+    """
+    Return the page of `queryset` (ordered by `fields`, descending) that
+    follows the `after` cursor, precedes the `before` cursor, or else the
+    first page.
+    """
+    model = queryset.model
+    descending = [f'-{field}' for field in fields]
+    ascending = list(fields)
+
+    before_key = decode_cursor(model, fields, before) if before else None
+    after_key = decode_cursor(model, fields, after) if after and before_key is None else None
+
+    if before_key is not None:
+        rows = list(queryset.filter(_beyond(fields, before_key, 'gt')).order_by(*ascending)[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_previous, has_next = has_more, True
+    else:
+        if after_key is not None:
+            queryset = queryset.filter(_beyond(fields, after_key, 'lt'))
+        rows = list(queryset.order_by(*descending)[:per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = after_key is not None
+
+    if not rows:
+        return KeysetPage([])
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], fields) if has_next else None,
+        previous_cursor=encode_cursor(rows[0], fields) if has_previous else None,
+    )
@@ -0,0 +1,138 @@
+"""
+Static pre-rendering of the public site.
+
+Every read-only public URL, including each solution, case study and blog
+post, the blog's category and tag filters, and every page of each listing,
+is fetched through the normal Django stack and written into a directory tree
+that nginx serves directly:
+
+    map $args $prerendered_args { "" ""; default "--$args"; }
+
+    location / {
+        root /path/to/prerendered;
+        try_files $uri/index$prerendered_args.html @django;
+    }
+
+Anything not found in the tree falls through to Django. That covers
+contact, testimonials, events, chat and searches. A manifest of the ETag
+each page was rendered with lets later runs send If-None-Match, so only
+pages whose querysets changed are rendered again. Pages are rendered past
+the page cache, which can briefly lag the ETag after a commit; a stale body
+written under a fresh ETag would never be rendered again.
+"""
+import json
+import math
+import os
+import tempfile
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+
+from .caching import page_cache_bypassed
+from .models import BlogPost, CaseStudy, SoftwareSolution
+from .sidebar import get_blog_sidebar
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def default_output_dir():
+    return getattr(settings, 'PRERENDER_ROOT', os.path.join(settings.BASE_DIR, 'prerendered'))
+
+
+def _listing_urls(path, params, count, per_page):
+    """The unpaginated URL of a listing plus one URL per page, in the query order the templates link with"""
+    yield path, urlencode(params, quote_via=quote)
+    for page in range(1, max(math.ceil(count / per_page), 1) + 1):
+        yield path, urlencode([('page', page), *params], quote_via=quote)
+
+
+def public_urls():
+    """(path, query string) of every page that can be served statically"""
+    from .views import BLOG_POSTS_PER_PAGE
+
+    yield reverse('website:home'), ''
+    yield reverse('website:solutions'), ''
+    for slug in SoftwareSolution.objects.exclude(slug=None).values_list('slug', flat=True):
+        yield reverse('website:solution_detail', args=[slug]), ''
+    yield reverse('website:case_studies'), ''
+    for pk in CaseStudy.objects.values_list('pk', flat=True):
+        yield reverse('website:case_study_detail', args=[pk]), ''
+    yield reverse('website:gallery'), ''
+
+    blog = reverse('website:blog')
+    sidebar = get_blog_sidebar()
+    yield from _listing_urls(blog, [], sidebar['total_posts'], BLOG_POSTS_PER_PAGE)
+    for category, count in sidebar['category_counts'].items():
+        yield from _listing_urls(blog, [('category', category)], count, BLOG_POSTS_PER_PAGE)
+    for tag, count in sidebar['tag_counts'].items():
+        yield from _listing_urls(blog, [('tag', tag)], count, BLOG_POSTS_PER_PAGE)
+    for slug in BlogPost.objects.filter(is_published=True).exclude(slug=None).values_list('slug', flat=True):
+        yield reverse('website:blog_post_detail', args=[slug]), ''
+
+
+def output_name(path, query):
+    """File a page is written to, relative to the output directory"""
+    suffix = f'--{query}' if query else ''
+    return os.path.join(path.strip('/'), f'index{suffix}.html')
+
+
+def _write(target, content):
+    # Renamed into place so nginx never serves a half-written file
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            output.write(content)
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, target)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def render_site(output_dir, host='localhost', full=False):
+    """
+    Render every public page into `output_dir`, skipping pages whose ETag
+    still matches the last run unless `full` is set. Returns counts of
+    rendered, unchanged, skipped and removed pages.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if not full and os.path.exists(manifest_path):
+        with open(manifest_path) as source:
+            manifest = json.load(source)
+
+    client = Client(HTTP_HOST=host)
+    counts = {'rendered': 0, 'unchanged': 0, 'skipped': 0, 'removed': 0}
+    rendered = {}
+    for path, query in dict.fromkeys(public_urls()):
+        name = output_name(path, query)
+        url = f'{path}?{query}' if query else path
+        previous = manifest.get(name)
+        headers = {'HTTP_IF_NONE_MATCH': previous} if previous and os.path.exists(os.path.join(output_dir, name)) else {}
+        with page_cache_bypassed():
+            response = client.get(url, **headers)
+        client.cookies.clear()
+
+        if response.status_code == 304:
+            rendered[name] = previous
+            counts['unchanged'] += 1
+        elif response.status_code == 200 and not response.cookies:
+            _write(os.path.join(output_dir, name), response.content)
+            rendered[name] = response.get('ETag')
+            counts['rendered'] += 1
+        else:
+            # Errors, redirects and pages that set a cookie (a CSRF token for
+            # a form, say) have to stay dynamic
+            counts['skipped'] += 1
+
+    for name in set(manifest) - set(rendered):
+        target = os.path.join(output_dir, name)
+        if os.path.exists(target):
+            os.remove(target)
+            counts['removed'] += 1
+
+    _write(manifest_path, json.dumps(rendered, indent=2, sort_keys=True).encode())
+    return counts
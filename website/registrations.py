@@ -0,0 +1,114 @@
+"""
+Event registration intake with capacity control.
+
+A seat is claimed with a conditional UPDATE of the event row, which only
+increments seats_taken while it is below capacity, in the same transaction as
+the registration insert. Concurrent registrations therefore never overbook an
+event, and a duplicate rejected by the unique (event, email) constraint hands
+its seat back when the transaction rolls back.
+
+Imports of many attendees (CSV files, API payloads) are validated row by row
+but written in batches: each batch locks the event row once, drops addresses
+that are already registered, trims itself to the seats left and goes in with
+a single bulk INSERT.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .forms import EventRegistrationForm
+from .models import Event, EventRegistration
+
+# Also keeps the email__in lookup of a batch under SQLite's variable limit
+IMPORT_BATCH_SIZE = 500
+
+
+class RegistrationError(Exception):
+    pass
+
+
+class EventFull(RegistrationError):
+    pass
+
+
+class AlreadyRegistered(RegistrationError):
+    pass
+
+
+def _claim_seats(event_id, count):
+    """Add `count` to seats_taken if they fit, returning whether they did"""
+    return Event.objects.filter(pk=event_id).filter(
+        Q(capacity=None) | Q(capacity__gte=F('seats_taken') + count)
+    ).update(seats_taken=F('seats_taken') + count) == 1
+
+
+def register(event, cleaned_data):
+    """Take a seat at `event` and save the registration, or raise RegistrationError"""
+    try:
+        with transaction.atomic():
+            if not _claim_seats(event.pk, 1):
+                raise EventFull(f"{event.title} is fully booked.")
+            return EventRegistration.objects.create(event=event, **cleaned_data)
+    except IntegrityError:
+        raise AlreadyRegistered(f"{cleaned_data['email']} is already registered for {event.title}.")
+
+
+def release_seat(event_id):
+    """Give back the seat of a deleted registration"""
+    Event.objects.filter(pk=event_id, seats_taken__gt=0).update(seats_taken=F('seats_taken') - 1)
+
+
+def _import_batch(event, registrations, counts):
+    with transaction.atomic():
+        locked = Event.objects.select_for_update().only('capacity', 'seats_taken').get(pk=event.pk)
+        existing = set(
+            EventRegistration.objects.filter(event=event, email__in=list(registrations))
+            .values_list('email', flat=True)
+        )
+        new = [registration for email, registration in registrations.items() if email not in existing]
+        counts['duplicate'] += len(registrations) - len(new)
+        if locked.capacity is not None:
+            seats = max(locked.capacity - locked.seats_taken, 0)
+            counts['full'] += max(len(new) - seats, 0)
+            new = new[:seats]
+        if new:
+            EventRegistration.objects.bulk_create(new)
+            Event.objects.filter(pk=event.pk).update(seats_taken=F('seats_taken') + len(new))
+        counts['created'] += len(new)
+
+
+def import_registrations(event, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Register attendees for `event` from an iterable of field dicts. Returns
+    counts of created, duplicate, full (no seat left) and invalid rows, and
+    the validation errors of invalid rows keyed by their 1-based position.
+    """
+    counts = {'created': 0, 'duplicate': 0, 'full': 0, 'invalid': 0}
+    errors = {}
+    batch = {}
+    for position, row in enumerate(rows, 1):
+        form = EventRegistrationForm(row)
+        if not form.is_valid():
+            counts['invalid'] += 1
+            errors[position] = {field: list(messages) for field, messages in form.errors.items()}
+            continue
+        email = form.cleaned_data['email']
+        if email in batch:
+            counts['duplicate'] += 1
+            continue
+        batch[email] = EventRegistration(event=event, **form.cleaned_data)
+        if len(batch) >= batch_size:
+            _import_batch(event, batch, counts)
+            batch = {}
+    if batch:
+        _import_batch(event, batch, counts)
+    return counts, errors
+
+
+def recount_seats():
+    """Recompute seats_taken of every event from its registrations"""
+    registrations = (
+        EventRegistration.objects.filter(event=OuterRef('pk'))
+        .order_by().values('event').annotate(count=Count('id')).values('count')
+    )
+    return Event.objects.update(seats_taken=Coalesce(Subquery(registrations), 0))
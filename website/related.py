@@ -0,0 +1,174 @@
+"""
+Precomputed related posts.
+
+Posts are scored against each other by the Jaccard overlap of their tag sets
+plus a bonus for sharing a category. The top neighbours of every published
+post are stored as RelatedPost rows, so the detail page reads a short,
+already ordered list. When a post's category, tags or published state change,
+the post and the posts whose neighbour lists it can affect are recomputed once
+the save commits; other edits leave the lists alone.
+
+The work per save is bounded: a post is scored against at most
+MAX_CANDIDATES posts (those sharing the most tags with it), and at most
+MAX_AFFECTED other posts are recomputed besides the ones that listed it. Lists
+the bounds leave stale are repaired by the rebuild_related_posts command.
+"""
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .models import BlogPost, RelatedPost
+
+RELATED_POSTS_LIMIT = 3
+CATEGORY_WEIGHT = 0.25
+# Posts a single post is scored against
+MAX_CANDIDATES = 200
+# Posts sharing a tag or category recomputed after a single save
+MAX_AFFECTED = 200
+
+PostTag = BlogPost.tag_set.through
+
+
+def score(tags, category, other_tags, other_category):
+    """Similarity of two posts given their tag id sets and categories"""
+    union = len(tags | other_tags)
+    jaccard = len(tags & other_tags) / union if union else 0.0
+    return jaccard + (CATEGORY_WEIGHT if category == other_category else 0.0)
+
+
+def _tag_ids(post_ids):
+    tags = {post_id: set() for post_id in post_ids}
+    for post_id, tag_id in PostTag.objects.filter(blogpost_id__in=post_ids).values_list('blogpost_id', 'tag_id'):
+        tags[post_id].add(tag_id)
+    return tags
+
+
+def _sharing_tags(tags, limit, exclude=None):
+    """Ids of up to `limit` published posts sharing the most of `tags`"""
+    rows = PostTag.objects.filter(tag_id__in=tags, blogpost__is_published=True)
+    if exclude is not None:
+        rows = rows.exclude(blogpost_id=exclude)
+    return (
+        rows.values('blogpost_id').annotate(shared=Count('tag_id'))
+        .order_by('-shared', '-blogpost_id').values_list('blogpost_id', flat=True)[:limit]
+    )
+
+
+def compute_neighbours(post):
+    """Recompute and store the related posts of a single post"""
+    with transaction.atomic():
+        RelatedPost.objects.filter(post=post).delete()
+        if not post.is_published:
+            return []
+
+        tags = _tag_ids([post.pk])[post.pk]
+        # Candidates share the most tags with the post, or are the newest in
+        # the category
+        candidate_ids = set(_sharing_tags(tags, MAX_CANDIDATES, exclude=post.pk))
+        candidate_ids.update(
+            BlogPost.objects.filter(is_published=True, category=post.category)
+            .exclude(pk=post.pk).order_by('-created_at')
+            .values_list('pk', flat=True)[:RELATED_POSTS_LIMIT]
+        )
+        candidates = (
+            BlogPost.objects.filter(pk__in=candidate_ids, is_published=True)
+            .values_list('pk', 'category', 'created_at')
+        )
+        candidate_tags = _tag_ids(candidate_ids)
+
+        scored = sorted(
+            (
+                (score(tags, post.category, candidate_tags[pk], category), created_at, pk)
+                for pk, category, created_at in candidates
+            ),
+            reverse=True,
+        )[:RELATED_POSTS_LIMIT]
+        links = RelatedPost.objects.bulk_create([
+            RelatedPost(post=post, related_id=pk, score=value) for value, _, pk in scored if value > 0
+        ])
+    return links
+
+
+def snapshot_post(post):
+    """Capture the stored category, tags, published state and referrers of a post before it changes"""
+    if post.pk is None:
+        return None
+    row = BlogPost.objects.filter(pk=post.pk).values('category', 'is_published').first()
+    if row is None:
+        return None
+    referrers = set(RelatedPost.objects.filter(related=post.pk).values_list('post_id', flat=True))
+    return row['category'], _tag_ids([post.pk])[post.pk], row['is_published'], referrers
+
+
+def _affected_posts(post_ids, categories, tags, limit=None):
+    """Posts other than `post_ids` whose neighbour lists may change when those posts change"""
+    affected = set(_sharing_tags(tags, limit))
+    # Category-only neighbours score CATEGORY_WEIGHT, so only posts whose
+    # lists are short or no better than that can take the post in
+    affected.update(
+        BlogPost.objects.filter(is_published=True, category__in=categories)
+        .annotate(neighbours=Count('related_links'), lowest=Min('related_links__score'))
+        .filter(Q(neighbours__lt=RELATED_POSTS_LIMIT) | Q(lowest__lte=CATEGORY_WEIGHT))
+        .order_by('-created_at').values_list('pk', flat=True)[:limit]
+    )
+    return affected - set(post_ids)
+
+
+def _recompute(post, previous):
+    categories = {post.category}
+    tags = _tag_ids([post.pk])[post.pk]
+    affected = set()
+    if previous is not None:
+        categories.add(previous[0])
+        tags |= previous[1]
+        affected = previous[3]
+    affected |= _affected_posts([post.pk], categories, tags, MAX_AFFECTED)
+    compute_neighbours(post)
+    for other in BlogPost.objects.filter(pk__in=affected):
+        compute_neighbours(other)
+
+
+def post_saved(post, previous):
+    """Recompute the saved post and the posts it can affect once the save commits"""
+    if previous is not None and previous[:3] == (post.category, _tag_ids([post.pk])[post.pk], post.is_published):
+        return
+    transaction.on_commit(lambda: _recompute(post, previous))
+
+
+def _recompute_deleted(post_id, previous):
+    # The cascade has removed every link to the post by now, so the posts
+    # that listed it come from the snapshot taken before the delete
+    affected = previous[3] | _affected_posts([post_id], {previous[0]}, previous[1], MAX_AFFECTED)
+    for other in BlogPost.objects.filter(pk__in=affected):
+        compute_neighbours(other)
+
+
+def post_deleted(post, previous):
+    """Recompute the posts that could have listed a deleted post once the delete commits"""
+    if previous is None:
+        return
+    # The delete clears post.pk before the callback runs
+    post_id = post.pk
+    transaction.on_commit(lambda: _recompute_deleted(post_id, previous))
+
+
+def posts_changed(post_ids):
+    """Recompute posts changed by a bulk update, and every post they can affect, in one pass"""
+    posts = list(BlogPost.objects.filter(pk__in=post_ids))
+    if not posts:
+        return
+    tags = set().union(*_tag_ids(post_ids).values())
+    affected = set(RelatedPost.objects.filter(related__in=post_ids).values_list('post_id', flat=True))
+    affected |= _affected_posts(post_ids, {post.category for post in posts}, tags)
+    for post in posts:
+        compute_neighbours(post)
+    for other in BlogPost.objects.filter(pk__in=affected - set(post_ids)):
+        compute_neighbours(other)
+
+
+def rebuild_related_posts():
+    """Recompute the related posts of every post"""
+    count = 0
+    for post in BlogPost.objects.iterator(chunk_size=500):
+        compute_neighbours(post)
+        count += 1
+    return count
@@ -0,0 +1,316 @@
+"""
+Retrieval over site content for the chatbot.
+
+Solutions, case studies, events and published blog posts are split into
+overlapping word windows, and each window is embedded as a hashed bag of
+words and bigrams. The vectors live in a single NumPy matrix saved to
+RETRIEVAL_INDEX_PATH (retrieval_index.npz in BASE_DIR by default, ignored by
+git), which is updated for one object at a time when it is saved or deleted.
+Every update rewrites the whole file, a few megabytes per thousand chunks,
+synchronously in the save's on_commit callback, so the request that saved
+waits for the write. Bulk changes go through refresh_sources to pay that
+once. Writers hold a lock file beside the index, so concurrent saves in
+several worker processes apply one after another, and every process reloads
+the matrix when the file on disk changes. A query is embedded the
+same way and scored against the whole matrix with one dot product, which
+takes milliseconds for thousands of chunks, and the best passages are
+prepended to the chatbot prompt.
+"""
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.urls import reverse
+
+from .models import BlogPost, CaseStudy, Event, SoftwareSolution
+from .search import tokenize
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialised within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Fields whose text is indexed for each model, title first
+RETRIEVAL_FIELDS = {
+    SoftwareSolution: ('title', 'description', 'features'),
+    CaseStudy: ('title', 'client_name', 'industry', 'challenge', 'solution', 'results'),
+    Event: ('title', 'location', 'description'),
+    BlogPost: ('title', 'tags', 'content'),
+}
+
+def indexed_objects(model):
+    """The rows of a model the chatbot may quote; drafts stay out of the index"""
+    if model is BlogPost:
+        return model.objects.filter(is_published=True)
+    return model.objects.all()
+
+
+def is_indexed(instance):
+    return getattr(instance, 'is_published', True)
+
+
+# URL name and the attribute filling its single argument, for each model
+SOURCE_URLS = {
+    SoftwareSolution: ('website:solution_detail', 'slug'),
+    CaseStudy: ('website:case_study_detail', 'pk'),
+    Event: ('website:event_detail', 'pk'),
+    BlogPost: ('website:blog_post_detail', 'slug'),
+}
+
+EMBEDDING_DIM = 1024
+CHUNK_WORDS = 120
+CHUNK_OVERLAP = 30
+
+TOP_K = getattr(settings, 'CHAT_RETRIEVAL_TOP_K', 4)
+MIN_SCORE = getattr(settings, 'CHAT_RETRIEVAL_MIN_SCORE', 0.1)
+
+PROMPT_TEMPLATE = (
+    "You are the assistant on the AI-Solution website. Answer the visitor's "
+    "question briefly using the site content below, and point to the page it "
+    "came from when that helps. If the content does not cover the question, "
+    "say so in one sentence.\n\n{context}\n\nQuestion: {message}"
+)
+
+
+def index_path():
+    return getattr(settings, 'RETRIEVAL_INDEX_PATH', os.path.join(settings.BASE_DIR, 'retrieval_index.npz'))
+
+
+def embed(text):
+    """Unit-length hashed bag-of-words and bigrams vector of a text"""
+    tokens = tokenize(text)
+    features = Counter(tokens)
+    features.update(f'{first} {second}' for first, second in zip(tokens, tokens[1:]))
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature, count in features.items():
+        # crc32 rather than hash() so vectors are stable across processes;
+        # the top bit picks a sign so collisions tend to cancel out
+        bucket = zlib.crc32(feature.encode())
+        sign = -1.0 if bucket & 0x80000000 else 1.0
+        vector[bucket % EMBEDDING_DIM] += sign * (1 + math.log(count))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_chunks(chunks):
+    """Matrix with one embedded row per chunk"""
+    vectors = np.zeros((len(chunks), EMBEDDING_DIM), dtype=np.float32)
+    for row, chunk in enumerate(chunks):
+        vectors[row] = embed(f"{chunk['title']}\n{chunk['text']}")
+    return vectors
+
+
+def source_key(instance):
+    return f'{instance._meta.label_lower}:{instance.pk}'
+
+
+def chunk_instance(instance):
+    """Passages of a model instance, each carrying its title and URL"""
+    fields = RETRIEVAL_FIELDS[type(instance)]
+    title = getattr(instance, fields[0]) or ''
+    words = ' '.join(str(getattr(instance, field) or '') for field in fields[1:]).split()
+    url_name, attribute = SOURCE_URLS[type(instance)]
+    url = reverse(url_name, args=[getattr(instance, attribute)]) if getattr(instance, attribute) else ''
+
+    step = CHUNK_WORDS - CHUNK_OVERLAP
+    return [
+        {'source': source_key(instance), 'title': title, 'url': url, 'text': ' '.join(words[start:start + CHUNK_WORDS])}
+        for start in range(0, max(len(words) - CHUNK_OVERLAP, 1), step)
+    ]
+
+
+class VectorIndex:
+    """Chunk metadata plus a row-aligned matrix of unit vectors"""
+
+    def __init__(self, chunks=None, vectors=None):
+        self.chunks = chunks or []
+        self.vectors = vectors if vectors is not None else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with np.load(path) as data:
+            return cls(json.loads(str(data['chunks'])), data['vectors'])
+
+    def save(self, path):
+        # Written beside the target and renamed over it, so readers in other
+        # processes never see a half-written index
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.npz')
+        try:
+            with os.fdopen(fd, 'wb') as target:
+                np.savez(target, vectors=self.vectors, chunks=np.array(json.dumps(self.chunks)))
+            # mkstemp creates the file readable by its owner only, and the
+            # other workers may run as a different user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @classmethod
+    def build(cls, chunks):
+        return cls(chunks, embed_chunks(chunks))
+
+    def replace(self, sources):
+        """
+        A copy with the rows of the given sources swapped for freshly embedded
+        chunks; `sources` maps source keys to their new (possibly empty) chunks.
+        """
+        keep = [position for position, chunk in enumerate(self.chunks) if chunk['source'] not in sources]
+        chunks = [chunk for source_chunks in sources.values() for chunk in source_chunks]
+        return VectorIndex(
+            [self.chunks[position] for position in keep] + chunks,
+            np.vstack([self.vectors[keep], embed_chunks(chunks)]),
+        )
+
+    def search(self, vector, k):
+        """(score, chunk) pairs of the k rows closest to a unit vector"""
+        if not self.chunks:
+            return []
+        scores = self.vectors @ vector
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[position]), self.chunks[position]) for position in best]
+
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_loaded = {'signature': None, 'index': VectorIndex()}
+
+
+def _signature(path):
+    # Every save renames a new file into place, so the inode changes even
+    # when two writes land within the file system's mtime resolution
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def get_index():
+    """The index on disk, reloaded only when another process has replaced it"""
+    path = index_path()
+    signature = _signature(path)
+    with _lock:
+        if signature != _loaded['signature']:
+            _loaded['index'] = VectorIndex.load(path) if signature else VectorIndex()
+            _loaded['signature'] = signature
+        return _loaded['index']
+
+
+def _store(index, path):
+    index.save(path)
+    with _lock:
+        _loaded['index'] = index
+        _loaded['signature'] = _signature(path)
+
+
+@contextmanager
+def _write_locked(path):
+    """
+    Hold the index for writing. Threads share a lock, and processes lock a
+    file beside the index, so no two updates read the same old index and
+    overwrite each other.
+    """
+    with _write_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(f'{path}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _update(sources):
+    # Rewrites the whole file under the lock, however few sources changed;
+    # bulk changes go through refresh_sources to pay that once
+    path = index_path()
+    with _write_locked(path):
+        # get_index() rereads the file if another process wrote it last
+        _store(get_index().replace(sources), path)
+
+
+def _describe(sources):
+    return ', '.join(sources) if len(sources) <= 3 else f'{len(sources)} sources'
+
+
+def _update_logged(sources):
+    try:
+        _update(sources)
+    except OSError as e:
+        logger.warning(f"Could not update the retrieval index for {_describe(sources)}: {e}")
+
+
+def index_instance(instance):
+    """(Re)embed the passages of a single model instance, or drop them if it is not indexed"""
+    _update_logged({source_key(instance): chunk_instance(instance) if is_indexed(instance) else []})
+
+
+def remove_source(key):
+    """Remove the passages of the object with the given source key"""
+    _update_logged({key: []})
+
+
+def refresh_sources(model, pks):
+    """
+    Bring the passages of the given rows in line with the database after a
+    bulk UPDATE, which sends no signals: indexed rows are re-embedded and the
+    rest (unpublished or deleted) are dropped.
+    """
+    sources = {f'{model._meta.label_lower}:{pk}': [] for pk in pks}
+    for instance in indexed_objects(model).filter(pk__in=pks):
+        sources[source_key(instance)] = chunk_instance(instance)
+    if sources:
+        _update_logged(sources)
+
+
+def rebuild_index():
+    """Re-embed every indexed model instance, returning the number of chunks"""
+    index = VectorIndex.build([
+        chunk
+        for model in RETRIEVAL_FIELDS
+        for instance in indexed_objects(model).iterator(chunk_size=500)
+        for chunk in chunk_instance(instance)
+    ])
+    path = index_path()
+    with _write_locked(path):
+        _store(index, path)
+    return len(index.chunks)
+
+
+def retrieve(query, k=TOP_K):
+    """Passages most relevant to a query, best first"""
+    vector = embed(query)
+    if not vector.any():
+        return []
+    return [chunk for score, chunk in get_index().search(vector, k) if score >= MIN_SCORE]
+
+
+def build_prompt(message, passages):
+    """The visitor's message with the retrieved passages as context"""
+    if not passages:
+        return message
+    context = '\n\n'.join(
+        f"[{number}] {passage['title']} ({passage['url']})\n{passage['text']}"
+        for number, passage in enumerate(passages, 1)
+    )
+    return PROMPT_TEMPLATE.format(context=context, message=message)
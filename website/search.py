@@ -0,0 +1,240 @@
+"""
+Full-text search over site content.
+
+Each indexed model instance is tokenized into a SearchDocument (its length)
+and one SearchPosting per distinct term (its frequency). Queries look up the
+postings of their terms through the (model_name, term) index and rank the
+matching documents with BM25, so the work done grows with the number of
+matches rather than with the size of the corpus. The document count and
+total length BM25 needs are kept per model in a SearchStats row, adjusted
+with F() updates in the same transaction as the postings.
+
+The index is updated once a save or delete commits, so a rolled back save
+leaves it alone. A query returns at most MAX_RESULTS documents, the best
+ranked among the rows of the queryset it is restricted to;
+SearchResults.truncated tells when more matched.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import BlogPost, CaseStudy, SearchDocument, SearchPosting, SearchStats, SoftwareSolution
+
+# Fields indexed for each model, with the weight each occurrence counts for
+SEARCH_FIELDS = {
+    BlogPost: {'title': 3, 'author': 2, 'tags': 2, 'content': 1},
+    CaseStudy: {'title': 3, 'client_name': 2, 'industry': 2, 'challenge': 1, 'solution': 1, 'results': 1},
+    SoftwareSolution: {'title': 3, 'description': 1, 'features': 1},
+}
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or that the to was were will with'.split()
+)
+
+# BM25 tuning parameters
+K1 = 1.2
+B = 0.75
+
+MAX_RESULTS = 1000
+MAX_TERM_LENGTH = 64
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Split text into lowercase index terms"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def _model_name(model):
+    return model._meta.label_lower
+
+
+def _stats(model_name):
+    """Document count and total length of a model's indexed documents"""
+    stats = SearchStats.objects.filter(model_name=model_name).values('count', 'total_length').first()
+    return stats or {'count': 0, 'total_length': 0}
+
+
+def _adjust_stats(model_name, count, length):
+    changes = {'count': F('count') + count, 'total_length': F('total_length') + length}
+    if not SearchStats.objects.filter(model_name=model_name).update(**changes):
+        stats, created = SearchStats.objects.get_or_create(
+            model_name=model_name, defaults={'count': count, 'total_length': length}
+        )
+        if not created:
+            SearchStats.objects.filter(pk=stats.pk).update(**changes)
+
+
+def _recount_stats(model_name):
+    totals = SearchDocument.objects.filter(model_name=model_name).aggregate(
+        count=Count('id'), total_length=Sum('length')
+    )
+    SearchStats.objects.update_or_create(
+        model_name=model_name,
+        defaults={'count': totals['count'], 'total_length': totals['total_length'] or 0},
+    )
+
+
+def _document_terms(instance):
+    terms = Counter()
+    for field, weight in SEARCH_FIELDS[type(instance)].items():
+        for term in tokenize(getattr(instance, field)):
+            terms[term] += weight
+    return terms
+
+
+def unindex_object(model, object_id):
+    """Remove a model instance from the search index by its primary key"""
+    model_name = _model_name(model)
+    with transaction.atomic():
+        # Locked so concurrent updates of the same object subtract it once
+        document = (
+            SearchDocument.objects.select_for_update()
+            .filter(model_name=model_name, object_id=object_id).first()
+        )
+        if document is None:
+            return
+        SearchPosting.objects.filter(model_name=model_name, object_id=object_id).delete()
+        document.delete()
+        _adjust_stats(model_name, -1, -document.length)
+
+
+def unindex_instance(instance):
+    """Remove a model instance from the search index"""
+    unindex_object(type(instance), instance.pk)
+
+
+def index_instance(instance):
+    """(Re)build the index entries of a single model instance"""
+    if instance.pk is None:
+        # Deleted in the same transaction it was saved in
+        return
+    model_name = _model_name(type(instance))
+    terms = _document_terms(instance)
+    length = sum(terms.values())
+    with transaction.atomic():
+        # The locked document row serialises concurrent updates of the same
+        # object; a second insert of a new one waits and then finds the row
+        document, created = SearchDocument.objects.select_for_update().get_or_create(
+            model_name=model_name, object_id=instance.pk, defaults={'length': length},
+        )
+        if created:
+            _adjust_stats(model_name, 1, length)
+        else:
+            SearchPosting.objects.filter(model_name=model_name, object_id=instance.pk).delete()
+            SearchDocument.objects.filter(pk=document.pk).update(length=length)
+            _adjust_stats(model_name, 0, length - document.length)
+        SearchPosting.objects.bulk_create([
+            SearchPosting(model_name=model_name, object_id=instance.pk, term=term, frequency=frequency)
+            for term, frequency in terms.items()
+        ])
+
+
+def rebuild_index(model):
+    """Rebuild the search index for every row of a model"""
+    model_name = _model_name(model)
+    SearchPosting.objects.filter(model_name=model_name).delete()
+    SearchDocument.objects.filter(model_name=model_name).delete()
+    count = 0
+    for instance in model.objects.iterator(chunk_size=500):
+        index_instance(instance)
+        count += 1
+    # Saves that ran alongside the rebuild may have adjusted the stats twice
+    _recount_stats(model_name)
+    return count
+
+
+def _postings(model_name, term, prefix, within):
+    postings = SearchPosting.objects.filter(model_name=model_name)
+    if within is not None:
+        postings = postings.filter(object_id__in=within.values('pk'))
+    if prefix:
+        # A range on the indexed column rather than LIKE, so the index is used
+        postings = postings.filter(term__gte=term, term__lt=term + '\uffff')
+    else:
+        postings = postings.filter(term=term)
+    return postings.values_list('object_id', 'term', 'frequency')
+
+
+def search(model, query, limit=MAX_RESULTS, within=None):
+    """
+    Return the ids of up to `limit` model instances matching every term of
+    the query, best match first. The last query term also matches as a prefix.
+    Hits can be restricted to the rows of a queryset `within`, before the
+    best `limit` are taken.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    model_name = _model_name(model)
+
+    # Collect term frequencies per document, one posting list per query term
+    matches = None
+    frequencies = defaultdict(dict)
+    document_frequency = Counter()
+    for position, term in enumerate(terms):
+        prefix = position == len(terms) - 1
+        term_matches = set()
+        for object_id, indexed_term, frequency in _postings(model_name, term, prefix, within):
+            if indexed_term not in frequencies[object_id]:
+                frequencies[object_id][indexed_term] = frequency
+                document_frequency[indexed_term] += 1
+            term_matches.add(object_id)
+        matches = term_matches if matches is None else matches & term_matches
+        if not matches:
+            return []
+
+    stats = _stats(model_name)
+    total = max(stats['count'], 1)
+    average_length = stats['total_length'] / total or 1
+    lengths = dict(
+        SearchDocument.objects.filter(model_name=model_name, object_id__in=matches)
+        .values_list('object_id', 'length')
+    )
+
+    scores = {}
+    for object_id in matches:
+        norm = K1 * (1 - B + B * lengths.get(object_id, average_length) / average_length)
+        score = 0.0
+        for term, frequency in frequencies[object_id].items():
+            df = document_frequency[term]
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            score += idf * frequency * (K1 + 1) / (frequency + norm)
+        scores[object_id] = score
+
+    return sorted(scores, key=lambda object_id: (-scores[object_id], -object_id))[:limit]
+
+
+class SearchResults:
+    """
+    Ranked search hits restricted to a queryset. Supports len() and slicing
+    so it can be handed straight to a Paginator. Only the best MAX_RESULTS
+    hits are kept, and `truncated` is set when there were more.
+    """
+
+    def __init__(self, queryset, query):
+        self.queryset = queryset
+        ranked = search(queryset.model, query, limit=MAX_RESULTS + 1, within=queryset)
+        self.truncated = len(ranked) > MAX_RESULTS
+        self.ids = ranked[:MAX_RESULTS]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            ids = self.ids[index]
+            objects = self.queryset.in_bulk(ids)
+            return [objects[pk] for pk in ids if pk in objects]
+        return self.queryset.get(pk=self.ids[index])
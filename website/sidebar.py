@@ -0,0 +1,183 @@
+"""
+Pre-aggregated blog sidebar index.
+
+The sidebar (tag set, per-category counts, total count and recent posts) is
+kept in the cache as a single entry and updated incrementally from the
+BlogPost save/delete signals, so rendering it is one cache read no matter
+how large the archive grows.
+
+Updates run once the save commits, so a rolled back save never touches the
+counts. The cache has no compare-and-set, so an update read-modify-writes
+the entry only while it holds a lock taken with cache.add(). An update that
+cannot get the lock, or that has no snapshot of the post's previous state
+because the entry was missing when the save began, invalidates the entry
+instead: it deletes it and moves on a generation token, and a writer that
+sees the token change while it worked deletes what it stored. The next read
+rebuilds the sidebar from the database.
+"""
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import BlogPost, Tag
+
+SIDEBAR_CACHE_KEY = 'website:blog_sidebar'
+LOCK_KEY = 'website:blog_sidebar:lock'
+GENERATION_KEY = 'website:blog_sidebar:generation'
+# Seconds an update may hold the lock before it is taken to have died
+LOCK_TIMEOUT = 10
+RECENT_POSTS_LIMIT = 5
+# snapshot_post() result when the sidebar was not cached, as opposed to None
+# for a post that was not stored yet
+SNAPSHOT_SKIPPED = object()
+
+
+def _contribution(category, tag_names, is_published):
+    """What a single post adds to the sidebar, or None if it is not shown"""
+    if not is_published:
+        return None
+    return category, list(tag_names)
+
+
+def _tag_names(post_id):
+    return Tag.objects.filter(posts=post_id).values_list('name', flat=True)
+
+
+def _recent_posts():
+    # One extra row so the detail page can leave out the post being viewed
+    return list(
+        BlogPost.objects.filter(is_published=True)
+        .only('title', 'slug', 'featured_image', 'category', 'created_at')
+        .order_by('-created_at')[:RECENT_POSTS_LIMIT + 1]
+    )
+
+
+@contextmanager
+def _locked():
+    """Take the update lock if it is free, yielding whether it was taken"""
+    acquired = cache.add(LOCK_KEY, True, LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(LOCK_KEY)
+
+
+def invalidate_blog_sidebar():
+    """Drop the sidebar index so the next read rebuilds it, overriding an update in progress"""
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+    cache.delete(SIDEBAR_CACHE_KEY)
+
+
+def _store(sidebar, generation):
+    # Deleted again if it was invalidated since `generation` was read
+    cache.set(SIDEBAR_CACHE_KEY, sidebar, None)
+    if cache.get(GENERATION_KEY) != generation:
+        cache.delete(SIDEBAR_CACHE_KEY)
+
+
+def build_blog_sidebar():
+    """Rebuild the sidebar index from the database and store it unless an update is running"""
+    generation = cache.get(GENERATION_KEY)
+    published = BlogPost.objects.filter(is_published=True)
+
+    category_counts = {key: 0 for key, _ in BlogPost.CATEGORY_CHOICES}
+    for row in published.values('category').annotate(count=Count('id')):
+        category_counts[row['category']] = row['count']
+
+    tag_counts = dict(
+        Tag.objects.filter(posts__is_published=True)
+        .annotate(count=Count('posts'))
+        .values_list('name', 'count')
+    )
+
+    sidebar = {
+        'category_counts': category_counts,
+        'tag_counts': tag_counts,
+        'total_posts': sum(category_counts.values()),
+        'recent_posts': _recent_posts(),
+    }
+    with _locked() as locked:
+        if locked:
+            _store(sidebar, generation)
+    return sidebar
+
+
+def get_blog_sidebar():
+    """Return the sidebar index, rebuilding it only on a cache miss"""
+    sidebar = cache.get(SIDEBAR_CACHE_KEY)
+    if sidebar is None:
+        sidebar = build_blog_sidebar()
+    return sidebar
+
+
+def _apply(sidebar, contribution, delta):
+    if contribution is None:
+        return
+    category, tags = contribution
+    counts = sidebar['category_counts']
+    counts[category] = counts.get(category, 0) + delta
+    sidebar['total_posts'] += delta
+    for tag in tags:
+        count = sidebar['tag_counts'].get(tag, 0) + delta
+        if count > 0:
+            sidebar['tag_counts'][tag] = count
+        else:
+            sidebar['tag_counts'].pop(tag, None)
+
+
+def _touches_recent(sidebar, post_id, created_at, contribution):
+    recent = sidebar['recent_posts']
+    if any(recent_post.pk == post_id for recent_post in recent):
+        return True
+    if contribution is None:
+        return False
+    return len(recent) <= RECENT_POSTS_LIMIT or created_at >= recent[-1].created_at
+
+
+def snapshot_post(post):
+    """Capture the stored sidebar contribution of a post before it changes"""
+    if post.pk is None:
+        return None
+    if cache.get(SIDEBAR_CACHE_KEY) is None:
+        # Skipped rather than None: a rebuild before the commit would count
+        # the stored post, and adding it as new would count it twice
+        return SNAPSHOT_SKIPPED
+    row = BlogPost.objects.filter(pk=post.pk).values('category', 'is_published').first()
+    if row is None:
+        return None
+    return _contribution(row['category'], _tag_names(post.pk), row['is_published'])
+
+
+def _update(post_id, created_at, previous, current):
+    with _locked() as locked:
+        if not locked or previous is SNAPSHOT_SKIPPED:
+            invalidate_blog_sidebar()
+            return
+        generation = cache.get(GENERATION_KEY)
+        sidebar = cache.get(SIDEBAR_CACHE_KEY)
+        if sidebar is None:
+            # A rebuild running now may have read the rows before this change
+            invalidate_blog_sidebar()
+            return
+        _apply(sidebar, previous, -1)
+        _apply(sidebar, current, 1)
+        if _touches_recent(sidebar, post_id, created_at, current):
+            sidebar['recent_posts'] = _recent_posts()
+        _store(sidebar, generation)
+
+
+def post_saved(post, previous):
+    """Move a saved post's contribution from its previous to its current state once the save commits"""
+    current = _contribution(post.category, _tag_names(post.pk), post.is_published)
+    transaction.on_commit(lambda: _update(post.pk, post.created_at, previous, current))
+
+
+def post_deleted(post, previous):
+    """Remove a deleted post's contribution from the sidebar once the delete commits"""
+    # The delete clears post.pk before the callback runs
+    post_id = post.pk
+    transaction.on_commit(lambda: _update(post_id, post.created_at, previous, None))
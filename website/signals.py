@@ -0,0 +1,175 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import blobs, caching, images, registrations, related, retrieval, search, sidebar, stats
+from .models import (
+    BlogPost, CaseStudy, ContactInquiry, Event, EventRegistration, GalleryImage, SoftwareSolution, Tag, Testimonial,
+)
+
+
+@receiver(pre_save, sender=BlogPost)
+@receiver(pre_delete, sender=BlogPost)
+def snapshot_blog_post(sender, instance, **kwargs):
+    """Remember what the stored row contributed to the sidebar and related posts"""
+    instance._sidebar_previous = sidebar.snapshot_post(instance)
+    instance._related_previous = related.snapshot_post(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def sync_blog_post_tags(sender, instance, **kwargs):
+    """Keep the Tag relation in step with the comma-separated tags field"""
+    instance.sync_tags()
+
+
+# Connected after sync_blog_post_tags so the handlers below see the synced tags
+@receiver(post_save, sender=BlogPost)
+def update_blog_sidebar(sender, instance, **kwargs):
+    """Apply the saved post to the blog sidebar index"""
+    sidebar.post_saved(instance, getattr(instance, '_sidebar_previous', None))
+
+
+@receiver(post_save, sender=BlogPost)
+def update_related_posts(sender, instance, **kwargs):
+    """Recompute the related posts affected by the saved post"""
+    related.post_saved(instance, getattr(instance, '_related_previous', None))
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_from_blog_sidebar(sender, instance, **kwargs):
+    """Drop the deleted post from the blog sidebar index"""
+    sidebar.post_deleted(instance, getattr(instance, '_sidebar_previous', None))
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_from_related_posts(sender, instance, **kwargs):
+    """Recompute the posts that listed the deleted post as related"""
+    related.post_deleted(instance, getattr(instance, '_related_previous', None))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=CaseStudy)
+@receiver(post_save, sender=SoftwareSolution)
+def update_search_index(sender, instance, **kwargs):
+    """Re-tokenize a saved instance into the full-text search index once the save commits"""
+    transaction.on_commit(lambda: search.index_instance(instance))
+
+
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=CaseStudy)
+@receiver(post_delete, sender=SoftwareSolution)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop a deleted instance from the full-text search index once the delete commits"""
+    # The delete clears instance.pk before the callback runs
+    pk = instance.pk
+    transaction.on_commit(lambda: search.unindex_object(sender, pk))
+
+
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=CaseStudy)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=SoftwareSolution)
+def update_retrieval_index(sender, instance, **kwargs):
+    """Re-embed a saved instance's passages for the chatbot once the save commits (drafts are dropped)"""
+    transaction.on_commit(lambda: retrieval.index_instance(instance))
+
+
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=CaseStudy)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=SoftwareSolution)
+def remove_from_retrieval_index(sender, instance, **kwargs):
+    """Drop a deleted instance's passages from the chatbot index once the delete commits"""
+    key = retrieval.source_key(instance)
+    transaction.on_commit(lambda: retrieval.remove_source(key))
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_save, sender=CaseStudy)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=SoftwareSolution)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Pre-render the responsive image renditions of a saved instance's changed images once the save commits"""
+    previous = getattr(instance, '_blob_previous', {})
+    transaction.on_commit(lambda: images.generate_for_instance(instance, previous))
+
+
+@receiver(pre_save, sender=GalleryImage)
+@receiver(pre_save, sender=BlogPost)
+@receiver(pre_save, sender=Testimonial)
+@receiver(pre_save, sender=CaseStudy)
+@receiver(pre_save, sender=Event)
+@receiver(pre_save, sender=SoftwareSolution)
+def snapshot_media_files(sender, instance, **kwargs):
+    """Remember which media blobs the stored row points at"""
+    instance._blob_previous = blobs.snapshot_files(instance)
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_save, sender=CaseStudy)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=SoftwareSolution)
+def update_media_references(sender, instance, **kwargs):
+    """Move media blob references to the files the row now points at"""
+    blobs.instance_saved(instance, getattr(instance, '_blob_previous', {}))
+
+
+@receiver(post_delete, sender=GalleryImage)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Testimonial)
+@receiver(post_delete, sender=CaseStudy)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=SoftwareSolution)
+def release_media_references(sender, instance, **kwargs):
+    """Release the media blobs of a deleted row"""
+    blobs.instance_deleted(instance)
+
+
+@receiver(pre_save, sender=ContactInquiry)
+@receiver(pre_delete, sender=ContactInquiry)
+def snapshot_inquiry(sender, instance, **kwargs):
+    """Remember which statistics counters the stored inquiry falls under"""
+    instance._stats_previous = stats.snapshot_inquiry(instance)
+
+
+@receiver(post_save, sender=ContactInquiry)
+def update_inquiry_stats(sender, instance, **kwargs):
+    """Apply a saved inquiry to the materialized dashboard statistics"""
+    stats.inquiry_saved(instance, getattr(instance, '_stats_previous', None))
+
+
+@receiver(post_delete, sender=ContactInquiry)
+def remove_from_inquiry_stats(sender, instance, **kwargs):
+    """Remove a deleted inquiry from the materialized dashboard statistics"""
+    stats.inquiry_deleted(instance, getattr(instance, '_stats_previous', None))
+
+
+@receiver(post_delete, sender=EventRegistration)
+def release_event_seat(sender, instance, **kwargs):
+    """Free the seat a deleted registration held"""
+    registrations.release_seat(instance.event_id)
+
+
+@receiver(post_save, sender=GalleryImage)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Testimonial)
+@receiver(post_save, sender=CaseStudy)
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=SoftwareSolution)
+@receiver(post_delete, sender=GalleryImage)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Testimonial)
+@receiver(post_delete, sender=CaseStudy)
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=SoftwareSolution)
+def bump_page_cache_version(sender, **kwargs):
+    """Invalidate cached pages built from the model once the change commits"""
+    # Bumping before the commit would let a concurrent request cache the
+    # old rows under the new version
+    transaction.on_commit(lambda: caching.bump_model_version(sender))
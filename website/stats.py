@@ -0,0 +1,121 @@
+"""
+Materialized contact inquiry statistics.
+
+Totals, unread counts, per-country and per-day counts are kept as
+InquiryCounter rows. They are adjusted by the ContactInquiry signals (and by
+bulk updates through apply_read_change), so the dashboard reads a handful of
+rows instead of aggregating the whole inquiry table. reconcile_inquiry_stats
+recomputes them from scratch.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ContactInquiry, InquiryCounter
+
+TOTAL = 'total'
+UNREAD = 'unread'
+COUNTRY = 'country'
+DAY = 'day'
+
+DAILY_STATS_DAYS = 30
+
+
+def _keys(is_read, country, created_at):
+    """Counters a single inquiry contributes to"""
+    keys = [(TOTAL, ''), (COUNTRY, country), (DAY, timezone.localdate(created_at).isoformat())]
+    if not is_read:
+        keys.append((UNREAD, ''))
+    return keys
+
+
+def _bump(keys, delta):
+    for dimension, value in keys:
+        updated = InquiryCounter.objects.filter(dimension=dimension, value=value).update(count=F('count') + delta)
+        if not updated:
+            counter, created = InquiryCounter.objects.get_or_create(
+                dimension=dimension, value=value, defaults={'count': delta}
+            )
+            if not created:
+                InquiryCounter.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+def snapshot_inquiry(inquiry):
+    """Counters the stored row contributes to, before it is saved"""
+    if inquiry.pk is None:
+        return None
+    row = ContactInquiry.objects.filter(pk=inquiry.pk).values('is_read', 'country', 'created_at').first()
+    if row is None:
+        return None
+    return _keys(row['is_read'], row['country'], row['created_at'])
+
+
+def inquiry_saved(inquiry, previous):
+    """Move a saved inquiry's counts from its previous to its current state"""
+    current = _keys(inquiry.is_read, inquiry.country, inquiry.created_at)
+    previous = previous or []
+    with transaction.atomic():
+        _bump([key for key in previous if key not in current], -1)
+        _bump([key for key in current if key not in previous], 1)
+
+
+def inquiry_deleted(inquiry, previous=None):
+    """Remove a deleted inquiry from the counts it was stored under"""
+    # Bulk updates do not touch loaded instances, so prefer the stored row
+    if previous is None:
+        previous = _keys(inquiry.is_read, inquiry.country, inquiry.created_at)
+    _bump(previous, -1)
+
+
+def apply_read_change(marked_read, marked_unread=0):
+    """Adjust the unread count after inquiries were flagged in bulk"""
+    _bump([(UNREAD, '')], marked_unread - marked_read)
+
+
+def reconcile_inquiry_stats():
+    """Recompute every counter from the inquiry table"""
+    inquiries = ContactInquiry.objects.all()
+    counts = {
+        (TOTAL, ''): inquiries.count(),
+        (UNREAD, ''): inquiries.filter(is_read=False).count(),
+    }
+    for row in inquiries.values('country').annotate(count=Count('id')):
+        counts[(COUNTRY, row['country'])] = row['count']
+    for row in inquiries.annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')):
+        counts[(DAY, row['day'].isoformat())] = row['count']
+
+    with transaction.atomic():
+        InquiryCounter.objects.all().delete()
+        InquiryCounter.objects.bulk_create([
+            InquiryCounter(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in counts.items()
+        ])
+    return counts
+
+
+def get_inquiry_stats():
+    """Dashboard numbers read from the materialized counters"""
+    counters = InquiryCounter.objects.filter(dimension__in=[TOTAL, UNREAD])
+    values = dict(counters.values_list('dimension', 'count'))
+    total = values.get(TOTAL, 0)
+    unread = values.get(UNREAD, 0)
+
+    countries = (
+        InquiryCounter.objects.filter(dimension=COUNTRY, count__gt=0)
+        .order_by('-count').values('value', 'count')
+    )
+    since = (timezone.localdate() - datetime.timedelta(days=DAILY_STATS_DAYS - 1)).isoformat()
+    daily = (
+        InquiryCounter.objects.filter(dimension=DAY, value__gte=since, count__gt=0)
+        .order_by('value').values('value', 'count')
+    )
+    return {
+        'total_inquiries': total,
+        'unread_inquiries': unread,
+        'read_inquiries': total - unread,
+        'countries': [{'country': row['value'], 'count': row['count']} for row in countries],
+        'daily_inquiries': [{'day': row['value'], 'count': row['count']} for row in daily],
+    }
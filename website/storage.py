@@ -0,0 +1,98 @@
+"""
+Content-addressed media storage.
+
+Every file is stored once under a name derived from the SHA-256 of its bytes
+(blobs/ab/abcdef....jpg), no matter which model or upload_to it came from.
+Re-uploading the same bytes reuses the existing blob instead of writing a
+suffixed copy, and since a blob's bytes can never change its URL can be
+served with a far-future cache lifetime.
+
+Saving claims the blob's MediaBlob row under a row lock before it looks for
+an existing file. blobs.delete_if_unused takes the same lock, so an upload
+either waits for a delete of the same bytes and writes the file again, or
+leaves a claim that stops the delete.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = 'blobs'
+TEMP_DIR = 'tmp'
+
+BLOB_NAME_RE = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/(?P<digest>[0-9a-f]{{64}})(\.\w+)?$')
+
+# Spellings of the same extension that should map to one blob name
+EXTENSION_ALIASES = {'.jpeg': '.jpg', '.jpe': '.jpg'}
+
+
+def blob_name(digest, original_name):
+    """Storage name of the blob holding bytes with the given digest"""
+    extension = os.path.splitext(original_name)[1].lower()
+    extension = EXTENSION_ALIASES.get(extension, extension)
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{extension}'
+
+
+def digest_from_name(name):
+    """The SHA-256 encoded in a blob name, or None for any other name"""
+    match = BLOB_NAME_RE.match(name or '')
+    return match.group('digest') if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Filesystem storage that names every file after the hash of its content"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen in _save from the content hash, and an
+        # existing file with that name already holds the same bytes
+        return name
+
+    def _save(self, name, content):
+        # Hash the upload while streaming it to a temporary file, then move
+        # it into place only if no blob with those bytes exists yet
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            sha = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    sha.update(chunk)
+                    temp_file.write(chunk)
+
+            name = blob_name(sha.hexdigest(), name)
+            full_path = self.path(name)
+            # Looked up through the app registry, as the models import this module
+            MediaBlob = apps.get_model('website', 'MediaBlob')
+            with transaction.atomic():
+                MediaBlob.objects.select_for_update().get_or_create(
+                    name=name, defaults={'size': os.path.getsize(temp_path)},
+                )
+                if os.path.exists(full_path):
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(temp_path, full_path)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+
+media_storage = ContentAddressedStorage()
+
+
+def content_addressed_storage():
+    """Storage callable used by the model ImageFields"""
+    return media_storage
@@ -0,0 +1,13 @@
+from django import template
+
+from website.caching import model_versions
+
+register = template.Library()
+
+@register.simple_tag
+def content_version(*models):
+    """
+    Version string of the given models, for use as a {% cache %} key part.
+    Usage: {% content_version 'website.BlogPost' 'website.Tag' as blog_version %}
+    """
+    return model_versions(*models)
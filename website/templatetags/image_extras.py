@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from website.images import derivative_url, srcset
+
+register = template.Library()
+
+@register.simple_tag
+def image_srcset(field, extension='webp'):
+    """
+    Build a srcset of resized renditions for an image field.
+    Usage: {% image_srcset post.featured_image 'webp' %}
+    """
+    return srcset(field, extension)
+
+@register.simple_tag
+def image_url(field, width=640, extension='jpg'):
+    """
+    URL of the smallest rendition at least `width` pixels wide.
+    Usage: {% image_url post.featured_image 320 %}
+    """
+    return derivative_url(field, int(width), extension)
+
+@register.simple_tag
+def responsive_image(field, sizes='100vw', **attrs):
+    """
+    Render a <picture> with WebP renditions and a JPEG fallback.
+    Usage: {% responsive_image post.featured_image sizes="60px" alt=post.title class="rounded" %}
+    """
+    attrs.setdefault('loading', 'lazy')
+    attributes = format_html_join(' ', '{}="{}"', attrs.items())
+    webp = srcset(field, 'webp')
+    if not webp:
+        return format_html('<img src="{}" {}>', field.url if field else '', attributes)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" {}></picture>',
+        webp, sizes, derivative_url(field, 640), srcset(field, 'jpg'), sizes, attributes,
+    )
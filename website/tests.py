@@ -1,3 +1,1473 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from . import (
+    benchmark_data, blobs, bulk, caching, chat_backends, chat_cache, conditional, images, notifications, related, retrieval, search,
+    sidebar,
+)
+from .stats import get_inquiry_stats, reconcile_inquiry_stats
+from .models import (
+    BlogPost, CaseStudy, ContactInquiry, Event, EventRegistration, GalleryImage, MediaBlob, NotificationJob, RelatedPost,
+    SearchDocument, SoftwareSolution, Tag, Testimonial,
+)
+from .gallery import GALLERY_PAGE_FIELDS
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+from .registrations import AlreadyRegistered, EventFull, import_registrations, register
+
+
+def jpeg_upload(color='red'):
+    buffer = BytesIO()
+    Image.new('RGB', (400, 300), color).save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def use_temporary_media_root(test):
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    settings = override_settings(MEDIA_ROOT=directory.name)
+    settings.enable()
+    test.addCleanup(settings.disable)
+
+
+class SiteTestCase(TestCase):
+    """Keeps the chatbot index that on-commit callbacks write out of the project directory"""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        settings = override_settings(RETRIEVAL_INDEX_PATH=os.path.join(directory.name, 'retrieval_index.npz'))
+        settings.enable()
+        cls.addClassCleanup(settings.disable)
+        super().setUpClass()
+
+
+class ViewQueryIndexTests(SiteTestCase):
+    """The main query of each view is answered from an index, not a table scan"""
+
+    def setUp(self):
+        # Cached pages would answer without running the view's queries
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.event = Event.objects.create(
+            title='Launch', description='Launch', date=timezone.now() + datetime.timedelta(days=1), location='London',
+        )
+        # One row per list, so no view skips its query for an empty count
+        BlogPost.objects.create(title='Post', content='-', author='-', category='machine_learning')
+        Testimonial.objects.create(
+            customer_name='C', company='Co', position='P', testimonial='-', rating=5, is_approved=True,
+        )
+        use_temporary_media_root(self)
+        GalleryImage.objects.create(title='Photo', image=jpeg_upload())
+        ContactInquiry.objects.create(
+            name='N', email='n@example.com', phone='1', company_name='Co', country='NP', job_title='J', job_details='-',
+        )
+        EventRegistration.objects.create(event=self.event, full_name='A', email='a@example.com', phone='1')
+        staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client.force_login(staff)
+
+    def view_statements(self):
+        """(name, URL, table, pattern picking the view's main statement out of those the URL runs)"""
+        event = self.event.pk
+        return [
+            ('home testimonials', '/', 'website_testimonial', r'ORDER BY "website_testimonial"\."date" DESC'),
+            ('home featured events', '/', 'website_event', r'"website_event"\."is_featured"'),
+            ('blog', '/blog/', 'website_blogpost', r'ORDER BY "website_blogpost"\."created_at" DESC'),
+            ('blog category', '/blog/?category=machine_learning', 'website_blogpost',
+             r'"website_blogpost"\."category" = .*ORDER BY'),
+            ('gallery', '/gallery/', 'website_galleryimage', r'ORDER BY "website_galleryimage"\."date" DESC'),
+            ('gallery category', '/gallery/?category=events', 'website_galleryimage',
+             r'"website_galleryimage"\."category" = .*ORDER BY'),
+            ('upcoming events', '/events/', 'website_event', r'ORDER BY "website_event"\."date" ASC'),
+            ('past events', '/events/', 'website_event', r'ORDER BY "website_event"\."date" DESC'),
+            ('related events', f'/events/{event}/', 'website_event', r'"website_event"\."location" = '),
+            ('inquiries', '/admin-dashboard/', 'website_contactinquiry',
+             r'ORDER BY "website_contactinquiry"\."created_at" DESC'),
+            ('unread inquiries', '/admin-dashboard/export/inquiries/?status=unread', 'website_contactinquiry',
+             r'"website_contactinquiry"\."is_read"'),
+            ('event registrations', f'/admin-dashboard/export/registrations/?event={event}',
+             'website_eventregistration', r'"website_eventregistration"\."event_id" = '),
+        ]
+
+    def captured_sql(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return [query['sql'] for query in queries]
+
+    def explain(self, sql):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, name, table, sql):
+        plan = self.explain(sql)
+        if connection.vendor == 'sqlite':
+            steps = [line for line in plan.splitlines() if re.search(rf'\b{table}\b', line)]
+            self.assertTrue(steps, f'{name}: {table} missing from plan\n{plan}')
+            for step in steps:
+                self.assertIn('INDEX', step, f'{name} scans {table}\n{plan}')
+            self.assertNotIn('TEMP B-TREE', plan, f'{name} sorts in memory\n{plan}')
+        else:
+            self.assertNotIn(f'Seq Scan on {table}', plan, f'{name} scans {table}\n{plan}')
+
+    def test_view_queries_use_indexes(self):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest(f'No plan check for {connection.vendor}')
+        if connection.vendor == 'postgresql':
+            # Tables this small would otherwise always be read sequentially
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        statements = {}
+        for name, url, table, pattern in self.view_statements():
+            with self.subTest(name):
+                if url not in statements:
+                    statements[url] = self.captured_sql(url)
+                matching = [
+                    sql for sql in statements[url]
+                    if sql.startswith('SELECT') and f'FROM "{table}"' in sql and re.search(pattern, sql)
+                ]
+                self.assertTrue(matching, f'{name}: {url} ran no such query on {table}')
+                for sql in matching:
+                    self.assertUsesIndex(name, table, sql)
+
+
+class EventStatusTests(SiteTestCase):
+    def test_refresh_upcoming_flips_stale_flags(self):
+        now = timezone.now()
+        passed = Event.objects.create(title='Passed', description='-', date=now + datetime.timedelta(hours=1), location='London')
+        moved = Event.objects.create(title='Moved', description='-', date=now - datetime.timedelta(hours=1), location='London')
+        later = now + datetime.timedelta(hours=2)
+        Event.objects.filter(pk=moved.pk).update(date=later + datetime.timedelta(days=1))
+
+        self.assertEqual(Event.objects.refresh_upcoming(later), 2)
+        self.assertEqual(Event.objects.refresh_upcoming(later), 0)
+        self.assertEqual(set(Event.objects.filter(is_upcoming=True)), {moved})
+        self.assertEqual(list(Event.objects.upcoming(later)), [moved])
+        self.assertFalse(Event.objects.with_status(later).get(pk=passed.pk).upcoming)
+
+
+class RegistrationTests(SiteTestCase):
+    def setUp(self):
+        self.event = Event.objects.create(
+            title='Summit', description='-', date=timezone.now() + datetime.timedelta(days=7), location='London',
+            capacity=3,
+        )
+
+    def attendee(self, number, **fields):
+        return {'full_name': f'Attendee {number}', 'email': f'attendee{number}@example.com', 'phone': '0191', **fields}
+
+    def test_register_enforces_capacity_and_uniqueness(self):
+        register(self.event, self.attendee(1))
+        with self.assertRaises(AlreadyRegistered):
+            register(self.event, self.attendee(1))
+        register(self.event, self.attendee(2))
+        register(self.event, self.attendee(3))
+        with self.assertRaises(EventFull):
+            register(self.event, self.attendee(4))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+
+        EventRegistration.objects.filter(email='attendee2@example.com').delete()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 2)
+
+    def test_import_in_batches(self):
+        register(self.event, self.attendee(1))
+        rows = [
+            self.attendee(1), self.attendee(2, email='ATTENDEE2@example.com'), self.attendee(2),
+            self.attendee(3, email='not an email'), self.attendee(4), self.attendee(5),
+        ]
+        counts, errors = import_registrations(self.event, rows, batch_size=2)
+        self.assertEqual(counts, {'created': 2, 'duplicate': 2, 'full': 1, 'invalid': 1})
+        self.assertEqual(list(errors), [4])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.seats_taken, 3)
+        self.assertEqual(EventRegistration.objects.filter(event=self.event).count(), 3)
+
+
+@override_settings(NOTIFICATION_RECIPIENTS=['staff@example.com'])
+class NotificationTests(SiteTestCase):
+    def submit_inquiry(self):
+        return self.client.post('/contact/', {
+            'name': 'Ada', 'email': 'ada@example.com', 'phone': '0191', 'company_name': 'Engines',
+            'country': 'United Kingdom', 'job_title': 'Analyst', 'job_details': 'Forecasting',
+        })
+
+    def test_inquiry_alert_is_queued_then_sent(self):
+        self.submit_inquiry()
+        self.assertEqual(len(mail.outbox), 0)
+        job = NotificationJob.objects.get()
+        self.assertEqual(job.recipients, ['staff@example.com'])
+
+        self.assertEqual(notifications.process_due_jobs(), {'sent': 1, 'retried': 0, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('Forecasting', mail.outbox[0].body)
+        self.assertEqual(notifications.process_due_jobs(), {'sent': 0, 'retried': 0, 'failed': 0})
+
+    def test_failed_sends_back_off_then_give_up(self):
+        self.submit_inquiry()
+        now = timezone.now()
+        with mock.patch('website.notifications.EmailMessage.send', side_effect=OSError('refused')):
+            for attempt in range(1, notifications.MAX_ATTEMPTS + 1):
+                counts = notifications.process_due_jobs(now=now)
+                job = NotificationJob.objects.get()
+                self.assertEqual(job.attempts, attempt)
+                self.assertEqual(notifications.process_due_jobs(now=now), {'sent': 0, 'retried': 0, 'failed': 0})
+                now = job.run_after
+        self.assertEqual(counts['failed'], 1)
+        self.assertEqual(job.status, NotificationJob.FAILED)
+        self.assertIn('refused', job.last_error)
+
+
+class ExportTests(SiteTestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_user('staff', password='-', is_staff=True)
+        self.client.force_login(staff)
+        for number, (country, is_read) in enumerate([('Japan', True), ('Japan', False), ('Brazil', False)]):
+            ContactInquiry.objects.create(
+                name=f'=HYPERLINK("x") {number}', email=f'v{number}@example.com', phone='0191',
+                company_name='Co', country=country, job_title='-', job_details='-', is_read=is_read,
+            )
+
+    def export(self, **params):
+        response = self.client.get('/admin-dashboard/export/inquiries/', params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+
+    def test_inquiry_export_filters_and_escapes(self):
+        self.assertEqual(len(self.export()), 4)
+        lines = self.export(country='japan', status='unread')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].split(',')[2].startswith('"\'=HYPERLINK'))
+        today = timezone.localdate().isoformat()
+        self.assertEqual(len(self.export(start=today, end=today)), 4)
+        self.assertEqual(len(self.export(end='2000-01-01')), 1)
+
+
+class BulkActionTests(SiteTestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_user('staff', password='-', is_staff=True)
+        self.client.force_login(staff)
+
+    def post(self, action, ids):
+        return self.client.post('/admin-dashboard/bulk/', {'action': action, 'ids': ids}, content_type='application/json')
+
+    def test_mark_read_is_one_update_and_adjusts_stats(self):
+        inquiries = [
+            ContactInquiry.objects.create(
+                name=f'V{number}', email='v@example.com', phone='-', company_name='-', country='Japan',
+                job_title='-', job_details='-',
+            )
+            for number in range(3)
+        ]
+        ids = [inquiry.pk for inquiry in inquiries[:2]]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post('mark_read', ids)
+        self.assertEqual(response.json(), {'action': 'mark_read', 'updated': 2})
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "website_contactinquiry"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(get_inquiry_stats()['unread_inquiries'], 1)
+        self.assertEqual(self.post('mark_read', ids).json()['updated'], 0)
+
+    def test_publish_invalidates_cached_pages_once(self):
+        post = BlogPost.objects.create(title='Draft', content='-', author='-', is_published=False)
+        version = caching.model_versions(BlogPost)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk.apply('publish', ids=[post.pk]), 1)
+        self.assertNotEqual(caching.model_versions(BlogPost), version)
+        self.assertEqual(self.client.get('/blog/').context['total_posts'], 1)
+
+    def test_rejects_bad_payloads(self):
+        self.assertEqual(self.post('delete', [1]).status_code, 400)
+        self.assertEqual(self.post('publish', 'abc').status_code, 400)
+
+
+class TagTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create(self, title, tags):
+        return BlogPost.objects.create(title=title, content='-', author='-', tags=tags, is_published=True)
+
+    def listed(self, url):
+        return [post.title for post in self.client.get(url).context['posts']]
+
+    def test_tags_are_synced_from_the_comma_separated_field(self):
+        post = self.create('Post', 'AI, Machine Learning, , ai')
+        self.assertEqual(sorted(post.tag_set.values_list('slug', flat=True)), ['ai', 'machine-learning'])
+        post.tags = 'Machine Learning'
+        post.save()
+        self.assertEqual(list(post.tag_set.values_list('slug', flat=True)), ['machine-learning'])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_filter_matches_whole_tags(self):
+        self.create('About AI', 'AI')
+        self.create('About FAIR', 'FAIR, Data')
+        self.assertEqual(self.listed('/blog/?tag=AI'), ['About AI'])
+        self.assertEqual(self.listed('/blog/?tag=fair'), ['About FAIR'])
+
+    def test_filter_reads_the_tag_relation(self):
+        post = self.create('About AI', 'AI')
+        # A bulk update sends no signals, so the relation keeps the old tags
+        BlogPost.objects.filter(pk=post.pk).update(tags='Cloud')
+        self.assertEqual(self.listed('/blog/?tag=AI'), ['About AI'])
+        self.assertEqual(self.listed('/blog/?tag=Cloud'), [])
+
+
+class MigrationTestCase(TransactionTestCase):
+    """Starts each test with the database migrated back to `before`"""
+    before = None
+    after = None
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.addCleanup(lambda: self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes()))
+        self.apps = self.migrate(self.before)
+
+
+class TagMigrationTests(MigrationTestCase):
+    before = [('website', '0008_tag_blogpost_tag_set')]
+    after = [('website', '0009_populate_blogpost_tags')]
+
+    def test_comma_separated_tags_become_tag_rows(self):
+        HistoricalPost = self.apps.get_model('website', 'BlogPost')
+        first = HistoricalPost.objects.create(title='First', content='-', author='-', tags='AI, Machine Learning, ')
+        second = HistoricalPost.objects.create(title='Second', content='-', author='-', tags='ai,FAIR')
+        untagged = HistoricalPost.objects.create(title='Untagged', content='-', author='-', tags='')
+
+        apps = self.migrate(self.after)
+        HistoricalPost = apps.get_model('website', 'BlogPost')
+        Tags = apps.get_model('website', 'Tag')
+        self.assertEqual(sorted(Tags.objects.values_list('slug', flat=True)), ['ai', 'fair', 'machine-learning'])
+
+        def slugs(post):
+            return sorted(HistoricalPost.objects.get(pk=post.pk).tag_set.values_list('slug', flat=True))
+        self.assertEqual(slugs(first), ['ai', 'machine-learning'])
+        self.assertEqual(slugs(second), ['ai', 'fair'])
+        self.assertEqual(slugs(untagged), [])
+
+
+class InquiryCounterMigrationTests(MigrationTestCase):
+    before = [('website', '0013_contactinquiry_created_id_index')]
+    after = [('website', '0014_inquirycounter')]
+
+    def test_existing_inquiries_are_counted(self):
+        HistoricalInquiry = self.apps.get_model('website', 'ContactInquiry')
+        for country, is_read in [('Japan', False), ('Japan', True), ('Nepal', False)]:
+            HistoricalInquiry.objects.create(
+                name='-', email='v@example.com', phone='-', company_name='-', country=country,
+                job_title='-', job_details='-', is_read=is_read,
+            )
+
+        self.migrate(self.after)
+        stats = get_inquiry_stats()
+        self.assertEqual((stats['total_inquiries'], stats['unread_inquiries']), (3, 2))
+        self.assertEqual(stats['countries'], [{'country': 'Japan', 'count': 2}, {'country': 'Nepal', 'count': 1}])
+        self.assertEqual(stats['daily_inquiries'], [{'day': timezone.localdate().isoformat(), 'count': 3}])
+
+
+class ExcerptMigrationTests(MigrationTestCase):
+    before = [('website', '0019_notificationjob')]
+    after = [('website', '0020_add_excerpts')]
+
+    def test_existing_rows_get_an_excerpt(self):
+        HistoricalPost = self.apps.get_model('website', 'BlogPost')
+        post = HistoricalPost.objects.create(title='Stored', content='First <b>para</b> ' + 'word ' * 40, author='-')
+        HistoricalSolution = self.apps.get_model('website', 'SoftwareSolution')
+        solution = HistoricalSolution.objects.create(title='Vision', description='Sees things', features='-')
+
+        apps = self.migrate(self.after)
+        self.assertEqual(
+            apps.get_model('website', 'BlogPost').objects.get(pk=post.pk).excerpt,
+            'First para ' + 'word ' * 27 + 'word…',
+        )
+        self.assertEqual(apps.get_model('website', 'SoftwareSolution').objects.get(pk=solution.pk).excerpt, 'Sees things')
+
+
+class ContentFieldMigrationTests(MigrationTestCase):
+    before = [('website', '0020_add_excerpts')]
+    after = [('website', '0021_content_fields')]
+
+    def test_existing_rows_get_their_stored_fields(self):
+        HistoricalPost = self.apps.get_model('website', 'BlogPost')
+        post = HistoricalPost.objects.create(
+            title='Stored', content='First <b>para</b>\n\n' + 'word ' * 600, author='-', tags='ai, , data ',
+        )
+        HistoricalSolution = self.apps.get_model('website', 'SoftwareSolution')
+        solution = HistoricalSolution.objects.create(title='Vision', description='-', features='a, b')
+
+        apps = self.migrate(self.after)
+        post = apps.get_model('website', 'BlogPost').objects.get(pk=post.pk)
+        self.assertEqual(post.content_html.split('\n\n')[0], '<p>First &lt;b&gt;para&lt;/b&gt;</p>')
+        self.assertEqual((post.word_count, post.reading_time, post.tag_list), (602, 2, ['ai', 'data']))
+        self.assertEqual(apps.get_model('website', 'SoftwareSolution').objects.get(pk=solution.pk).feature_list, ['a', 'b'])
+
+
+class RelatedPostTests(SiteTestCase):
+    def create(self, title, tags, category='ai_technology', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(
+                title=title, content='-', author='-', tags=tags, category=category, is_published=True, **fields
+            )
+
+    def save(self, post, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in changes.items():
+                setattr(post, field, value)
+            post.save()
+
+    def delete(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+
+    def related(self, post):
+        return list(RelatedPost.objects.filter(post=post).order_by('-score').values_list('related_id', flat=True))
+
+    def test_neighbours_rank_by_tags_then_category(self):
+        post = self.create('Post', 'AI, ML, Vision')
+        close = self.create('Close', 'AI, ML, Vision', category='machine_learning')
+        partial = self.create('Partial', 'AI', category='machine_learning')
+        same_category = self.create('Category only', 'Robotics')
+        self.create('Unrelated', 'Cloud', category='machine_learning')
+        self.assertEqual(self.related(post), [close.pk, partial.pk, same_category.pk])
+
+    def test_saves_and_deletes_update_the_posts_that_list_them(self):
+        post = self.create('Post', 'AI, ML')
+        other = self.create('Other', 'Cloud', category='machine_learning')
+        self.assertEqual(self.related(post), [])
+        self.save(other, tags='AI, ML')
+        self.assertEqual(self.related(post), [other.pk])
+        self.delete(other)
+        self.assertEqual(self.related(post), [])
+
+    def test_edits_that_leave_tags_and_category_skip_the_recompute(self):
+        post = self.create('Post', 'AI, ML')
+        with mock.patch.object(related, 'compute_neighbours') as compute:
+            self.save(post, title='Renamed', content='New body')
+            compute.assert_not_called()
+            self.save(post, tags='AI')
+            compute.assert_called()
+
+    def test_rolled_back_save_leaves_the_neighbours(self):
+        post = self.create('Post', 'AI, ML')
+        other = self.create('Other', 'AI, ML', category='machine_learning')
+        # On-commit callbacks are dropped when the transaction rolls back
+        with self.captureOnCommitCallbacks(execute=False):
+            other.tags = 'Cloud'
+            other.save()
+        self.assertEqual(self.related(post), [other.pk])
+
+    def test_affected_posts_are_capped(self):
+        post = self.create('Post', 'Cloud')
+        for number in range(5):
+            self.create(f'Other {number}', 'AI, ML', category='machine_learning')
+        with mock.patch.object(related, 'MAX_AFFECTED', 1), \
+                mock.patch.object(related, 'compute_neighbours') as compute:
+            self.save(post, tags='AI')
+        # The post itself and one of the five posts sharing its new tag
+        self.assertEqual(compute.call_count, 2)
+
+    def test_bulk_changes_recompute_their_neighbours(self):
+        post = self.create('Post', 'AI, ML')
+        drafts = [
+            BlogPost.objects.create(title=f'Draft {number}', content='-', author='-', tags='AI, ML', is_published=False)
+            for number in range(2)
+        ]
+        self.assertEqual(self.related(post), [])
+        ids = [draft.pk for draft in drafts]
+        BlogPost.objects.filter(pk__in=ids).update(is_published=True)
+        related.posts_changed(ids)
+        self.assertCountEqual(self.related(post), ids)
+        self.assertIn(post.pk, self.related(drafts[0]))
+
+        BlogPost.objects.filter(pk__in=ids).update(is_published=False)
+        related.posts_changed(ids)
+        self.assertEqual(self.related(post), [])
+        self.assertEqual(self.related(drafts[0]), [])
+
+    def test_incremental_updates_match_a_rebuild(self):
+        posts = [
+            self.create(f'Post {number}', tags, category)
+            for number, (tags, category) in enumerate([
+                ('AI, ML', 'ai_technology'), ('ML, Vision', 'machine_learning'), ('Vision', 'ai_technology'),
+                ('AI', 'machine_learning'), ('Cloud', 'ai_technology'),
+            ])
+        ]
+        self.save(posts[1], tags='Cloud')
+        self.delete(posts[3])
+        incremental = {post.pk: self.related(post) for post in posts if post.pk}
+        related.rebuild_related_posts()
+        self.assertEqual({post.pk: self.related(post) for post in posts if post.pk}, incremental)
+
+
+class KeysetPaginationTests(SiteTestCase):
+    fields = ('created_at', 'id')
+
+    def setUp(self):
+        for number in range(5):
+            ContactInquiry.objects.create(
+                name=f'V{number}', email='v@example.com', phone='-', company_name='-', country='Japan',
+                job_title='-', job_details='-',
+            )
+        # Rows 1-3 share a timestamp, so only the id orders them
+        tied = timezone.now() - datetime.timedelta(days=1)
+        ContactInquiry.objects.filter(name__in=['V1', 'V2', 'V3']).update(created_at=tied)
+        ContactInquiry.objects.filter(name='V4').update(created_at=tied + datetime.timedelta(hours=1))
+        ContactInquiry.objects.filter(name='V0').update(created_at=tied - datetime.timedelta(hours=1))
+
+    def page(self, **cursors):
+        return keyset_paginate(ContactInquiry.objects.all(), self.fields, per_page=2, **cursors)
+
+    def names(self, page):
+        return [inquiry.name for inquiry in page]
+
+    def test_cursors_walk_forward_and_back_through_ties(self):
+        first = self.page()
+        self.assertEqual(self.names(first), ['V4', 'V3'])
+        self.assertFalse(first.has_previous)
+        second = self.page(after=first.next_cursor)
+        self.assertEqual(self.names(second), ['V2', 'V1'])
+        third = self.page(after=second.next_cursor)
+        self.assertEqual(self.names(third), ['V0'])
+        self.assertFalse(third.has_next)
+
+        back = self.page(before=third.previous_cursor)
+        self.assertEqual(self.names(back), ['V2', 'V1'])
+        self.assertEqual((back.next_cursor, back.previous_cursor), (second.next_cursor, second.previous_cursor))
+        start = self.page(before=back.previous_cursor)
+        self.assertEqual(self.names(start), ['V4', 'V3'])
+        self.assertFalse(start.has_previous)
+
+    def test_cursor_round_trips_the_sort_key(self):
+        inquiry = ContactInquiry.objects.get(name='V2')
+        cursor = self.page(after=self.page().next_cursor).previous_cursor
+        self.assertEqual(decode_cursor(ContactInquiry, self.fields, cursor), [inquiry.created_at, inquiry.pk])
+
+    def test_malformed_cursors_give_the_first_page(self):
+        for cursor in ('not base64!', 'e30', 'WzFd'):
+            self.assertEqual(self.names(self.page(after=cursor)), ['V4', 'V3'])
+        self.assertEqual(self.names(self.page(before='%%%')), ['V4', 'V3'])
+
+
+@mock.patch('website.views.GALLERY_IMAGES_PER_PAGE', 2)
+class GalleryFeedTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Photos 1-3 share a date, so only the id orders them
+        dates = [datetime.date(2024, 1, 1)] + [datetime.date(2024, 2, 1)] * 3 + [datetime.date(2024, 3, 1)]
+        GalleryImage.objects.bulk_create([
+            GalleryImage(
+                title=f'Photo {number}', description=f'About {number}', image=f'gallery/{number}.jpg',
+                category='team' if number % 2 else 'events', date=date,
+            )
+            for number, date in enumerate(dates)
+        ])
+
+    def feed(self, **params):
+        response = self.client.get('/gallery/feed/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def titles(self, feed):
+        return [image['title'] for image in feed['images']]
+
+    def test_feed_walks_every_photo_once_newest_first(self):
+        seen, cursor = [], None
+        while True:
+            feed = self.feed(**({'after': cursor} if cursor else {}))
+            seen += self.titles(feed)
+            cursor = feed['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, ['Photo 4', 'Photo 3', 'Photo 2', 'Photo 1', 'Photo 0'])
+
+    def test_feed_describes_each_photo(self):
+        feed = self.feed(category='team')
+        self.assertEqual(self.titles(feed), ['Photo 3', 'Photo 1'])
+        self.assertEqual(feed['images'][0], {
+            'id': GalleryImage.objects.get(title='Photo 3').pk, 'title': 'Photo 3', 'description': 'About 3',
+            'category': 'team', 'event_name': None, 'date': '2024-02-01',
+        })
+        self.assertIn('Photo 3', feed['html'])
+        self.assertIsNone(feed['next_cursor'])
+
+    def test_cursor_round_trips_through_the_feed(self):
+        cursor = self.feed()['next_cursor']
+        image = GalleryImage.objects.get(title='Photo 3')
+        self.assertEqual(decode_cursor(GalleryImage, GALLERY_PAGE_FIELDS, cursor), [image.date, image.pk])
+        self.assertEqual(self.titles(self.feed(after=cursor)), ['Photo 2', 'Photo 1'])
+
+    def test_cursor_past_the_last_photo_gives_an_empty_page(self):
+        last = GalleryImage.objects.get(title='Photo 0')
+        feed = self.feed(after=encode_cursor(last, GALLERY_PAGE_FIELDS))
+        self.assertEqual((feed['images'], feed['html'], feed['next_cursor']), ([], '', None))
+
+    def test_gallery_page_follows_the_cursor(self):
+        cursor = self.feed()['next_cursor']
+        response = self.client.get('/gallery/', {'after': cursor})
+        self.assertEqual([image.title for image in response.context['images']], ['Photo 2', 'Photo 1'])
+
+
+class InquiryStatsTests(SiteTestCase):
+    def create(self, country, **fields):
+        return ContactInquiry.objects.create(
+            name='V', email='v@example.com', phone='-', company_name='-', country=country,
+            job_title='-', job_details='-', **fields
+        )
+
+    def summary(self):
+        stats = get_inquiry_stats()
+        countries = {row['country']: row['count'] for row in stats['countries']}
+        return stats['total_inquiries'], stats['unread_inquiries'], stats['read_inquiries'], countries
+
+    def test_counters_follow_create_update_and_delete(self):
+        first = self.create('Japan')
+        second = self.create('Japan')
+        self.create('Brazil', is_read=True)
+        self.assertEqual(self.summary(), (3, 2, 1, {'Japan': 2, 'Brazil': 1}))
+        today = timezone.localdate().isoformat()
+        self.assertEqual(get_inquiry_stats()['daily_inquiries'], [{'day': today, 'count': 3}])
+
+        first.is_read = True
+        first.country = 'Brazil'
+        first.save()
+        self.assertEqual(self.summary(), (3, 1, 2, {'Japan': 1, 'Brazil': 2}))
+
+        bulk.apply('mark_read', ids=[second.pk])
+        self.assertEqual(self.summary(), (3, 0, 3, {'Japan': 1, 'Brazil': 2}))
+
+        second.delete()
+        self.assertEqual(self.summary(), (2, 0, 2, {'Brazil': 2}))
+
+    def test_reconcile_matches_the_incremental_counts(self):
+        inquiries = [self.create(country) for country in ('Japan', 'Japan', 'Kenya')]
+        inquiries[0].delete()
+        bulk.apply('mark_read', ids=[inquiries[2].pk])
+        incremental = self.summary()
+        reconcile_inquiry_stats()
+        self.assertEqual(self.summary(), incremental)
+
+
+class ListQueryTests(SiteTestCase):
+    def test_list_pages_read_excerpts_not_full_text(self):
+        words = ' '.join(f'word{number}' for number in range(500))
+        post = BlogPost.objects.create(title='Long read', content=f'<p>{words}</p>', author='-')
+        self.assertEqual(post.excerpt, ' '.join(f'word{number}' for number in range(30)) + '…')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/blog/')
+        self.assertContains(response, 'word24')
+        self.assertNotIn('word25 ', response.content.decode())
+        self.assertFalse([query for query in queries if '"website_blogpost"."content"' in query['sql']])
+
+
+class SearchTests(SiteTestCase):
+    def create(self, title, content='-', **fields):
+        fields = {'author': '-', 'is_published': True, **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(title=title, content=content, **fields)
+
+    def save(self, post, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in changes.items():
+                setattr(post, field, value)
+            post.save()
+
+    def test_matches_rank_by_bm25(self):
+        # Title words count three times, and longer documents are penalized
+        content_match = self.create('Introduction', content='Notes on machine learning and some more words')
+        title_match = self.create('Machine learning', content='An introduction')
+        short_match = self.create('Notes', content='Machine learning')
+        self.create('Unrelated', content='Cloud hosting')
+        ranked = search.search(BlogPost, 'machine learning')
+        self.assertEqual(ranked, [title_match.pk, short_match.pk, content_match.pk])
+        self.assertEqual(search.search(BlogPost, 'the of'), [])
+        self.assertEqual(search.search(BlogPost, 'machine hosting'), [])
+
+    def test_equal_scores_put_newer_rows_first(self):
+        first = self.create('Vision')
+        second = self.create('Vision')
+        self.assertEqual(search.search(BlogPost, 'vision'), [second.pk, first.pk])
+
+    def test_only_the_last_term_matches_as_a_prefix(self):
+        post = self.create('Neural networks')
+        self.assertEqual(search.search(BlogPost, 'neural net'), [post.pk])
+        self.assertEqual(search.search(BlogPost, 'neur networks'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        post = self.create('Robotics')
+        self.save(post, title='Drones')
+        self.assertEqual(search.search(BlogPost, 'robotics'), [])
+        self.assertEqual(search.search(BlogPost, 'drones'), [post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(search.search(BlogPost, 'drones'), [])
+        self.assertEqual(search._stats('website.blogpost'), {'count': 0, 'total_length': 0})
+
+    def test_rolled_back_save_leaves_the_index(self):
+        post = self.create('Robotics')
+        stats = search._stats('website.blogpost')
+        # On-commit callbacks are dropped when the transaction rolls back
+        with self.captureOnCommitCallbacks(execute=False):
+            post.title = 'Drones'
+            post.save()
+        self.assertEqual(search.search(BlogPost, 'robotics'), [post.pk])
+        self.assertEqual(search.search(BlogPost, 'drones'), [])
+        self.assertEqual(search._stats('website.blogpost'), stats)
+
+    def test_stats_match_a_rebuild(self):
+        posts = [self.create(f'Robotics {number}', content='word ' * number) for number in range(3)]
+        self.save(posts[0], content='longer body text')
+        with self.captureOnCommitCallbacks(execute=True):
+            posts[1].delete()
+        incremental = search._stats('website.blogpost')
+        search.rebuild_index(BlogPost)
+        self.assertEqual(search._stats('website.blogpost'), incremental)
+
+    @mock.patch.object(search, 'MAX_RESULTS', 2)
+    def test_results_past_the_cap_are_reported(self):
+        for number in range(3):
+            self.create(f'Automation {number}')
+        results = search.SearchResults(BlogPost.objects.all(), 'automation')
+        self.assertEqual((len(results), results.truncated), (2, True))
+        self.assertFalse(search.SearchResults(BlogPost.objects.all(), 'automation 1').truncated)
+
+    def test_results_slice_within_the_queryset(self):
+        posts = [self.create(f'Automation {number}') for number in range(5)]
+        self.save(posts[2], is_published=False)
+        results = search.SearchResults(BlogPost.objects.filter(is_published=True), 'automation')
+        self.assertEqual(len(results), 4)
+        self.assertEqual([post.pk for post in results[1:3]], [posts[3].pk, posts[1].pk])
+        self.assertEqual(results[0].pk, posts[4].pk)
+        self.assertEqual([post.pk for post in results], [posts[4].pk, posts[3].pk, posts[1].pk, posts[0].pk])
+
+    @mock.patch.object(search, 'MAX_RESULTS', 2)
+    def test_queryset_filters_apply_before_the_cap(self):
+        posts = [self.create(f'Automation {number}', category='company_news') for number in range(3)]
+        # The best ranked hits are outside the queryset
+        for number in range(3):
+            self.create('Automation', category='ai_technology')
+        results = search.SearchResults(BlogPost.objects.filter(category='company_news'), 'automation')
+        self.assertEqual([post.pk for post in results], [posts[2].pk, posts[1].pk])
+        self.assertTrue(results.truncated)
+
+    def test_reindexing_an_indexed_row_replaces_its_entries(self):
+        post = self.create('Robotics')
+        # Indexed again, as by a second save of the row committing alongside
+        search.index_instance(post)
+        post.title = 'Drones'
+        search.index_instance(post)
+        self.assertEqual(SearchDocument.objects.filter(object_id=post.pk).count(), 1)
+        self.assertEqual(search.search(BlogPost, 'robotics'), [])
+        self.assertEqual(search.search(BlogPost, 'drones'), [post.pk])
+        incremental = search._stats('website.blogpost')
+        search.rebuild_index(BlogPost)
+        self.assertEqual(search._stats('website.blogpost'), incremental)
+
+
+class ContentFieldTests(SiteTestCase):
+    def test_save_stores_rendered_fields(self):
+        post = BlogPost.objects.create(
+            title='Body', content='First <b>para</b>\n\n' + 'word ' * 600, author='-', tags='ai, , data ',
+        )
+        self.assertEqual(post.content_html.split('\n\n')[0], '<p>First &lt;b&gt;para&lt;/b&gt;</p>')
+        self.assertEqual((post.word_count, post.reading_time), (602, 2))
+        self.assertEqual(post.tag_list, ['ai', 'data'])
+
+        post.content = 'short'
+        post.save(update_fields=['content'])
+        post.refresh_from_db()
+        self.assertEqual((post.content_html, post.word_count, post.reading_time), ('<p>short</p>', 1, 1))
+
+    def test_detail_page_renders_stored_html(self):
+        post = BlogPost.objects.create(title='Stored', content='original', author='-', tags='ai')
+        BlogPost.objects.filter(pk=post.pk).update(content_html='<p>prerendered</p>')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/blog/{post.slug}/')
+        self.assertContains(response, '<p>prerendered</p>', html=True)
+        self.assertNotContains(response, 'original')
+        self.assertFalse([query for query in queries if '"website_blogpost"."content",' in query['sql']])
+
+
+class RetrievalTests(SiteTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(RETRIEVAL_INDEX_PATH=os.path.join(directory.name, 'index.npz'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def sources(self):
+        return {chunk['source'] for chunk in retrieval.get_index().chunks}
+
+    def test_drafts_are_not_indexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = BlogPost.objects.create(
+                title='Secret draft', content='unannounced quantum roadmap', author='-', is_published=False,
+            )
+        self.assertEqual(retrieval.retrieve('quantum roadmap'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = True
+            draft.save()
+        self.assertEqual(retrieval.retrieve('quantum roadmap')[0]['url'], f'/blog/{draft.slug}/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.is_published = False
+            draft.save()
+        self.assertEqual(self.sources(), set())
+
+        retrieval.rebuild_index()
+        self.assertEqual(self.sources(), set())
+
+    def test_saved_index_is_readable_by_other_users(self):
+        retrieval.rebuild_index()
+        self.assertEqual(os.stat(retrieval.index_path()).st_mode & 0o777, 0o644)
+
+    def test_bulk_publishing_updates_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            posts = [
+                BlogPost.objects.create(title=f'Post {n}', content='quantum roadmap', author='-', is_published=False)
+                for n in range(2)
+            ]
+        keys = {retrieval.source_key(post) for post in posts}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.apply('publish', ids=[post.pk for post in posts])
+        self.assertEqual(self.sources(), keys)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk.apply('unpublish', ids=[posts[0].pk])
+        self.assertEqual(self.sources(), {retrieval.source_key(posts[1])})
+
+    @skipUnless(retrieval.fcntl, 'needs fcntl file locks')
+    def test_concurrent_updates_from_several_processes_are_all_kept(self):
+        chunks = {f'test:{n}': [{'source': f'test:{n}', 'title': 'T', 'url': '', 'text': 'quantum'}] for n in range(8)}
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=retrieval._update, args=({key: value},)) for key, value in chunks.items()]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        # This process reloads the file the workers wrote
+        self.assertEqual(self.sources(), set(chunks))
+
+
+class MediaBlobTests(SiteTestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+        # Rendition manifests are cached by content hash across media roots
+        cache.clear()
+
+    def rendition_names(self, name):
+        digest = blobs.digest_from_name(name)
+        try:
+            _, files = default_storage.listdir(f'{images.DERIVATIVES_DIR}/{digest[:2]}')
+        except FileNotFoundError:
+            return []
+        return [filename for filename in files if filename.startswith(digest)]
+
+    def test_identical_uploads_share_a_counted_blob(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        second = GalleryImage.objects.create(title='Two', image=jpeg_upload())
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 2)
+        self.assertTrue(self.rendition_names(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+        self.assertTrue(blobs.media_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.image = jpeg_upload('blue')
+            second.save()
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(blobs.media_storage.exists(name))
+        self.assertEqual(self.rendition_names(name), [])
+
+    def test_blob_referenced_again_before_the_delete_is_kept(self):
+        image = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        name = image.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.delete()
+        # A concurrent upload of the same bytes lands before the delete runs
+        GalleryImage.objects.create(title='Again', image=jpeg_upload())
+        for callback in callbacks:
+            callback()
+        self.assertTrue(blobs.media_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+
+    def test_upload_claim_stops_a_delete_before_it_is_counted(self):
+        image = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        name = image.image.name
+        with self.captureOnCommitCallbacks() as callbacks:
+            image.delete()
+        # The same bytes are stored but the row pointing at them is not saved yet
+        self.assertEqual(blobs.media_storage.save('photo.jpg', jpeg_upload()), name)
+        for callback in callbacks:
+            callback()
+        self.assertTrue(blobs.media_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 0)
+
+    def test_upload_after_a_delete_writes_the_file_again(self):
+        image = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        name = image.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(blobs.media_storage.exists(name))
+        again = GalleryImage.objects.create(title='Again', image=jpeg_upload())
+        self.assertEqual(again.image.name, name)
+        self.assertTrue(blobs.media_storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).references, 1)
+
+
+class ResponsiveImageTests(SiteTestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def render(self, image):
+        return Template('{% load image_extras %}{% responsive_image image.image alt="x" %}').render(
+            Context({'image': image})
+        )
+
+    def create(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return GalleryImage.objects.create(title='One', image=jpeg_upload())
+
+    def test_renditions_are_generated_when_the_save_commits(self):
+        image = self.create()
+        html = self.render(image)
+        self.assertIn('<picture>', html)
+        self.assertIn(f'{images.DERIVATIVES_DIR}/', html)
+
+    def test_render_after_a_cache_flush_reads_the_stored_manifest(self):
+        image = self.create()
+        cache.clear()
+        with mock.patch.object(images, 'ensure_derivatives') as ensure:
+            html = self.render(image)
+        ensure.assert_not_called()
+        self.assertIn('<picture>', html)
+
+    def test_render_without_a_manifest_falls_back_to_the_original(self):
+        # Renditions are only generated once the save commits
+        with self.captureOnCommitCallbacks(execute=False):
+            image = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        with mock.patch.object(images, 'ensure_derivatives') as ensure:
+            html = self.render(image)
+        ensure.assert_not_called()
+        self.assertNotIn('<picture>', html)
+        self.assertIn(f'src="{image.image.url}"', html)
+
+    def test_missing_manifest_is_remembered(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            image = GalleryImage.objects.create(title='One', image=jpeg_upload())
+        self.render(image)
+        with mock.patch.object(images.default_storage, 'open') as storage_open:
+            self.assertNotIn('<picture>', self.render(image))
+        storage_open.assert_not_called()
+        # Generating the renditions replaces the remembered miss
+        images.generate_for_instance(image)
+        self.assertIn('<picture>', self.render(image))
+
+    def test_decompression_bomb_is_logged_not_raised(self):
+        with mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 1000):
+            with self.assertLogs('website.images', 'WARNING'):
+                with self.captureOnCommitCallbacks(execute=True):
+                    image = GalleryImage.objects.create(title='Huge', image=jpeg_upload())
+        self.assertNotIn('<picture>', self.render(image))
+
+    def test_only_changed_images_are_resized(self):
+        image = self.create()
+        with mock.patch.object(images, 'ensure_derivatives') as ensure:
+            with self.captureOnCommitCallbacks(execute=True):
+                image.title = 'Renamed'
+                image.save()
+            ensure.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                image.image = jpeg_upload('blue')
+                image.save()
+            ensure.assert_called_once()
+
+
+class ChatBackendTests(SiteTestCase):
+    def check_ids(self):
+        return [message.id for message in chat_backends.check_chat_backend(None)]
+
+    @override_settings(GEMINI_API_KEY='key')
+    def test_default_backend_streams_from_the_rest_api(self):
+        from django.conf import settings
+        del settings.CHAT_BACKEND
+        self.assertIsInstance(chat_backends.get_chat_backend().backend.backend, chat_backends.GeminiBackend)
+
+    @override_settings(CHAT_BACKEND='website.chat_backends.GeminiBackend', GEMINI_API_KEY='')
+    def test_rest_backend_warns_of_a_missing_api_key(self):
+        with mock.patch.dict(os.environ, {'GEMINI_API_KEY': ''}):
+            messages = chat_backends.check_chat_backend(None)
+        self.assertIn('website.W002', [message.id for message in messages])
+        # Management commands such as migrate must still run without a key
+        self.assertFalse([message for message in messages if message.is_serious()])
+
+    @override_settings(CHAT_BACKEND='website.chat_backends.NoSuchBackend')
+    def test_unknown_backend_is_reported(self):
+        self.assertEqual(self.check_ids(), ['website.E001'])
+
+
+class ResponseCacheTests(SiteTestCase):
+    def test_exact_and_reworded_questions_hit(self):
+        responses = chat_cache.ResponseCache()
+        responses.set('What services do you offer?', 'Consulting and ML.')
+        self.assertEqual(responses.get('what services do you offer'), 'Consulting and ML.')
+        self.assertEqual(responses.get('What service do you offer?'), 'Consulting and ML.')
+        self.assertIsNone(responses.get('Where is your office?'))
+        stats = responses.stats()
+        self.assertEqual((stats['hits'], stats['similar_hits'], stats['misses']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_questions_about_different_things_miss(self):
+        responses = chat_cache.ResponseCache(similarity=0.5)
+        responses.set('What is the price of the chatbot plan?', 'Chatbot answer')
+        self.assertIsNone(responses.get('What is the price of the vision plan?'))
+        self.assertEqual(responses.get('what is the price of the chatbot plans'), 'Chatbot answer')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        responses = chat_cache.ResponseCache(max_entries=2, similarity=1)
+        responses.set('first question', 'one')
+        responses.set('second question', 'two')
+        responses.get('first question')
+        responses.set('third question', 'three')
+        self.assertIsNone(responses.get('second question'))
+        self.assertEqual(responses.get('first question'), 'one')
+        self.assertEqual(responses.stats()['evictions'], 1)
+
+    def test_expired_entries_miss(self):
+        responses = chat_cache.ResponseCache(ttl=60)
+        with mock.patch('time.monotonic', return_value=1000):
+            responses.set('opening hours', 'Nine to five.')
+        with mock.patch('time.monotonic', return_value=1061):
+            self.assertIsNone(responses.get('opening hours'))
+        self.assertEqual((len(responses), responses.stats()['expired']), (0, 1))
+
+    def test_saving_site_content_empties_the_cache(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        responses = chat_cache.ResponseCache()
+        ask = async_to_sync(chat_backends.CachedChatBackend(chat_backends.EchoBackend(), responses).reply)
+        ask('opening hours')
+        ask('opening hours')
+        self.assertEqual(responses.stats()['hits'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SoftwareSolution.objects.create(title='Vision API', description='-', features='-')
+        self.assertEqual(ask('opening hours'), 'You said: opening hours ')
+        self.assertEqual((responses.stats()['hits'], responses.stats()['misses']), (1, 2))
+
+    def test_stats_are_on_the_metrics_page(self):
+        staff = get_user_model().objects.create_user('staff', password='-', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/dashboard/metrics/?format=json')
+        self.assertEqual(set(response.json()['chat_cache']), {
+            'hits', 'similar_hits', 'misses', 'evictions', 'expired', 'entries', 'bytes', 'hit_rate',
+        })
+        self.assertContains(self.client.get('/dashboard/metrics/'), 'Chatbot response cache')
+
+
+class SlowEchoBackend(chat_backends.EchoBackend):
+    delay = 0.2
+
+
+class FailingBackend(chat_backends.ChatBackend):
+    async def stream(self, message):
+        yield 'Partial '
+        raise RuntimeError('upstream error')
+
+
+@override_settings(CHAT_RETRIEVAL_ENABLED=False, CHAT_CACHE_ENABLED=False)
+class ChatStreamTests(SiteTestCase):
+    async def events(self, message='Hello there'):
+        response = await self.async_client.get('/chat/', {'message': message}, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        return [message for message in body.split('\n\n') if message]
+
+    @override_settings(CHAT_BACKEND='website.chat_backends.EchoBackend')
+    async def test_reply_streams_chunks_then_done(self):
+        events = await self.events()
+        self.assertEqual(events[0], 'data: {"text": "You "}')
+        self.assertEqual(events[-1], 'event: done\ndata: {}')
+
+    @override_settings(CHAT_BACKEND='website.tests.SlowEchoBackend', CHAT_TIMEOUT=0.05)
+    async def test_slow_backend_ends_with_an_error_event(self):
+        with self.assertLogs('website.views', 'ERROR'):
+            events = await self.events()
+        self.assertEqual(len(events), 1)
+        self.assertTrue(events[0].startswith('event: error\n'))
+
+    @override_settings(CHAT_BACKEND='website.tests.FailingBackend')
+    async def test_backend_error_after_some_text_ends_with_an_error_event(self):
+        with self.assertLogs('website.views', 'ERROR'):
+            events = await self.events()
+        self.assertEqual(events[0], 'data: {"text": "Partial "}')
+        self.assertTrue(events[1].startswith('event: error\n'))
+        self.assertEqual(len(events), 2)
+
+    async def test_timeout_closes_the_backend_stream(self):
+        closed = asyncio.Event()
+
+        async def chunks():
+            try:
+                yield 'first'
+                await asyncio.sleep(1)
+                yield 'second'
+            finally:
+                closed.set()
+
+        received = []
+        with self.assertRaises(asyncio.TimeoutError):
+            async for chunk in chat_backends.stream_with_timeout(chunks(), 0.05):
+                received.append(chunk)
+        self.assertEqual(received, ['first'])
+        self.assertTrue(closed.is_set())
+
+
+class PageCacheTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create_solution(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return SoftwareSolution.objects.create(title=title, description='-', features='-')
+
+    def test_versions_are_bumped_when_the_save_commits(self):
+        version = caching.model_versions(SoftwareSolution)
+        with self.captureOnCommitCallbacks(execute=False):
+            SoftwareSolution.objects.create(title='Rolled back', description='-', features='-')
+        self.assertEqual(caching.model_versions(SoftwareSolution), version)
+        self.create_solution('Committed')
+        self.assertGreater(int(caching.model_versions(SoftwareSolution)), int(version))
+        self.assertEqual(caching.model_versions(Event, SoftwareSolution).count('-'), 1)
+
+    def test_lost_version_never_repeats_an_old_one(self):
+        version = caching.model_versions(SoftwareSolution)
+        caching.bump_model_version(SoftwareSolution)
+        cache.delete(f'website:model_version:{SoftwareSolution._meta.label_lower}')
+        self.assertGreater(int(caching.model_versions(SoftwareSolution)), int(version) + 1)
+
+    def test_anonymous_pages_are_served_from_the_cache_until_an_edit(self):
+        self.create_solution('First')
+        self.assertContains(self.client.get('/solutions/'), 'First')
+        SoftwareSolution.objects.update(title='Renamed without signals')
+        self.assertContains(self.client.get('/solutions/'), 'First')
+        self.create_solution('Second')
+        response = self.client.get('/solutions/')
+        self.assertContains(response, 'Renamed without signals')
+        self.assertContains(response, 'Second')
+
+    def test_a_deploy_does_not_serve_markup_cached_before_it(self):
+        self.create_solution('First')
+        self.client.get('/solutions/')
+        SoftwareSolution.objects.update(title='Renamed without signals')
+        conditional.deploy_salt.cache_clear()
+        self.addCleanup(conditional.deploy_salt.cache_clear)
+        with override_settings(DEPLOY_VERSION='next-release'):
+            self.assertContains(self.client.get('/solutions/'), 'Renamed without signals')
+
+    def test_home_page_drops_an_event_once_it_has_passed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = Event.objects.create(
+                title='Launch party', description='-', location='London', is_featured=True,
+                date=timezone.now() + datetime.timedelta(days=1),
+            )
+        self.assertContains(self.client.get('/'), 'Launch party')
+        # Time passing sends no signal, so the model version stays the same
+        Event.objects.filter(pk=event.pk).update(date=timezone.now() - datetime.timedelta(minutes=1))
+        self.assertNotContains(self.client.get('/'), 'Launch party')
+
+    def test_staff_pages_are_never_cached(self):
+        self.create_solution('First')
+        self.client.get('/solutions/')
+        self.client.force_login(get_user_model().objects.create_user('staff', password='-', is_staff=True))
+        SoftwareSolution.objects.update(title='Renamed')
+        self.assertContains(self.client.get('/solutions/'), 'Renamed')
+
+
+class ConditionalPageTests(SiteTestCase):
+    def setUp(self):
+        # Page cache versions are only bumped on commit, which TestCase never does
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.post = BlogPost.objects.create(title='Cached', content='body', author='-')
+
+    def test_unchanged_page_answers_304(self):
+        etag = self.client.get('/blog/')['ETag']
+        self.assertEqual(self.client.get('/blog/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.post.title = 'Edited'
+        self.post.save()
+        response = self.client.get('/blog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_deploy_version_changes_the_etag(self):
+        etag = self.client.get('/blog/')['ETag']
+        conditional.deploy_salt.cache_clear()
+        self.addCleanup(conditional.deploy_salt.cache_clear)
+        with override_settings(DEPLOY_VERSION='next-release'):
+            response = self.client.get('/blog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def conditional_view(self, body):
+        @conditional.conditional_page(BlogPost.objects.all())
+        def view(request):
+            return HttpResponse(body(request))
+        return view
+
+    def get(self, view, user=None, **headers):
+        request = RequestFactory().get('/', **headers)
+        request.user = user or AnonymousUser()
+        return view(request)
+
+    def test_page_with_a_csrf_token_sends_no_validators(self):
+        response = self.get(self.conditional_view(get_token))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_conditional_pages_render_no_csrf_token(self):
+        # A 304 is sent before the view runs, so these pages must not need a token
+        solution = SoftwareSolution.objects.create(title='Vision API', description='-', features='-')
+        case_study = CaseStudy.objects.create(
+            title='Rollout', client_name='-', industry='-', challenge='-', solution='-', results='-',
+        )
+        self.post.is_published = True
+        self.post.save()
+        urls = [
+            '/', '/solutions/', f'/solutions/{solution.slug}/', '/case-studies/', f'/case-studies/{case_study.pk}/',
+            '/blog/', f'/blog/{self.post.slug}/', '/gallery/', '/gallery/feed/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+                self.assertNotIn('CSRF_COOKIE_NEEDS_UPDATE', response.wsgi_request.META)
+
+    def test_page_for_a_signed_in_user_sends_no_validators(self):
+        view = self.conditional_view(lambda request: f'Hello {request.user.username}')
+        etag = self.get(view)['ETag']
+        staff = get_user_model().objects.create_user('staff', password='-', is_staff=True)
+        response = self.get(view, user=staff, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Hello staff')
+        self.assertFalse(response.has_header('ETag'))
+
+
+class BenchmarkDataTests(SiteTestCase):
+    def test_seeding_again_with_one_seed_replaces_solutions_and_posts(self):
+        use_temporary_media_root(self)
+        volumes = {name: 2 for name in benchmark_data.DEFAULT_VOLUMES}
+        for _ in range(2):
+            benchmark_data.generate(volumes, seed=7, log=lambda message: None)
+        self.assertEqual(
+            sorted(SoftwareSolution.objects.values_list('slug', flat=True)),
+            ['benchmark-solution-7-0', 'benchmark-solution-7-1'],
+        )
+        self.assertEqual(
+            sorted(BlogPost.objects.values_list('slug', flat=True)), ['benchmark-post-7-0', 'benchmark-post-7-1'],
+        )
+        for post in BlogPost.objects.all():
+            self.assertEqual(sorted(post.tag_set.values_list('name', flat=True)), sorted(post.tag_list))
+        # The replaced rows were deleted without signals; the rebuild drops them from the search index
+        self.assertEqual(
+            sorted(SearchDocument.objects.filter(model_name='website.blogpost').values_list('object_id', flat=True)),
+            sorted(BlogPost.objects.values_list('pk', flat=True)),
+        )
+
+    def test_inquiries_are_spread_over_time(self):
+        use_temporary_media_root(self)
+        volumes = {**{name: 0 for name in benchmark_data.DEFAULT_VOLUMES}, 'inquiries': 20}
+        benchmark_data.generate(volumes, seed=3, log=lambda message: None)
+        created = list(ContactInquiry.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertEqual(len(set(created)), 20)
+        self.assertEqual(created, sorted(created))
+        self.assertGreater(created[-1] - created[0], datetime.timedelta(days=7))
+
+
+class PrerenderTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+        self.solution = SoftwareSolution.objects.create(title='Vision API', description='-', features='-')
+
+    def prerender(self):
+        call_command('prerender_site', output=self.output, host='testserver', stdout=StringIO())
+        with open(os.path.join(self.output, 'manifest.json')) as manifest:
+            return json.load(manifest)
+
+    def read(self, name):
+        with open(os.path.join(self.output, name)) as page:
+            return page.read()
+
+    def test_writes_the_pages_and_their_etags(self):
+        manifest = self.prerender()
+        detail = f'solutions/{self.solution.slug}/index.html'
+        for name in ('index.html', 'solutions/index.html', detail, 'blog/index.html', 'blog/index--page=1.html'):
+            self.assertTrue(os.path.exists(os.path.join(self.output, name)), name)
+        self.assertIn('Vision API', self.read(detail))
+        self.assertEqual(manifest[detail], self.client.get(f'/solutions/{self.solution.slug}/')['ETag'])
+
+    def test_unchanged_pages_keep_their_etag_and_file(self):
+        manifest = self.prerender()
+        detail = os.path.join(self.output, f'solutions/{self.solution.slug}/index.html')
+        written = os.stat(detail).st_mtime_ns
+        self.assertEqual(self.prerender(), manifest)
+        self.assertEqual(os.stat(detail).st_mtime_ns, written)
+
+    def test_changed_pages_are_replaced_and_removed_pages_deleted(self):
+        manifest = self.prerender()
+        with self.captureOnCommitCallbacks(execute=True):
+            other = SoftwareSolution.objects.create(title='Forecasting', description='-', features='-')
+            self.solution.title = 'Vision API 2'
+            self.solution.save()
+        updated = self.prerender()
+
+        listing = 'solutions/index.html'
+        self.assertNotEqual(updated[listing], manifest[listing])
+        self.assertIn('Vision API 2', self.read(listing))
+        self.assertIn(f'solutions/{other.slug}/index.html', updated)
+
+        other_page = os.path.join(self.output, f'solutions/{other.slug}/index.html')
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertNotIn(f'solutions/{other.slug}/index.html', self.prerender())
+        self.assertFalse(os.path.exists(other_page))
+
+    def test_pages_are_rendered_past_a_page_cache_not_yet_bumped(self):
+        self.client.get('/solutions/')
+        manifest = self.prerender()
+        # A change whose version bump has not run yet leaves the old page cached
+        SoftwareSolution.objects.filter(pk=self.solution.pk).update(title='Vision API 2', updated_at=timezone.now())
+        self.assertNotContains(self.client.get('/solutions/'), 'Vision API 2')
+
+        updated = self.prerender()
+        self.assertNotEqual(updated['solutions/index.html'], manifest['solutions/index.html'])
+        self.assertIn('Vision API 2', self.read('solutions/index.html'))
+
+
+class BlogSidebarTests(SiteTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def save(self, post, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for field, value in changes.items():
+                setattr(post, field, value)
+            post.save()
+        return post
+
+    def create(self, **fields):
+        return self.save(BlogPost(content='-', author='-', **fields))
+
+    def test_incremental_updates_match_a_rebuild(self):
+        first = self.create(title='A', tags='AI, ML', category='data_science')
+        sidebar.get_blog_sidebar()
+        second = self.create(title='B', tags='AI')
+        cached = cache.get(sidebar.SIDEBAR_CACHE_KEY)
+        self.assertEqual(cached['tag_counts'], {'AI': 2, 'ML': 1})
+        self.assertEqual([post.pk for post in cached['recent_posts']], [second.pk, first.pk])
+
+        self.save(first, is_published=False)
+        cached = cache.get(sidebar.SIDEBAR_CACHE_KEY)
+        self.assertEqual((cached['tag_counts'], cached['total_posts']), ({'AI': 1}, 1))
+        self.assertEqual([post.pk for post in cached['recent_posts']], [second.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.save(first, is_published=True, category='machine_learning')
+        cached = cache.get(sidebar.SIDEBAR_CACHE_KEY)
+        cache.clear()
+        rebuilt = sidebar.build_blog_sidebar()
+        for part in ('category_counts', 'tag_counts', 'total_posts'):
+            self.assertEqual(cached[part], rebuilt[part], part)
+
+    def test_rolled_back_save_leaves_the_counts(self):
+        post = self.create(title='A', tags='AI')
+        before = sidebar.get_blog_sidebar()
+        # On-commit callbacks are dropped when the transaction rolls back
+        with self.captureOnCommitCallbacks(execute=False):
+            post.tags = 'AI, ML'
+            post.save()
+        self.assertEqual(cache.get(sidebar.SIDEBAR_CACHE_KEY)['tag_counts'], before['tag_counts'])
+
+    def test_edit_that_began_with_a_cold_cache_is_not_counted_twice(self):
+        post = self.create(title='A', tags='AI')
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            post.tags = 'AI, ML'
+            post.save()
+            # A request rebuilds the sidebar before the edit commits
+            sidebar.get_blog_sidebar()
+        self.assertEqual(sidebar.get_blog_sidebar()['tag_counts'], {'AI': 1, 'ML': 1})
+        self.assertEqual(sidebar.get_blog_sidebar()['total_posts'], 1)
+
+    def test_deleted_post_leaves_the_recent_posts(self):
+        post = self.create(title='A', tags='AI')
+        sidebar.get_blog_sidebar()
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(cache.get(sidebar.SIDEBAR_CACHE_KEY)['recent_posts'], [])
+
+    def test_update_that_cannot_take_the_lock_invalidates(self):
+        post = self.create(title='A', tags='AI')
+        sidebar.get_blog_sidebar()
+        cache.add(sidebar.LOCK_KEY, True)
+        self.save(post, tags='AI, ML')
+        self.assertIsNone(cache.get(sidebar.SIDEBAR_CACHE_KEY))
+        cache.delete(sidebar.LOCK_KEY)
+        self.assertEqual(sidebar.get_blog_sidebar()['tag_counts'], {'AI': 1, 'ML': 1})
+        self.assertIsNotNone(cache.get(sidebar.SIDEBAR_CACHE_KEY))
@@ -15,9 +15,14 @@ urlpatterns = [
     path('blog/', views.blog, name='blog'),
     path('blog/<slug:slug>/', views.blog_post_detail, name='blog_post_detail'),
     path('gallery/', views.gallery, name='gallery'),
+    path('gallery/feed/', views.gallery_feed, name='gallery_feed'),
     path('events/', views.events, name='events'),
     path('contact/', views.contact, name='contact'),
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
+    path('admin-dashboard/inquiries/<int:inquiry_id>/', views.inquiry_detail, name='inquiry_detail'),
+    path('admin-dashboard/export/inquiries/', views.export_inquiries, name='export_inquiries'),
+    path('admin-dashboard/export/registrations/', views.export_registrations, name='export_registrations'),
+    path('admin-dashboard/bulk/', views.bulk_update, name='bulk_update'),
     path('admin-login/', views.admin_login, name='admin_login'),
     path('admin-logout/', views.admin_logout, name='admin_logout'),
     path('test-logo/', views.test_logo, name='test_logo'),
@@ -1,8 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
 from .models import (
     SoftwareSolution, 
     CaseStudy, 
@@ -10,10 +10,20 @@ from .models import (
     BlogPost, 
     GalleryImage, 
     Event, 
-    ContactInquiry
+    ContactInquiry,
+    Tag
 )
-from .forms import ContactForm, LoginForm, TestimonialForm
+from .forms import ContactForm, EventRegistrationForm, LoginForm, TestimonialForm
+from .gallery import GALLERY_IMAGES_PER_PAGE, GALLERY_PAGE_FIELDS, filter_images, get_filter_options
+from .caching import cache_public_page
+from .conditional import conditional_page
+from .pagination import keyset_paginate
+from .registrations import RegistrationError, register
+from .search import SearchResults
+from .stats import get_inquiry_stats
+from .sidebar import RECENT_POSTS_LIMIT, get_blog_sidebar
 from django.utils import timezone
+from django.utils.text import slugify
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 
 # Create your views here.
@@ -21,28 +31,75 @@ from django.contrib.admin.forms import AdminAuthenticationForm
 from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy
 from django.shortcuts import render
-from django.http import JsonResponse
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 
-from .gemini_chat import chat_with_gemini
+from .chat_backends import get_chat_backend, stream_with_timeout
+from . import bulk, exports, notifications
 
+import asyncio
+import calendar
+import json
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-def chat(request):
+BLOG_POSTS_PER_PAGE = 6
+INQUIRIES_PER_PAGE = 25
+INQUIRY_PAGE_FIELDS = ('created_at', 'id')
+
+CHAT_ERROR_MESSAGE = 'An error occurred while processing your request. Please try again later.'
+CHAT_EMPTY_MESSAGE = "Sorry, I couldn't generate a response. Please try again."
+
+
+def _sse(data, event=None):
+    """Format one Server-Sent Events message"""
+    prefix = f'event: {event}\n' if event else ''
+    return f'{prefix}data: {json.dumps(data)}\n\n'
+
+
+async def _chat_events(user_input):
+    """Stream the chatbot reply as Server-Sent Events"""
+    timeout = getattr(settings, 'CHAT_TIMEOUT', 30)
+    received = False
+    try:
+        async for chunk in stream_with_timeout(get_chat_backend().stream(user_input), timeout):
+            received = True
+            yield _sse({'text': chunk})
+        if not received:
+            yield _sse({'text': CHAT_EMPTY_MESSAGE})
+        yield _sse({}, event='done')
+    except asyncio.CancelledError:
+        # The visitor went away; the backend stream has already been closed
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming chat response: {e}")
+        yield _sse({'error': CHAT_ERROR_MESSAGE}, event='error')
+
+
+async def chat(request):
+    """Async chatbot endpoint, streamed as Server-Sent Events when requested"""
     user_input = request.GET.get('message', '')
     if not user_input:
         return JsonResponse({'response': 'Please provide a message.'}, status=400)
     
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        response = StreamingHttpResponse(_chat_events(user_input), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
     try:
-        response = chat_with_gemini(user_input)
+        backend = get_chat_backend()
+        response = await asyncio.wait_for(backend.reply(user_input), getattr(settings, 'CHAT_TIMEOUT', 30))
         if not response:
-            response = "Sorry, I couldn't generate a response. Please try again."
+            response = CHAT_EMPTY_MESSAGE
         return JsonResponse({'response': response})
     except Exception as e:
         logger.error(f"Error processing chat request: {e}")
-        return JsonResponse({'response': 'An error occurred while processing your request. Please try again later.'}, status=500)
+        return JsonResponse({'response': CHAT_ERROR_MESSAGE}, status=500)
 
 
 class CustomAdminLoginView(LoginView):
@@ -56,13 +113,25 @@ class CustomAdminLoginView(LoginView):
             return next_url
         return reverse_lazy('admin:index')
         
+def _upcoming_events(request):
+    """Events still to come; their count changes as dates pass, not only on edits"""
+    return Event.objects.upcoming()
+
+
+def _next_event(request):
+    """The next event to pass; the upcoming list changes when it does, without any edit"""
+    return Event.objects.upcoming().order_by('date', 'pk').values_list('pk', flat=True).first()
+
+
+@conditional_page(SoftwareSolution.objects.all(), Testimonial.objects.filter(is_approved=True), CaseStudy.objects.all(), Event.objects.all(), _upcoming_events)
+@cache_public_page(SoftwareSolution, Testimonial, CaseStudy, Event, vary_on=_next_event)
 def home(request):
     """View for the homepage"""
     # Get featured content for the homepage
-    solutions = SoftwareSolution.objects.all()[:3]
+    solutions = SoftwareSolution.objects.for_list()[:3]
     testimonials = Testimonial.objects.filter(is_approved=True).order_by('-date')[:3]
-    case_studies = CaseStudy.objects.all()[:2]
-    featured_events = Event.objects.filter(is_featured=True).order_by('date')[:2]
+    case_studies = CaseStudy.objects.for_list()[:2]
+    featured_events = Event.objects.upcoming().filter(is_featured=True).order_by('date')[:2]
     
     context = {
         'solutions': solutions,
@@ -72,16 +141,23 @@ def home(request):
     }
     return render(request, 'website/home.html', context)
 
+@conditional_page(SoftwareSolution.objects.all())
+@cache_public_page(SoftwareSolution)
 def solutions(request):
     """View for software solutions page"""
-    solutions = SoftwareSolution.objects.all()
+    solutions = SoftwareSolution.objects.for_list()
+    search = request.GET.get('search')
+    if search:
+        solutions = SearchResults(solutions, search)
     return render(request, 'website/solutions.html', {'solutions': solutions})
 
+@conditional_page(SoftwareSolution.objects.all())
+@cache_public_page(SoftwareSolution)
 def solution_detail(request, slug):
     """View for individual solution detail page"""
     solution = get_object_or_404(SoftwareSolution, slug=slug)
     # Get other solutions for the "Other Solutions" section
-    other_solutions = SoftwareSolution.objects.exclude(id=solution.id)[:3]
+    other_solutions = SoftwareSolution.objects.for_list().exclude(id=solution.id)[:3]
     
     context = {
         'solution': solution,
@@ -89,20 +165,27 @@ def solution_detail(request, slug):
     }
     return render(request, 'website/solution_detail.html', context)
 
+@conditional_page(CaseStudy.objects.all(), Testimonial.objects.filter(is_approved=True))
+@cache_public_page(CaseStudy, Testimonial)
 def case_studies(request):
     """View for case studies/past solutions page"""
-    case_studies = CaseStudy.objects.all()
+    case_studies = CaseStudy.objects.for_list()
+    search = request.GET.get('search')
+    if search:
+        case_studies = SearchResults(case_studies, search)
     testimonials = Testimonial.objects.filter(is_approved=True).order_by('-date')[:3]
     return render(request, 'website/case_studies.html', {
         'case_studies': case_studies,
         'testimonials': testimonials
     })
 
+@conditional_page(CaseStudy.objects.all())
+@cache_public_page(CaseStudy)
 def case_study_detail(request, id):
     """View for individual case study detail page"""
     case_study = get_object_or_404(CaseStudy, id=id)
     # Get other case studies for the "Related Case Studies" section
-    related_case_studies = CaseStudy.objects.exclude(id=case_study.id)[:3]
+    related_case_studies = CaseStudy.objects.for_list().exclude(id=case_study.id)[:3]
     
     context = {
         'case_study': case_study,
@@ -117,7 +200,9 @@ def testimonials(request):
     if request.method == 'POST':
         form = TestimonialForm(request.POST, request.FILES)
         if form.is_valid():
-            testimonial = form.save()
+            with transaction.atomic():
+                testimonial = form.save()
+                notifications.testimonial_alert(testimonial)
             messages.success(request, 'Thank you for sharing your experience! Your testimonial has been submitted and will be reviewed before publishing.')
             return redirect('website:testimonials')
         else:
@@ -130,13 +215,15 @@ def testimonials(request):
         'form': form
     })
 
+@conditional_page(BlogPost.objects.filter(is_published=True), Tag.objects.all())
+@cache_public_page(BlogPost, Tag)
 def blog(request):
     """View for blog page"""
     category = request.GET.get('category')
     tag = request.GET.get('tag')
     search = request.GET.get('search')
     
-    all_posts = BlogPost.objects.filter(is_published=True)
+    all_posts = BlogPost.objects.for_list().filter(is_published=True)
     posts = all_posts.order_by('-created_at')
     
     # Apply filters if provided
@@ -144,17 +231,14 @@ def blog(request):
         posts = posts.filter(category=category)
     
     if tag:
-        posts = posts.filter(tags__icontains=tag)
+        posts = posts.filter(tag_set__slug=slugify(tag))
     
     if search:
-        posts = posts.filter(
-            Q(title__icontains=search) | 
-            Q(content__icontains=search) |
-            Q(author__icontains=search)
-        )
+        # Ranked by relevance through the inverted index instead of a LIKE scan
+        posts = SearchResults(posts, search)
     
     # Pagination
-    paginator = Paginator(posts, 6)  # Show 6 posts per page
+    paginator = Paginator(posts, BLOG_POSTS_PER_PAGE)
     page = request.GET.get('page')
     try:
         posts = paginator.page(page)
@@ -168,20 +252,11 @@ def blog(request):
     # Get all categories and tags for the sidebar
     all_categories = dict(BlogPost.CATEGORY_CHOICES)
     
-    # Get category counts
-    category_counts = {}
-    for cat_key, _ in BlogPost.CATEGORY_CHOICES:
-        category_counts[cat_key] = all_posts.filter(category=cat_key).count()
-    
-    # Get all unique tags
-    all_tags = []
-    for post in all_posts:
-        tags = post.get_tags_list()
-        all_tags.extend(tags)
-    all_tags = list(set(all_tags))
-    
-    # Get recent posts for sidebar
-    recent_posts = all_posts.order_by('-created_at')[:5]
+    # Counts, tags and recent posts come from the pre-aggregated sidebar index
+    sidebar = get_blog_sidebar()
+    category_counts = sidebar['category_counts']
+    all_tags = sorted(sidebar['tag_counts'])
+    recent_posts = sidebar['recent_posts'][:RECENT_POSTS_LIMIT]
     
     context = {
         'posts': posts,
@@ -192,38 +267,30 @@ def blog(request):
         'selected_category': category,
         'selected_tag': tag,
         'search_query': search,
-        'total_posts': all_posts.count()
+        'total_posts': sidebar['total_posts']
     }
     
     return render(request, 'website/blog.html', context)
 
+@conditional_page(BlogPost.objects.filter(is_published=True), Tag.objects.all())
+@cache_public_page(BlogPost, Tag)
 def blog_post_detail(request, slug):
     """View for individual blog post detail page"""
-    post = get_object_or_404(BlogPost, slug=slug, is_published=True)
+    # The page shows the stored rendering of the body rather than its source text
+    post = get_object_or_404(BlogPost.objects.defer('content', 'excerpt'), slug=slug, is_published=True)
     
     # Get all categories and tags for the sidebar
     all_categories = dict(BlogPost.CATEGORY_CHOICES)
     
-    # Get all unique tags
-    all_tags = []
-    for blog_post in BlogPost.objects.filter(is_published=True):
-        tags = blog_post.get_tags_list()
-        all_tags.extend(tags)
-    all_tags = list(set(all_tags))
-    
-    # Get recent posts for sidebar
-    recent_posts = BlogPost.objects.filter(is_published=True).exclude(id=post.id).order_by('-created_at')[:5]
-    
-    # Get related posts (same category or tags)
-    post_tags = post.get_tags_list()
-    related_posts = BlogPost.objects.filter(
-        is_published=True
-    ).exclude(
-        id=post.id
-    ).filter(
-        Q(category=post.category) | 
-        Q(tags__icontains=','.join(post_tags)) if post_tags else Q()
-    ).distinct()[:3]
+    # Tags and recent posts come from the pre-aggregated sidebar index
+    sidebar = get_blog_sidebar()
+    all_tags = sorted(sidebar['tag_counts'])
+    recent_posts = [recent for recent in sidebar['recent_posts'] if recent.pk != post.pk][:RECENT_POSTS_LIMIT]
+    
+    post_tags = post.tag_list
+    
+    # Related posts are precomputed from tag overlap and category
+    related_posts = [link.related for link in post.related_links.select_related('related').defer('related__content', 'related__content_html')]
     
     context = {
         'post': post,
@@ -236,63 +303,72 @@ def blog_post_detail(request, slug):
     
     return render(request, 'website/blog_post_detail.html', context)
 
+def _gallery_page(request):
+    images, selected = filter_images(request.GET)
+    page = keyset_paginate(
+        images,
+        GALLERY_PAGE_FIELDS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=GALLERY_IMAGES_PER_PAGE,
+    )
+    return page, selected
+
+
+@conditional_page(GalleryImage.objects.all())
+@cache_public_page(GalleryImage)
 def gallery(request):
     """View for photo gallery page"""
-    # Get filter parameters from request
-    category = request.GET.get('category')
-    event = request.GET.get('event')
-    year = request.GET.get('year')
-    month = request.GET.get('month')
-    
-    # Start with all images
-    images = GalleryImage.objects.all()
-    
-    # Apply filters if provided
-    if category and category != 'all':
-        images = images.filter(category=category)
-    
-    if event:
-        images = images.filter(event_name__icontains=event)
-    
-    if year:
-        images = images.filter(date__year=year)
-    
-    if month:
-        images = images.filter(date__month=month)
-    
-    # Order by date (newest first)
-    images = images.order_by('-date')
-    
-    # Get all categories for the filter
-    categories = dict(GalleryImage.CATEGORY_CHOICES)
-    
-    # Get all unique event names
-    events = GalleryImage.objects.values_list('event_name', flat=True).distinct()
-    events = [event for event in events if event]  # Remove None/empty values
-    
-    # Get years and months with images
-    years = GalleryImage.objects.dates('date', 'year', order='DESC')
-    months = GalleryImage.objects.dates('date', 'month', order='DESC')
-    
+    images, selected = _gallery_page(request)
+
+    # Filters carried over to the Older/Newer links and the feed
+    filter_query = request.GET.copy()
+    for key in ('after', 'before'):
+        filter_query.pop(key, None)
+
+    selected_month = selected['selected_month']
     context = {
         'images': images,
-        'categories': categories,
-        'events': events,
-        'years': years,
-        'months': months,
-        'selected_category': category,
-        'selected_event': event,
-        'selected_year': year,
-        'selected_month': month
+        'categories': dict(GalleryImage.CATEGORY_CHOICES),
+        **get_filter_options(),
+        **selected,
+        'selected_month_name': calendar.month_name[int(selected_month)] if selected_month else None,
+        'filter_query': filter_query.urlencode(),
     }
-    
+
     return render(request, 'website/gallery.html', context)
 
+@conditional_page(GalleryImage.objects.all())
+@cache_public_page(GalleryImage)
+def gallery_feed(request):
+    """JSON page of gallery images for infinite scrolling"""
+    images, _ = _gallery_page(request)
+    html = ''.join(
+        render_to_string('website/gallery_item.html', {'image': image}, request=request) for image in images
+    )
+    return JsonResponse({
+        'images': [
+            {
+                'id': image.id,
+                'title': image.title,
+                'description': image.description,
+                'category': image.category,
+                'event_name': image.event_name,
+                'date': image.date.isoformat(),
+            }
+            for image in images
+        ],
+        'html': html,
+        'next_cursor': images.next_cursor,
+    })
+
 def events(request):
     """View for events page"""
-    # This line gets events with dates in the future
-    upcoming_events = Event.objects.filter(date__gt=timezone.now()).order_by('date')
-    past_events = Event.objects.filter(date__lte=timezone.now()).order_by('-date')
+    # Split on the date at request time rather than the stored is_upcoming flag
+    now = timezone.now()
+    all_events = Event.objects.with_status(now)
+    upcoming_events = all_events.upcoming(now).order_by('date')
+    past_events = all_events.past(now).order_by('-date')
     return render(request, 'website/events.html', {
         'upcoming_events': upcoming_events,
         'past_events': past_events
@@ -303,7 +379,9 @@ def contact(request):
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                inquiry = form.save()
+                notifications.inquiry_alert(inquiry)
             messages.success(request, 'Your inquiry has been submitted successfully. We will contact you soon!')
             return redirect('website:contact')
     else:
@@ -347,64 +425,123 @@ def admin_dashboard(request):
         messages.error(request, 'You do not have permission to access this page')
         return redirect('website:home')
     
-    # Get all inquiries
-    inquiries = ContactInquiry.objects.all().order_by('-created_at')
-    
-    # Get counts for dashboard stats
-    total_inquiries = inquiries.count()
-    unread_inquiries = inquiries.filter(is_read=False).count()
-    read_inquiries = total_inquiries - unread_inquiries
-    
-    # Get inquiries by country for chart
-    countries = ContactInquiry.objects.values('country').annotate(count=Count('country')).order_by('-count')
-    
+    if request.method == 'POST' and 'mark_read' in request.POST:
+        inquiry_id = request.POST.get('inquiry_id', '')
+        inquiry = ContactInquiry.objects.filter(id=inquiry_id).first() if inquiry_id.isdigit() else None
+        if inquiry is None:
+            messages.error(request, 'Inquiry not found.')
+        else:
+            if not inquiry.is_read:
+                inquiry.is_read = True
+                inquiry.save(update_fields=['is_read'])
+            messages.success(request, f'Inquiry from {inquiry.name} marked as read.')
+        return redirect(request.get_full_path())
+    
+    # Keyset-paginated inquiries; details are loaded on demand from inquiry_detail
+    inquiries = keyset_paginate(
+        ContactInquiry.objects.only('id', 'name', 'company_name', 'email', 'created_at', 'is_read'),
+        INQUIRY_PAGE_FIELDS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=INQUIRIES_PER_PAGE,
+    )
+    
+    # Dashboard stats come from the materialized counters
     context = {
         'inquiries': inquiries,
-        'total_inquiries': total_inquiries,
-        'unread_inquiries': unread_inquiries,
-        'read_inquiries': read_inquiries,
-        'countries': countries,
+        **get_inquiry_stats(),
     }
     
     return render(request, 'website/admin_dashboard.html', context)
 
+@login_required
+def inquiry_detail(request, inquiry_id):
+    """JSON details of a single inquiry for the admin dashboard modal"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'You do not have permission to access this page'}, status=403)
+    
+    inquiry = get_object_or_404(ContactInquiry, id=inquiry_id)
+    return JsonResponse({
+        'id': inquiry.id,
+        'name': inquiry.name,
+        'email': inquiry.email,
+        'phone': inquiry.phone,
+        'company_name': inquiry.company_name,
+        'country': inquiry.country,
+        'job_title': inquiry.job_title,
+        'job_details': inquiry.job_details,
+        'created_at': inquiry.created_at.isoformat(),
+        'is_read': inquiry.is_read,
+    })
+
+@login_required
+def export_inquiries(request):
+    """Stream the inquiries matching the query string filters as CSV"""
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to access this page')
+        return redirect('website:home')
+    
+    return exports.csv_response(exports.filter_inquiries(request.GET), exports.INQUIRY_COLUMNS, 'inquiries')
+
+@login_required
+def export_registrations(request):
+    """Stream the event registrations matching the query string filters as CSV"""
+    if not request.user.is_staff:
+        messages.error(request, 'You do not have permission to access this page')
+        return redirect('website:home')
+    
+    return exports.csv_response(exports.filter_registrations(request.GET), exports.REGISTRATION_COLUMNS, 'registrations')
+
+@login_required
+def bulk_update(request):
+    """Apply a bulk action from website.bulk to a list of ids posted as JSON"""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'You do not have permission to access this page'}, status=403)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a JSON object with "action" and "ids"'}, status=405)
+    
+    try:
+        payload = json.loads(request.body)
+        action = payload['action']
+        if not isinstance(payload['ids'], list):
+            raise TypeError
+        ids = [int(pk) for pk in payload['ids']]
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'error': 'Expected a JSON object with "action" and a list of integer "ids"'}, status=400)
+    if action not in bulk.ACTIONS:
+        return JsonResponse({'error': f'Unknown action. Choose one of: {", ".join(bulk.ACTIONS)}'}, status=400)
+    if len(ids) > bulk.MAX_BULK_IDS:
+        return JsonResponse({'error': f'At most {bulk.MAX_BULK_IDS} ids per request'}, status=400)
+    
+    return JsonResponse({'action': action, 'updated': bulk.apply(action, ids=ids)})
+
 def test_logo(request):
     """Test view to check if the logo is accessible"""
     return render(request, 'website/test_logo.html')
 
 
-from .models import Event, EventRegistration
-
 def event_register(request):
     """Handle event registration form submission"""
     if request.method == 'POST':
-        event_id = request.POST.get('event_id')
-        full_name = request.POST.get('full_name')
-        email = request.POST.get('email')
-        phone = request.POST.get('phone')
-        company = request.POST.get('company')
-        job_title = request.POST.get('job_title')
+        event_id = request.POST.get('event_id', '')
+        event = Event.objects.upcoming().filter(id=event_id).first() if event_id.isdigit() else None
+        form = EventRegistrationForm(request.POST)
         
-        try:
-            event = Event.objects.get(id=event_id)
-            
-            # Create registration record
-            registration = EventRegistration(
-                event=event,
-                full_name=full_name,
-                email=email,
-                phone=phone,
-                company=company,
-                job_title=job_title
-            )
-            registration.save()
-            
-            # Send confirmation email (you can implement this later)
-            
-            messages.success(request, f"You have successfully registered for {event.title}. A confirmation email has been sent to your email address.")
-            
-        except Event.DoesNotExist:
-            messages.error(request, "Event not found. Please try again.")
+        if event is None:
+            messages.error(request, "Event not found or no longer open for registration. Please try again.")
+        elif not form.is_valid():
+            errors = [error for field_errors in form.errors.values() for error in field_errors]
+            messages.error(request, f"Please correct your registration: {' '.join(errors)}")
+        else:
+            try:
+                with transaction.atomic():
+                    registration = register(event, form.cleaned_data)
+                    # Sent by the process_notifications worker, not in the request
+                    notifications.event_confirmation(registration)
+            except RegistrationError as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, f"You have successfully registered for {event.title}. A confirmation email will be sent to {registration.email} shortly.")
         
         return redirect('website:events')
     
@@ -412,19 +549,16 @@ def event_register(request):
     return redirect('website:events')
 
 
-from django.shortcuts import get_object_or_404
-from .models import Event
-
 # Add this new view function
 def event_detail(request, event_id):
     """View for individual event details"""
-    event = get_object_or_404(Event, id=event_id)
+    now = timezone.now()
+    event = get_object_or_404(Event.objects.with_status(now), id=event_id)
     
     # Get related events (upcoming events in the same location)
-    related_events = Event.objects.filter(
-        is_upcoming=True, 
+    related_events = Event.objects.upcoming(now).filter(
         location=event.location
-    ).exclude(id=event.id)[:3]
+    ).exclude(id=event.id).order_by('date')[:3]
     
     context = {
         'event': event,